@@ -1,15 +1,25 @@
 import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
-# --- Configuration ---
-# 1. Set the year to download
+# --- Configuration (defaults, override on the command line) ---
+# 1. Year to download (--year)
 TARGET_YEAR = 2025
 
-# 2. Set the save path (directory)
-#    - Direct path or relative path
-SAVE_BASE_PATH = "E:\\" 
+# 2. Save path (directory) (--out)
+#    - Direct path or relative path; papers go to <path>/NIME_<year>_Papers
+SAVE_BASE_PATH = os.getcwd()
+
+# 3. Parallel downloads (--workers) and retries per file (--retries)
+DOWNLOAD_WORKERS = 4
+MAX_RETRIES = 5
 # --- End of Configuration ---
 
 
@@ -17,13 +27,133 @@ SAVE_BASE_PATH = "E:\\"
 PAPERS_URL = "https://nime.org/papers/"
 BASE_URL = "https://nime.org/"
 
-def download_nime_papers():
+CHUNK_SIZE = 64 * 1024
+BACKOFF_SECONDS = 1.0
+# Status codes worth retrying; other 4xx errors are permanent
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Keep multi-line progress messages from different threads apart
+_print_lock = threading.Lock()
+
+def log(message: str):
+    with _print_lock:
+        print(message)
+
+class IncompleteDownload(Exception):
+    """Raised when the bytes received do not match the advertised length."""
+
+def make_session(pool_size: int = DOWNLOAD_WORKERS) -> requests.Session:
+    """Session with a connection pool large enough for every worker thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def find_pdf_links(session: requests.Session, year: int, papers_url: str = PAPERS_URL, base_url: str = BASE_URL) -> list:
+    """
+    Parse the paper listing page and return absolute PDF URLs for the given year.
+    """
+    response = session.get(papers_url, timeout=30)
+    response.raise_for_status()
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+    pdf_links = []
+    # Find all <a> tags
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        # Key filtering logic:
+        # 1. Link path must contain the target year (e.g., "/2025/")
+        # 2. Link must end with ".pdf"
+        if f"/{year}/" in href and href.lower().endswith('.pdf'):
+            # Convert relative links (e.g., /proceedings/2024/paper.pdf) to absolute URLs
+            full_pdf_url = urljoin(base_url, href)
+            if full_pdf_url not in pdf_links: # Avoid duplicates
+                pdf_links.append(full_pdf_url)
+    return pdf_links
+
+def _expected_total(response: requests.Response, offset: int):
+    """Total file size advertised by a 200 or 206 response, or None if unknown."""
+    if response.status_code == 206:
+        # Content-Range: bytes <start>-<end>/<total>
+        content_range = response.headers.get('Content-Range', '')
+        try:
+            span, total = content_range.split(' ', 1)[1].split('/')
+            start = int(span.split('-')[0])
+        except (IndexError, ValueError):
+            raise IncompleteDownload(f"Malformed Content-Range: {content_range!r}")
+        if start != offset:
+            raise IncompleteDownload(f"Server resumed at byte {start}, expected {offset}")
+        return int(total) if total != '*' else None
+    length = response.headers.get('Content-Length')
+    return int(length) if length is not None else None
+
+def download_file(session: requests.Session, url: str, save_path: str,
+                  retries: int = MAX_RETRIES, backoff: float = BACKOFF_SECONDS) -> str:
+    """
+    Download url to save_path via a .part file, resuming with HTTP Range requests.
+
+    The .part file is only renamed once its size matches the Content-Length /
+    Content-Range total. Network errors and short reads are retried with
+    exponential backoff, continuing from the bytes already on disk.
+    Returns "skipped" or "downloaded"; raises after the last failed attempt.
+    """
+    if os.path.exists(save_path):
+        return "skipped"
+    part_path = save_path + ".part"
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 416 and offset:
+                    # Nothing left to fetch: the .part file is either complete or corrupt
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total.isdigit() and int(total) == offset:
+                        os.replace(part_path, save_path)
+                        return "downloaded"
+                    os.remove(part_path)
+                    raise IncompleteDownload("Stale partial file discarded")
+                if response.status_code in RETRY_STATUS:
+                    raise requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+
+                if response.status_code == 200 and offset:
+                    # Server ignored the Range header: start over
+                    offset = 0
+                expected = _expected_total(response, offset)
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+
+            received = os.path.getsize(part_path)
+            if expected is not None and received != expected:
+                raise IncompleteDownload(f"Got {received} of {expected} bytes")
+            os.replace(part_path, save_path)
+            return "downloaded"
+
+        except (requests.exceptions.RequestException, IncompleteDownload) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            permanent = status is not None and status not in RETRY_STATUS
+            if permanent or attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            log(f"  -> Retry {attempt + 1}/{retries} for {os.path.basename(save_path)} in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+def download_nime_papers(year: int = TARGET_YEAR, save_base_path: str = SAVE_BASE_PATH,
+                         workers: int = DOWNLOAD_WORKERS, retries: int = MAX_RETRIES,
+                         papers_url: str = PAPERS_URL, base_url: str = BASE_URL) -> dict:
     """
     Accesses the NIME paper portal and downloads all PDF papers for the specified year.
+    Returns counts of downloaded / skipped / failed files.
     """
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+
     # Construct final save directory name
-    save_dir_name = f"NIME_{TARGET_YEAR}_Papers"
-    final_save_dir = os.path.join(SAVE_BASE_PATH, save_dir_name)
+    save_dir_name = f"NIME_{year}_Papers"
+    final_save_dir = os.path.join(save_base_path, save_dir_name)
 
     # 1. Create local save directory
     try:
@@ -34,70 +164,63 @@ def download_nime_papers():
             print(f"Directory already exists: {final_save_dir}")
     except OSError as e:
         print(f"Error: Could not create directory {final_save_dir}.")
-        print(f"Please check if '{SAVE_BASE_PATH}' exists and has write permissions. Error: {e}")
-        return
+        print(f"Please check if '{save_base_path}' exists and has write permissions. Error: {e}")
+        return counts
+
+    session = make_session(max(workers, 1))
 
-    # 2. Access the single paper listing page
+    # 2. Access the single paper listing page and collect the PDF links
     try:
-        print(f"Accessing paper portal: {PAPERS_URL}")
-        response = requests.get(PAPERS_URL, timeout=30)
-        response.raise_for_status()
+        print(f"Accessing paper portal: {papers_url}")
+        pdf_links = find_pdf_links(session, year, papers_url, base_url)
     except requests.exceptions.RequestException as e:
         print(f"Network error or request failed: {e}")
-        return
+        return counts
 
-    # 3. Parse HTML and filter links using BeautifulSoup
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    pdf_links = []
-    # Find all <a> tags
-    for link in soup.find_all('a', href=True):
-        href = link['href']
-        # Key filtering logic:
-        # 1. Link path must contain the target year (e.g., "/2025/")
-        # 2. Link must end with ".pdf"
-        if f"/{TARGET_YEAR}/" in href and href.lower().endswith('.pdf'):
-            # Convert relative links (e.g., /proceedings/2024/paper.pdf) to absolute URLs
-            full_pdf_url = urljoin(BASE_URL, href)
-            if full_pdf_url not in pdf_links: # Avoid duplicates
-                pdf_links.append(full_pdf_url)
-
-    # 4. Check if papers were found
+    # 3. Check if papers were found
     if not pdf_links:
-        print(f"\nNo {TARGET_YEAR} papers found on the portal.")
+        print(f"\nNo {year} papers found on the portal.")
         print("This likely means papers for this year haven't been released yet. Please run this script after release.")
-        return
+        return counts
 
-    print(f"\nSuccessfully found {len(pdf_links)} papers for {TARGET_YEAR}. Starting download...")
+    print(f"\nSuccessfully found {len(pdf_links)} papers for {year}. Starting download with {workers} workers...")
 
-    # 5. Iterate and download found PDF files
-    for i, pdf_url in enumerate(pdf_links):
-        # Extract filename from URL
+    # 4. Download concurrently; partial files are kept as .part and resumed next time
+    def fetch(pdf_url):
         filename = os.path.basename(pdf_url)
-        save_path = os.path.join(final_save_dir, filename)
-
-        # Check if file exists for resuming/skipping
-        if os.path.exists(save_path):
-            print(f"({i+1}/{len(pdf_links)}) File already exists, skipping: {filename}")
-            continue
-
-        try:
-            print(f"({i+1}/{len(pdf_links)}) Downloading: {filename} ...")
-            pdf_response = requests.get(pdf_url, stream=True, timeout=60)
-            pdf_response.raise_for_status()
-
-            with open(save_path, 'wb') as f:
-                for chunk in pdf_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"  -> Download complete: {filename}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"  -> Download failed: {filename}, Error: {e}")
-            if os.path.exists(save_path):
-                os.remove(save_path) # Cleanup incomplete file
-
-    print(f"\nAll {TARGET_YEAR} downloads completed! Files are saved in: {final_save_dir}")
+        return filename, download_file(session, pdf_url, os.path.join(final_save_dir, filename), retries)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(fetch, url): url for url in pdf_links}
+        for done, future in enumerate(as_completed(futures), start=1):
+            filename = os.path.basename(futures[future])
+            try:
+                _, status = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                log(f"({done}/{len(pdf_links)}) Download failed: {filename}, Error: {e}")
+                continue
+            counts[status] += 1
+            if status == "skipped":
+                log(f"({done}/{len(pdf_links)}) File already exists, skipping: {filename}")
+            else:
+                log(f"({done}/{len(pdf_links)}) Download complete: {filename}")
+
+    print(f"\n{year} downloads finished: {counts['downloaded']} downloaded, "
+          f"{counts['skipped']} skipped, {counts['failed']} failed. Files are saved in: {final_save_dir}")
+    return counts
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download NIME papers for one year from the NIME paper portal.")
+    parser.add_argument("--year", type=int, default=TARGET_YEAR, help=f"Proceedings year (default: {TARGET_YEAR})")
+    parser.add_argument("--out", default=SAVE_BASE_PATH, help="Base directory; PDFs go to <out>/NIME_<year>_Papers")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help=f"Concurrent downloads (default: {DOWNLOAD_WORKERS})")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, help=f"Retries per file (default: {MAX_RETRIES})")
+    parser.add_argument("--papers-url", default=PAPERS_URL, help="Paper listing page")
+    parser.add_argument("--base-url", default=BASE_URL, help="Base for relative PDF links")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    download_nime_papers()
+    args = parse_args()
+    result = download_nime_papers(args.year, args.out, args.workers, args.retries, args.papers_url, args.base_url)
+    sys.exit(1 if result["failed"] else 0)
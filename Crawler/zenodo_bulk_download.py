@@ -0,0 +1,412 @@
+# zenodo_bulk_download.py
+"""
+Bulk-download NIME papers archived on Zenodo (module + CLI version of text_processing.ipynb).
+
+1. Parse DOIs from the NIME bibliography listing (nime_papers.txt).
+2. Fetch each record's files-archive zip concurrently over a pooled session.
+3. Extract the PDFs while the zip is still streaming in, so the archive
+   itself is never written to disk.
+4. Write a per-record report and list missing/failed Zenodo IDs.
+
+    python zenodo_bulk_download.py --papers nime_papers.txt --out "../NIME Papers" --workers 8
+"""
+import os
+import re
+import csv
+import sys
+import zlib
+import struct
+import time
+import argparse
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from download_nime_2025 import BACKOFF_SECONDS, make_session, log
+
+# --- Configuration ---
+PAPERS_TXT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nime_papers.txt")
+OUTPUT_DIR = os.path.join(os.getcwd(), "zenodo_pdfs")
+REPORT_CSV_NAME = "zenodo_report.csv"
+DOWNLOAD_WORKERS = 8
+MAX_RETRIES = 3
+# --- End of Configuration ---
+
+ARCHIVE_URL = "https://zenodo.org/api/records/{}/files-archive"
+ZENODO_PREFIX = "10.5281/zenodo."
+DOI_PATTERN = re.compile(r'DOI\s*:?\s*(10\.\d{4,9}/[^\s,;]+)', re.IGNORECASE)
+
+# DOIs that are wrong in nime_papers.txt (truncated or pointing at an empty record)
+DOI_CORRECTIONS = {
+    # https://www.nime.org/proceedings/2010/nime2010_467.pdf
+    "10.5281/zenodo.117777": "10.5281/zenodo.1177757",
+}
+# Zenodo records whose files live under a neighbouring record id (checked by hand)
+ZENODO_ID_CORRECTIONS = {
+    "1302650": "1302651",
+    "3964607": "3964608",
+    "3964599": "3964600",
+    "3964592": "3964593",
+}
+
+CHUNK_SIZE = 256 * 1024
+# Archives this small are buffered in memory if they cannot be streamed
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+# ---------------------------------------------------------------------------
+# DOI parsing
+# ---------------------------------------------------------------------------
+
+def parse_dois(lines) -> Tuple[List[str], List[str]]:
+    """Return (unique DOIs in listing order, duplicated DOIs).
+
+    Accepts 'DOI: 10.x/y', 'DOI 10.x/y' and trailing punctuation, and applies
+    DOI_CORRECTIONS instead of length asserts.
+    """
+    dois: List[str] = []
+    seen = set()
+    duplicates: List[str] = []
+    for line in lines:
+        match = DOI_PATTERN.search(line)
+        if not match:
+            continue
+        doi = match.group(1).rstrip('.')
+        doi = DOI_CORRECTIONS.get(doi, doi)
+        if doi in seen:
+            if doi not in duplicates:
+                duplicates.append(doi)
+            continue
+        seen.add(doi)
+        dois.append(doi)
+    return dois, duplicates
+
+def zenodo_record_ids(dois: List[str]) -> List[str]:
+    """Zenodo record ids for the Zenodo DOIs (other DOIs, e.g. PubPub, are skipped)."""
+    ids = []
+    for doi in dois:
+        if doi.lower().startswith(ZENODO_PREFIX):
+            record_id = doi[len(ZENODO_PREFIX):]
+            ids.append(ZENODO_ID_CORRECTIONS.get(record_id, record_id))
+    return list(dict.fromkeys(ids))
+
+# ---------------------------------------------------------------------------
+# Streaming zip extraction
+# ---------------------------------------------------------------------------
+
+class StreamingUnsupported(Exception):
+    """The archive uses a layout that cannot be read front to back (e.g. stored + data descriptor)."""
+
+class ChunkReader:
+    """Exact-size reads over an iterator of byte chunks, with push-back."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = bytearray()
+
+    def _fill(self, size: int) -> None:
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+    def read(self, size: int) -> bytes:
+        """Up to size bytes (fewer only at end of stream)."""
+        self._fill(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise EOFError(f"Archive truncated: wanted {size} bytes, got {len(data)}")
+        return data
+
+    def read_some(self) -> bytes:
+        """Whatever is buffered, or the next chunk."""
+        if not self._buffer:
+            self._fill(1)
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def unread(self, data: bytes) -> None:
+        self._buffer[:0] = data
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIG = b'PK\x03\x04'
+DESCRIPTOR_SIG = b'PK\x07\x08'
+
+def _zip64_extra(extra: bytes) -> Optional[List[int]]:
+    """64-bit values of the zip64 extra field (tag 0x0001), or None if the member is not zip64."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from('<HH', extra, pos)
+        if tag == 0x0001:
+            values = extra[pos + 4:pos + 4 + length]
+            return [struct.unpack_from('<Q', values, i)[0] for i in range(0, len(values) - 7, 8)]
+        pos += 4 + length
+    return None
+
+def iter_zip_members(reader: ChunkReader) -> Iterator[Tuple[str, Iterator[bytes]]]:
+    """Yield (member name, data chunk iterator) by walking local file headers front to back.
+
+    Each member's data iterator must be exhausted before advancing; CRC32 and
+    sizes are verified. Supports stored members with known sizes and deflated
+    members with or without a trailing data descriptor.
+    """
+    while True:
+        signature = reader.read(4)
+        if signature != LOCAL_HEADER_SIG:
+            # Central directory (PK\x01\x02) or end record: no more members
+            return
+        header = LOCAL_HEADER.unpack(signature + reader.read_exact(LOCAL_HEADER.size - 4))
+        _, _, flags, method, _, _, crc, csize, usize, name_len, extra_len = header
+        name = reader.read_exact(name_len).decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = reader.read_exact(extra_len)
+        has_descriptor = bool(flags & 0x08)
+        if flags & 0x01:
+            raise StreamingUnsupported(f"Encrypted member: {name}")
+        zip64 = _zip64_extra(extra)
+        if zip64 is not None:
+            fields = list(zip64)
+            if usize == 0xFFFFFFFF and fields:
+                usize = fields.pop(0)
+            if csize == 0xFFFFFFFF and fields:
+                csize = fields.pop(0)
+
+        state = {'crc': 0, 'size': 0}
+
+        def chunks():
+            if method == 0:
+                if has_descriptor:
+                    raise StreamingUnsupported(f"Stored member with data descriptor: {name}")
+                remaining = csize
+                while remaining:
+                    data = reader.read(min(CHUNK_SIZE, remaining))
+                    if not data:
+                        raise EOFError(f"Archive truncated in {name}")
+                    remaining -= len(data)
+                    state['crc'] = zlib.crc32(data, state['crc'])
+                    state['size'] += len(data)
+                    yield data
+            elif method == 8:
+                inflater = zlib.decompressobj(-15)
+                while not inflater.eof:
+                    data = reader.read_some()
+                    if not data:
+                        raise EOFError(f"Archive truncated in {name}")
+                    out = inflater.decompress(data)
+                    if out:
+                        state['crc'] = zlib.crc32(out, state['crc'])
+                        state['size'] += len(out)
+                        yield out
+                reader.unread(inflater.unused_data)
+            else:
+                raise StreamingUnsupported(f"Compression method {method} in {name}")
+
+        yield name, chunks()
+
+        expected_crc, expected_size = crc, usize
+        if has_descriptor:
+            descriptor = reader.read_exact(4)
+            if descriptor == DESCRIPTOR_SIG:
+                descriptor = reader.read_exact(4)
+            # crc32, then compressed/uncompressed sizes (8 bytes each for zip64 members)
+            expected_crc = struct.unpack('<I', descriptor)[0]
+            if zip64 is not None:
+                expected_size = struct.unpack('<QQ', reader.read_exact(16))[1]
+            else:
+                expected_size = struct.unpack('<II', reader.read_exact(8))[1]
+        if state['crc'] != expected_crc or expected_size != state['size']:
+            raise zipfile.BadZipFile(f"CRC/size mismatch in {name}")
+
+def _write_member(chunks: Iterator[bytes], path: str) -> None:
+    part_path = path + ".part"
+    with open(part_path, 'wb') as f:
+        for data in chunks:
+            f.write(data)
+    os.replace(part_path, path)
+
+def _pdf_target(out_dir: str, record_id: str, member: str, claimed: Dict[str, str]) -> str:
+    """Flat output path for a PDF member; name clashes between records get a record-id prefix."""
+    filename = os.path.basename(member)
+    owner = claimed.setdefault(filename, record_id)
+    if owner != record_id:
+        filename = f"{record_id}_{filename}"
+    return os.path.join(out_dir, filename)
+
+def extract_pdfs_from_stream(chunks: Iterator[bytes], out_dir: str, record_id: str,
+                             claimed: Dict[str, str]) -> List[str]:
+    """Extract every .pdf member of a streamed zip into out_dir, discarding other members."""
+    written = []
+    for member, data in iter_zip_members(ChunkReader(chunks)):
+        if member.lower().endswith('.pdf') and not member.endswith('/'):
+            path = _pdf_target(out_dir, record_id, member, claimed)
+            _write_member(data, path)
+            written.append(path)
+        else:
+            for _ in data:
+                pass
+    return written
+
+def extract_pdfs_from_zipfile(archive, out_dir: str, record_id: str, claimed: Dict[str, str]) -> List[str]:
+    """Fallback for archives that cannot be streamed: read them through the central directory."""
+    written = []
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.filename.lower().endswith('.pdf') and not info.is_dir():
+                path = _pdf_target(out_dir, record_id, info.filename, claimed)
+                with zf.open(info) as src:
+                    _write_member(iter(lambda: src.read(CHUNK_SIZE), b''), path)
+                written.append(path)
+    return written
+
+# ---------------------------------------------------------------------------
+# Download
+# ---------------------------------------------------------------------------
+
+def retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Delay requested by a 429 response's Retry-After header (seconds or HTTP date), if any."""
+    if response is None or response.status_code != 429:
+        return None
+    value = response.headers.get('Retry-After', '').strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def fetch_record(session: requests.Session, record_id: str, out_dir: str, claimed: Dict[str, str],
+                 archive_url: str = ARCHIVE_URL, retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_SECONDS) -> List[str]:
+    """Download one record's files-archive and extract its PDFs. Raises on failure.
+
+    Failed attempts are retried with exponential backoff; a 429's
+    Retry-After is honored when it asks for a longer wait.
+    """
+    url = archive_url.format(record_id)
+    last_error: Optional[Exception] = None
+    for attempt in range(retries + 1):
+        requested: Optional[float] = None
+        try:
+            with session.get(url, stream=True, timeout=120) as response:
+                response.raise_for_status()
+                try:
+                    return extract_pdfs_from_stream(response.iter_content(CHUNK_SIZE), out_dir, record_id, claimed)
+                except StreamingUnsupported:
+                    pass
+            # Rare layouts: spool the archive (in memory when small) and use the central directory
+            with session.get(url, stream=True, timeout=120) as response, \
+                    tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+                response.raise_for_status()
+                for data in response.iter_content(CHUNK_SIZE):
+                    spool.write(data)
+                spool.seek(0)
+                return extract_pdfs_from_zipfile(spool, out_dir, record_id, claimed)
+        except requests.exceptions.HTTPError as e:
+            # 404/410: the record has no files archive, retrying will not help
+            if e.response is not None and e.response.status_code in (404, 410):
+                raise
+            last_error = e
+            requested = retry_after_seconds(e.response)
+        except (requests.exceptions.RequestException, EOFError, zipfile.BadZipFile, zlib.error) as e:
+            last_error = e
+        if attempt < retries:
+            delay = max(backoff * (2 ** attempt), requested or 0.0)
+            log(f"  -> Retry {attempt + 1}/{retries} for record {record_id} in {delay:.1f}s: {last_error}")
+            time.sleep(delay)
+    raise last_error
+
+def read_report(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return {row['zenodo_id']: row for row in csv.DictReader(f)}
+
+def write_report(path: str, rows: List[dict]) -> None:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['zenodo_id', 'status', 'pdf_count', 'files', 'error'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+def download_zenodo_archives(record_ids: List[str], out_dir: str, workers: int = DOWNLOAD_WORKERS,
+                             retries: int = MAX_RETRIES, archive_url: str = ARCHIVE_URL,
+                             force: bool = False) -> List[dict]:
+    """Download and extract all records concurrently; records marked ok in a previous report are skipped."""
+    os.makedirs(out_dir, exist_ok=True)
+    report_path = os.path.join(out_dir, REPORT_CSV_NAME)
+    previous = {} if force else read_report(report_path)
+    results = {rid: row for rid, row in previous.items() if row['status'] == 'ok' and rid in record_ids}
+    todo = [rid for rid in record_ids if rid not in results]
+    print(f"{len(record_ids)} Zenodo records: {len(results)} already done, {len(todo)} to fetch")
+
+    # Filenames already owned by earlier records keep their owner across runs
+    claimed: Dict[str, str] = {}
+    for rid, row in results.items():
+        for name in filter(None, row['files'].split(';')):
+            claimed.setdefault(name, rid)
+
+    session = make_session(max(workers, 1))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(fetch_record, session, rid, out_dir, claimed, archive_url, retries): rid
+                   for rid in todo}
+        for done, future in enumerate(as_completed(futures), start=1):
+            rid = futures[future]
+            try:
+                paths = future.result()
+            except Exception as e:
+                results[rid] = {'zenodo_id': rid, 'status': 'failed', 'pdf_count': 0, 'files': '', 'error': str(e)}
+                log(f"({done}/{len(todo)}) Record {rid} failed: {e}")
+                continue
+            status = 'ok' if paths else 'no_pdf'
+            results[rid] = {'zenodo_id': rid, 'status': status, 'pdf_count': len(paths),
+                            'files': ';'.join(os.path.basename(p) for p in paths), 'error': ''}
+            log(f"({done}/{len(todo)}) Record {rid}: {len(paths)} PDF(s)")
+
+    rows = [results[rid] for rid in record_ids if rid in results]
+    write_report(report_path, rows)
+    return rows
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download NIME papers from Zenodo files-archives, extracting PDFs on the fly.")
+    parser.add_argument("--papers", default=PAPERS_TXT, help="NIME bibliography listing with DOIs (default: nime_papers.txt)")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="Directory for the extracted PDFs and the report")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help=f"Concurrent downloads (default: {DOWNLOAD_WORKERS})")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, help=f"Retries per record (default: {MAX_RETRIES})")
+    parser.add_argument("--limit", type=int, default=0, help="Only fetch the first N records (for testing)")
+    parser.add_argument("--force", action="store_true", help="Re-fetch records already reported as ok")
+    parser.add_argument("--archive-url", default=ARCHIVE_URL, help="Archive URL template with {} for the record id")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with open(args.papers, 'r', encoding='utf-8') as f:
+        dois, duplicates = parse_dois(f)
+    record_ids = zenodo_record_ids(dois)
+    print(f"[info] {len(dois)} DOIs parsed, {len(record_ids)} Zenodo records, "
+          f"{len(dois) - len(record_ids)} other DOIs (e.g. PubPub) skipped")
+    if duplicates:
+        print(f"[info] Duplicate DOIs in listing: {', '.join(duplicates)}")
+    if args.limit:
+        record_ids = record_ids[:args.limit]
+
+    rows = download_zenodo_archives(record_ids, args.out, args.workers, args.retries, args.archive_url, args.force)
+
+    problems = [row for row in rows if row['status'] != 'ok']
+    total_pdfs = sum(int(row['pdf_count']) for row in rows)
+    print(f"\n{total_pdfs} PDFs from {len(rows) - len(problems)} records saved in {args.out}")
+    if problems:
+        print(f"{len(problems)} problem records (see {REPORT_CSV_NAME}):")
+        for row in problems:
+            print(f"  {row['zenodo_id']}: {row['status']} {row['error']}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
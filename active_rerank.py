@@ -0,0 +1,390 @@
+# active_rerank.py
+"""
+Active-learning re-ranking of kwic_context_screening.csv from the labels screened so far.
+
+A linear classifier (logistic regression, AdaGrad updates) is trained on
+sparse features of each paper's snippets: hashed word unigrams and bigrams
+of Aggregated_Context (scaled to length TEXT_SCALE), the log counts of the
+scoring vocabulary in those snippets, and the standardized Hit_Count and
+Auto_Priority_Score, so the model learns corrections to the fixed score.
+The model and the labels it has seen are kept in MODEL_NPZ. Every run only
+learns from labels that are new since the last run, which takes
+milliseconds; if an earlier label was changed or removed, the model is
+retrained from scratch. The per-paper text features are cached in
+FEATURES_NPZ, keyed by pdf_name and a hash of the paper's
+Aggregated_Context, Hit_Count and Auto_Priority_Score, so a save in
+--watch mode only featurizes the rows that changed.
+
+The unlabeled papers are then re-ranked:
+    relevance    most likely KEEP first (find the kept set quickly)
+    uncertainty  probability closest to 0.5 first (most informative labels)
+and written to QUEUE_CSV, or back into the screening CSV with --in-place
+(labeled rows first, in their previous order). Before any label exists
+the Auto_Priority_Score order is kept.
+
+--watch re-ranks each time the screening CSV is saved. --simulate replays
+the existing labels to count how many papers a screener would read to
+find the KEEP(1) papers, compared with the Auto_Priority_Score order.
+
+Usage:
+    python active_rerank.py [--strategy relevance|uncertainty] [--in-place] [--watch]
+    python active_rerank.py --simulate
+"""
+import os
+import sys
+import time
+import zlib
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kwic_screening import (KWIC_SCREENING_CSV, LABEL_COLUMNS, OUTPUT_DIR, TARGET_KEYWORDS,
+                            build_term_matrix, scoring_terms)
+
+MODEL_NPZ = os.path.join(OUTPUT_DIR, "active_model.npz")
+FEATURES_NPZ = os.path.join(OUTPUT_DIR, "active_features.npz")
+QUEUE_CSV = os.path.join(OUTPUT_DIR, "active_queue.csv")
+LABEL_COLUMN = LABEL_COLUMNS[0]
+STRATEGIES = ["relevance", "uncertainty"]
+SCORE_COLUMNS = ["Active_Relevance", "Active_Uncertainty"]
+
+HASH_BITS = 18
+TERMS = scoring_terms(TARGET_KEYWORDS)
+# Hashed n-grams, then Hit_Count and Auto_Priority_Score, then the scoring terms
+DENSE_OFFSET = 1 << HASH_BITS
+TERM_OFFSET = DENSE_OFFSET + 2
+N_FEATURES = TERM_OFFSET + len(TERMS)
+TEXT_SCALE = 0.3
+LEARNING_RATE = 0.2
+BATCH_SIZE = 32
+PASSES = 10
+SEED = 0
+# Cached feature rows are dropped when the featurization settings change
+FEATURE_VERSION = f"{HASH_BITS}-{TEXT_SCALE}-{zlib.crc32(chr(0).join(TERMS).encode('utf-8'))}"
+
+def tokens(text: str) -> List[str]:
+    words = text.lower().replace('[', ' ').replace(']', ' ').split()
+    words = [w.strip('.,;:()"\'') for w in words]
+    words = [w for w in words if w]
+    return words + [a + ' ' + b for a, b in zip(words, words[1:])]
+
+def standardized(values: np.ndarray) -> np.ndarray:
+    std = values.std()
+    return (values - values.mean()) / std if std else np.zeros_like(values)
+
+def row_keys(df: pd.DataFrame) -> List[str]:
+    """Feature cache key per row: pdf_name plus a hash of the columns its features come from."""
+    columns = zip(df['pdf_name'].astype(str), df['Aggregated_Context'].astype(str),
+                  df['Hit_Count'].astype(str), df['Auto_Priority_Score'].astype(str))
+    return [name + '\t' + hashlib.sha1('\0'.join((context, hits, auto)).encode('utf-8')).hexdigest()
+            for name, context, hits, auto in columns]
+
+def text_features(contexts: List[str]) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+    """Per context: (indices, values, number of n-gram entries) of its hashed n-grams followed by its scoring terms."""
+    term_counts = build_term_matrix([c.lower() for c in contexts], TERMS)
+    rows = []
+    for i, context in enumerate(contexts):
+        counts: Dict[int, float] = {}
+        for token in tokens(context):
+            # crc32 is stable across runs, so saved weights stay aligned with the features
+            h = zlib.crc32(token.encode('utf-8')) & (DENSE_OFFSET - 1)
+            counts[h] = counts.get(h, 0.0) + 1.0
+        row = np.array(list(counts.values()), dtype=np.float64)
+        row *= TEXT_SCALE / (np.linalg.norm(row) or 1.0)
+        terms = np.nonzero(term_counts[i])[0]
+        rows.append((np.concatenate((np.fromiter(counts, dtype=np.int64, count=len(counts)), TERM_OFFSET + terms)),
+                     np.concatenate((row, np.log1p(term_counts[i, terms]))), len(counts)))
+    return rows
+
+def load_feature_cache(path: str) -> Dict[str, Tuple[np.ndarray, np.ndarray, int]]:
+    """Cached text_features rows by row key (empty when missing, unreadable or outdated)."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path) as data:
+            if str(data['version']) != FEATURE_VERSION:
+                return {}
+            indptr, indices, values = data['indptr'], data['indices'], data['values']
+            return {key: (indices[indptr[i]:indptr[i + 1]], values[indptr[i]:indptr[i + 1]], int(n))
+                    for i, (key, n) in enumerate(zip(data['keys'].tolist(), data['ngrams']))}
+    except Exception as e:
+        print(f"   Warning: Ignoring unreadable feature cache {path}: {e}")
+        return {}
+
+def save_feature_cache(path: str, keys: List[str], rows: List[Tuple[np.ndarray, np.ndarray, int]]) -> None:
+    tmp_path = path + ".tmp.npz"
+    lengths = np.array([len(indices) for indices, _, _ in rows], dtype=np.int64)
+    np.savez(tmp_path, version=np.array(FEATURE_VERSION), keys=np.array(keys, dtype=str),
+             indptr=np.concatenate(([0], np.cumsum(lengths))),
+             indices=np.concatenate([r[0] for r in rows]) if rows else np.empty(0, dtype=np.int64),
+             values=np.concatenate([r[1] for r in rows]) if rows else np.empty(0),
+             ngrams=np.array([n for _, _, n in rows], dtype=np.int64))
+    os.replace(tmp_path, path)
+
+def featurize(df: pd.DataFrame, cache_path: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse feature rows (CSR indptr, indices, values) for the screening table.
+
+    With cache_path, text features of unchanged rows are read from that
+    cache and only new or changed rows are computed; the standardized
+    Hit_Count and Auto_Priority_Score depend on the whole table and are
+    always recomputed.
+    """
+    contexts = df['Aggregated_Context'].astype(str).tolist()
+    hits = standardized(np.log1p(pd.to_numeric(df['Hit_Count'], errors='coerce').fillna(0).to_numpy()))
+    auto = pd.to_numeric(df['Auto_Priority_Score'], errors='coerce').fillna(0).to_numpy()
+    auto = standardized(np.sign(auto) * np.log1p(np.abs(auto)))
+
+    if cache_path:
+        keys = row_keys(df)
+        cache = load_feature_cache(cache_path)
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+        cache.update(zip((keys[i] for i in missing), text_features([contexts[i] for i in missing])))
+        rows = [cache[key] for key in keys]
+        if missing or len(cache) != len(set(keys)):
+            save_feature_cache(cache_path, keys, rows)
+    else:
+        rows = text_features(contexts)
+
+    dense = np.array([DENSE_OFFSET, DENSE_OFFSET + 1], dtype=np.int64)
+    index_parts, value_parts = [], []
+    for i, (indices, values, n) in enumerate(rows):
+        index_parts += [indices[:n], dense, indices[n:]]
+        value_parts += [values[:n], np.array([hits[i], auto[i]]), values[n:]]
+    lengths = np.array([len(indices) + 2 for indices, _, _ in rows], dtype=np.int64)
+    return (np.concatenate(([0], np.cumsum(lengths))),
+            np.concatenate(index_parts) if index_parts else np.empty(0, dtype=np.int64),
+            np.concatenate(value_parts) if value_parts else np.empty(0, dtype=np.float64))
+
+def select_rows(X: Tuple[np.ndarray, np.ndarray, np.ndarray], rows: np.ndarray):
+    indptr, indices, values = X
+    spans = [np.arange(indptr[r], indptr[r + 1]) for r in rows]
+    picked = np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+    lengths = np.array([len(s) for s in spans], dtype=np.int64)
+    return np.concatenate(([0], np.cumsum(lengths))), indices[picked], values[picked]
+
+class OnlineLogistic:
+    """Logistic regression over sparse rows, updated with mini-batch AdaGrad."""
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.weights = np.zeros(n_features)
+        self.grad_sq = np.zeros(n_features)
+        self.bias = 0.0
+        self.bias_sq = 0.0
+        self.seen: Dict[str, int] = {}
+
+    def decision(self, X) -> np.ndarray:
+        indptr, indices, values = X
+        products = self.weights[indices] * values
+        row_sums = np.add.reduceat(products, indptr[:-1]) if len(products) else np.zeros(len(indptr) - 1)
+        # reduceat returns the next row's first product for empty rows; none occur (the dense features are always set)
+        return row_sums + self.bias
+
+    def predict(self, X) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-self.decision(X)))
+
+    def update(self, X, y: np.ndarray, class_weight: Dict[int, float]) -> None:
+        """PASSES shuffled passes of mini-batch AdaGrad over the rows of X."""
+        rng = np.random.RandomState(SEED + len(self.seen))
+        n = len(y)
+        for _ in range(PASSES):
+            order = rng.permutation(n)
+            for start in range(0, n, BATCH_SIZE):
+                rows = order[start:start + BATCH_SIZE]
+                batch = select_rows(X, rows)
+                weight = np.array([class_weight[int(v)] for v in y[rows]])
+                error = (self.predict(batch) - y[rows]) * weight / len(rows)
+                per_value = np.repeat(error, np.diff(batch[0])) * batch[2]
+                grad = np.bincount(batch[1], weights=per_value, minlength=len(self.weights))
+                touched = np.unique(batch[1])
+                self.grad_sq[touched] += grad[touched] ** 2
+                self.weights[touched] -= LEARNING_RATE * grad[touched] / (np.sqrt(self.grad_sq[touched]) + 1e-12)
+                bias_grad = error.sum()
+                self.bias_sq += bias_grad ** 2
+                if self.bias_sq:
+                    self.bias -= LEARNING_RATE * bias_grad / np.sqrt(self.bias_sq)
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp.npz"
+        names = np.array(list(self.seen), dtype=str)
+        labels = np.array(list(self.seen.values()), dtype=np.int8)
+        np.savez(tmp_path, weights=self.weights, grad_sq=self.grad_sq,
+                 bias=np.array([self.bias, self.bias_sq]), names=names, labels=labels)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["OnlineLogistic"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if len(data['weights']) != N_FEATURES:
+                    return None
+                model = cls()
+                model.weights, model.grad_sq = data['weights'].copy(), data['grad_sq'].copy()
+                model.bias, model.bias_sq = (float(v) for v in data['bias'])
+                model.seen = dict(zip(data['names'].tolist(), (int(v) for v in data['labels'])))
+        except Exception as e:
+            print(f"   Warning: Ignoring unreadable model {path}: {e}")
+            return None
+        return model
+
+def labels_of(df: pd.DataFrame) -> pd.Series:
+    """pdf_name -> 0/1 for rows with a KEEP(1)/EXCLUDE(0) decision."""
+    values = df[LABEL_COLUMN].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    labeled = values.isin(['0', '1'])
+    return pd.Series(values[labeled].astype(int).to_numpy(), index=df.loc[labeled, 'pdf_name'])
+
+def class_weights(labels: pd.Series) -> Dict[int, float]:
+    """Balance KEEP against the far more frequent EXCLUDE."""
+    n_pos, n_neg = int((labels == 1).sum()), int((labels == 0).sum())
+    if not n_pos or not n_neg:
+        return {0: 1.0, 1: 1.0}
+    total = n_pos + n_neg
+    return {0: total / (2 * n_neg), 1: total / (2 * n_pos)}
+
+def train(model: Optional[OnlineLogistic], df: pd.DataFrame, X) -> Tuple[OnlineLogistic, int]:
+    """Learn from labels the model has not seen. Returns (model, number of new labels)."""
+    labels = labels_of(df)
+    if model is not None and any(labels.get(name) != label for name, label in model.seen.items()):
+        print("   Earlier labels changed or were removed; retraining from scratch")
+        model = None
+    model = model or OnlineLogistic()
+    new = [name for name in labels.index if name not in model.seen]
+    if new:
+        position = pd.Series(np.arange(len(df)), index=df['pdf_name'])
+        rows = position.loc[new].to_numpy()
+        model.update(select_rows(X, rows), labels.loc[new].to_numpy(dtype=np.float64), class_weights(labels))
+        model.seen.update((name, int(labels[name])) for name in new)
+    return model, len(new)
+
+def rerank(df: pd.DataFrame, model: OnlineLogistic, X, strategy: str) -> pd.DataFrame:
+    """Score every paper; labeled rows first in their current order, then unlabeled by strategy."""
+    relevance = model.predict(X) if model.seen else np.full(len(df), np.nan)
+    df = df.assign(**{SCORE_COLUMNS[0]: relevance, SCORE_COLUMNS[1]: 1 - 2 * np.abs(relevance - 0.5)})
+    labeled = df['pdf_name'].isin(labels_of(df).index)
+    unlabeled = df[~labeled]
+    if model.seen:
+        key = SCORE_COLUMNS[0] if strategy == "relevance" else SCORE_COLUMNS[1]
+        unlabeled = unlabeled.sort_values(key, ascending=False, kind='stable')
+    return pd.concat([df[labeled], unlabeled])
+
+def load_screening(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    return df.drop(columns=[c for c in SCORE_COLUMNS if c in df.columns])
+
+def refresh(args) -> None:
+    """One update: learn new labels, re-rank, write the queue (or the screening CSV)."""
+    start = time.perf_counter()
+    df = load_screening(args.screening)
+    X = featurize(df, args.features)
+    model = None if args.reset else OnlineLogistic.load(args.model)
+    t_train = time.perf_counter()
+    model, n_new = train(model, df, X)
+    ranked = rerank(df, model, X, args.strategy)
+    t_done = time.perf_counter()
+    model.save(args.model)
+
+    unlabeled = ranked[~ranked['pdf_name'].isin(model.seen)]
+    if args.in_place:
+        ranked.to_csv(args.screening, index=False, encoding='utf-8-sig')
+        target = args.screening
+    else:
+        columns = ['Year', 'pdf_name'] + SCORE_COLUMNS + ['Hit_Count', 'Auto_Priority_Score', 'Aggregated_Context']
+        unlabeled[columns].to_csv(args.queue, index=False, encoding='utf-8-sig')
+        target = args.queue
+    print(f"Learned {n_new} new labels ({len(model.seen)} total) and re-ranked {len(unlabeled)} unlabeled papers "
+          f"by {args.strategy} in {(t_done - t_train) * 1000:.0f} ms (load + features {(t_train - start) * 1000:.0f} ms) "
+          f"-> {target}")
+    for _, row in unlabeled.head(args.top).iterrows():
+        print(f"  {row[SCORE_COLUMNS[0]]:.3f}  [{row['Year']}] {row['pdf_name']}")
+
+def simulate(args) -> None:
+    """Replay the existing labels in batches and count papers read until every KEEP(1) is found."""
+    df = load_screening(args.screening)
+    labels = labels_of(df)
+    df = df[df['pdf_name'].isin(labels.index)].reset_index(drop=True)
+    y = labels.loc[df['pdf_name']].to_numpy()
+    X = featurize(df)
+    auto_order = np.argsort(-pd.to_numeric(df['Auto_Priority_Score']).to_numpy(), kind='stable')
+
+    model = OnlineLogistic()
+    read: List[int] = list(auto_order[:args.batch])
+    timings = []
+    while len(read) < len(df):
+        seen = set(read)
+        new = [r for r in read if df.at[r, 'pdf_name'] not in model.seen]
+        batch_labels = pd.Series(y[read], index=df.loc[read, 'pdf_name'])
+        t0 = time.perf_counter()
+        model.update(select_rows(X, np.array(new)), y[new].astype(np.float64), class_weights(batch_labels))
+        model.seen.update((df.at[r, 'pdf_name'], int(y[r])) for r in new)
+        scores = model.predict(X)
+        timings.append(time.perf_counter() - t0)
+        remaining = [r for r in np.argsort(-scores, kind='stable') if r not in seen]
+        read.extend(remaining[:args.batch])
+
+    total_keep = int(y.sum())
+    print(f"{len(df)} labeled papers, {total_keep} KEEP(1); batches of {args.batch}, "
+          f"median update + re-rank {np.median(timings) * 1000:.1f} ms")
+    for share in (0.8, 0.9, 0.95, 1.0):
+        need = int(np.ceil(share * total_keep))
+        active = int(np.searchsorted(np.cumsum(y[read]), need) + 1)
+        auto = int(np.searchsorted(np.cumsum(y[auto_order]), need) + 1)
+        print(f"  papers read to find {share:.0%} of KEEP(1): active {active}, Auto_Priority_Score order {auto}")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-rank unlabeled papers with an online classifier trained on the screening labels.")
+    parser.add_argument("--screening", default=KWIC_SCREENING_CSV, help=f"Screening CSV (default: {KWIC_SCREENING_CSV})")
+    parser.add_argument("--model", default=MODEL_NPZ, help=f"Model state (default: {MODEL_NPZ})")
+    parser.add_argument("--features", default=FEATURES_NPZ, help=f"Feature cache (default: {FEATURES_NPZ})")
+    parser.add_argument("--queue", default=QUEUE_CSV, help=f"Ranked unlabeled papers (default: {QUEUE_CSV})")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="relevance",
+                        help="relevance = likely KEEP first (default), uncertainty = most informative first")
+    parser.add_argument("--in-place", action="store_true",
+                        help="Reorder the screening CSV itself (labeled rows first) instead of writing the queue")
+    parser.add_argument("--watch", action="store_true", help="Re-rank every time the screening CSV is saved")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between checks in --watch mode")
+    parser.add_argument("--top", type=int, default=10, help="Papers to print from the top of the queue")
+    parser.add_argument("--reset", action="store_true", help="Discard the saved model and retrain from all labels")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Replay the existing labels and report papers read to find the KEEP(1) set")
+    parser.add_argument("--batch", type=int, default=20, help="Labels per round in --simulate (default: 20)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.screening):
+        print(f"Error: Screening CSV not found: {args.screening}")
+        print("Please run: python kwic_screening.py")
+        sys.exit(1)
+    if args.simulate:
+        simulate(args)
+        return
+
+    refresh(args)
+    if not args.watch:
+        return
+    print(f"Watching {args.screening} (Ctrl+C to stop)...")
+    last = os.stat(args.screening).st_mtime_ns
+    try:
+        while True:
+            time.sleep(args.interval)
+            try:
+                mtime = os.stat(args.screening).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime != last:
+                args.reset = False
+                try:
+                    refresh(args)
+                except Exception as e:
+                    # A half-written save from the spreadsheet; try again on the next change
+                    print(f"   Warning: Could not re-rank: {e}")
+                last = os.stat(args.screening).st_mtime_ns
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
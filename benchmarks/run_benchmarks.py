@@ -0,0 +1,179 @@
+# benchmarks/run_benchmarks.py
+"""
+Micro-benchmarks for the pipeline's hot paths on a synthetic corpus.
+
+Benchmarks (throughput in papers per second, best of --repeat runs):
+    kwic_snippets             kwic_screening.get_kwic_snippets over every text
+    kwic_aggregate            kwic_screening IDF + aggregate_papers (scoring) on the snippet table
+    kwic_hits                 kwic_screening.find_keyword_hits (offsets only) over every text
+    kwic_aggregate_hits       kwic_screening IDF + aggregate_hits (snippets cut per paper) on the hit arrays
+    corpus_read_files         kwic_screening.iter_corpus_texts (one open/read/decode per .txt)
+    corpus_read_pack          corpus_pack.CorpusPack.iter_texts (one memory-mapped pack file)
+    minhash_signatures        near_duplicates.MinHasher shingling + signature per text
+    filter_search_keywords    filter_renamed_pdfs_combined.search_keywords_in_text
+    filter_remove_references  filter_renamed_pdfs_combined.remove_references_section
+    pdfminer_extract          filter_renamed_pdfs_combined.extract_text_from_pdf
+    pypdf_extract             extract_keyboard_pdfs_to_txt.extract_text_from_pdf
+
+Results are written to --output. With --save-baseline they become the new
+baseline; otherwise they are compared with the baseline and the script
+exits with status 1 if any benchmark's throughput dropped by more than
+--threshold (default 20%). Baselines are machine-specific.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --papers 10000 --pdfs 50
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import kwic_screening  # noqa: E402
+import filter_renamed_pdfs_combined as filter_stage  # noqa: E402
+import extract_keyboard_pdfs_to_txt as extract_stage  # noqa: E402
+from corpus_pack import CorpusPack, build_pack  # noqa: E402
+from near_duplicates import MinHasher  # noqa: E402
+from synthetic_corpus import write_pdf_corpus, write_text_corpus  # noqa: E402
+
+BASELINE_JSON = os.path.join(BENCH_DIR, "baseline.json")
+LATEST_JSON = os.path.join(BENCH_DIR, "latest.json")
+
+def best_time(fn: Callable[[], None], repeat: int) -> float:
+    """Minimum wall time of fn over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_suite(texts: List[str], txt_files: List[Path], pdf_files: List[str], repeat: int) -> Dict[str, dict]:
+    """Time every benchmark and return {name: {items, seconds, throughput}}."""
+    results = {}
+
+    def record(name: str, items: int, fn: Callable[[], None]):
+        seconds = best_time(fn, repeat)
+        results[name] = {"items": items, "seconds": round(seconds, 6),
+                         "throughput": round(items / seconds, 3) if seconds > 0 else None}
+        print(f"  {name:<26} {items:>7} items  {seconds:9.4f} s  {items / seconds:12.1f} items/s")
+
+    keywords = kwic_screening.TARGET_KEYWORDS
+    record("kwic_snippets", len(texts),
+           lambda: [kwic_screening.get_kwic_snippets(t, keywords) for t in texts])
+
+    details = kwic_screening.extract_kwic_details(txt_files)
+    record("kwic_aggregate", len(txt_files),
+           lambda: kwic_screening.aggregate_papers(details, kwic_screening.compute_idf_weights(details, keywords)))
+    record("kwic_hits", len(texts), lambda: [kwic_screening.find_keyword_hits(t, keywords) for t in texts])
+    hits = kwic_screening.collect_kwic_hits(txt_files)
+    record("kwic_aggregate_hits", len(txt_files),
+           lambda: kwic_screening.aggregate_hits(hits, hits.idf_weights()))
+
+    if txt_files:
+        record("corpus_read_files", len(txt_files), lambda: list(kwic_screening.iter_corpus_texts(txt_files)))
+        text_dir = os.path.dirname(txt_files[0])
+        pack_path = os.path.join(os.path.dirname(text_dir), "corpus.pack")
+        build_pack(text_dir, pack_path)
+        with CorpusPack(pack_path) as pack:
+            record("corpus_read_pack", len(pack), lambda: list(pack.iter_texts()))
+
+    hasher = MinHasher()
+    record("minhash_signatures", len(texts), lambda: [hasher.signature(hasher.shingles(t)) for t in texts])
+
+    record("filter_search_keywords", len(texts),
+           lambda: [filter_stage.search_keywords_in_text(t, filter_stage.KEYWORDS) for t in texts])
+    record("filter_remove_references", len(texts),
+           lambda: [filter_stage.remove_references_section(t) for t in texts])
+
+    if pdf_files:
+        record("pdfminer_extract", len(pdf_files),
+               lambda: [filter_stage.extract_text_from_pdf(p) for p in pdf_files])
+        record("pypdf_extract", len(pdf_files),
+               lambda: [extract_stage.extract_text_from_pdf(p) for p in pdf_files])
+    return results
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Names of benchmarks whose throughput fell more than threshold below the baseline."""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not current or not base.get("throughput") or not current.get("throughput"):
+            continue
+        ratio = current["throughput"] / base["throughput"]
+        status = "REGRESSION" if ratio < 1 - threshold else "ok"
+        print(f"  {name:<26} {ratio:6.2f}x baseline  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline's hot paths on a synthetic corpus.")
+    parser.add_argument("--papers", type=int, default=1000, help="Synthetic texts (default: 1000; try up to 50000)")
+    parser.add_argument("--pdfs", type=int, default=20, help="Synthetic PDFs for the extractor benchmarks (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest counts (default: 3)")
+    parser.add_argument("--baseline", default=BASELINE_JSON, help=f"Baseline JSON (default: {BASELINE_JSON})")
+    parser.add_argument("--output", default=LATEST_JSON, help=f"Where to write this run's results (default: {LATEST_JSON})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed throughput drop before failing, as a fraction (default: 0.2)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="nime_bench_") as tmp:
+        print(f"Generating {args.papers} synthetic texts and {args.pdfs} PDFs (seed {args.seed})...")
+        txt_files = [Path(p) for p in write_text_corpus(os.path.join(tmp, "texts"), args.papers, args.seed)]
+        pdf_files = write_pdf_corpus(os.path.join(tmp, "pdfs"), args.pdfs, args.seed) if args.pdfs else []
+        texts = [p.read_text(encoding='utf-8') for p in txt_files]
+
+        print(f"Running benchmarks (best of {args.repeat})...")
+        results = run_suite(texts, txt_files, pdf_files, args.repeat)
+
+    report = {
+        "meta": {
+            "papers": args.papers, "pdfs": args.pdfs, "seed": args.seed, "repeat": args.repeat,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("papers") != args.papers or baseline.get("meta", {}).get("pdfs") != args.pdfs:
+        print("Warning: baseline was recorded at a different scale; throughputs may not be comparable.")
+
+    print(f"Comparing with baseline (threshold {args.threshold:.0%})...")
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if regressions:
+        print(f"Throughput regression in: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/synthetic_corpus.py
+"""
+Generate a synthetic NIME-like corpus (plain texts and small PDFs) for benchmarking.
+
+Papers are ~4k words of pypdf-style lines. Keyword and scoring-term rates
+come from the real Keyboard_Interface_Texts corpus (occurrences per 1000
+words) and are scaled per paper by a random topic factor, so most papers
+mention 'interface' and a few are dense with instrument terms. Most papers
+end with a References section (Citations for 2021-2022, as in the real
+proceedings) whose entries also contain keywords, so remove_references_section
+has real work to do.
+
+Files are named nime<year>_<n>.txt / .pdf like the renamed corpus.
+
+Usage:
+    python benchmarks/synthetic_corpus.py texts --papers 1000 --out /tmp/synthetic_texts
+    python benchmarks/synthetic_corpus.py pdfs --papers 50 --out /tmp/synthetic_pdfs
+"""
+import os
+import random
+import argparse
+from typing import Iterator, List, Tuple
+
+# Occurrences per 1000 words in Keyboard_Interface_Texts (2001-2025)
+TERM_RATES = {
+    'organ': 0.08, 'keyboard': 0.53, 'piano': 0.64, 'clavichord': 0.01, 'harpsichord': 0.02,
+    'accordion': 0.03, 'interface': 1.62, 'layout': 0.12,
+    'musical': 5.21, 'expression': 1.79, 'haptic': 0.44, 'force': 0.36, 'sensor': 0.78,
+    'velocity': 0.21, 'synthesizer': 0.22, 'midi': 0.87, 'controller': 0.58, 'timbre': 0.33,
+    'qwerty': 0.01, 'typing': 0.03, 'password': 0.01, 'office': 0.01,
+}
+# Inflected forms and near-misses that exercise the suffix and word-boundary rules
+VARIANTS = {
+    'keyboard': ['keyboards', 'keyboardist', 'Keyboard'],
+    'piano': ['pianos', 'pianist', 'Piano'],
+    'organ': ['organs', 'organist', 'organization', 'organic'],
+    'interface': ['interfaces', 'Interface'],
+    'typing': ['text entry', 'computer keyboard'],
+}
+FILLER = (
+    "the of and a to in is we for that this with on as are by be from an it which our can at or "
+    "sound music performance performer system instrument design study participants control gesture "
+    "mapping audio signal user users play playing new digital model data results section figure "
+    "table paper work based using used between each both also more than these such time note notes"
+).split()
+FIRST_NAMES = ["A.", "B.", "C.", "D.", "E.", "J.", "K.", "M.", "R.", "S."]
+LAST_NAMES = ["Smith", "Garcia", "Tanaka", "Muller", "Rossi", "Kim", "Dubois", "Novak", "Silva", "Cook"]
+YEARS = list(range(2001, 2026))
+WORDS_PER_PAPER = 4200
+WORDS_PER_LINE = 12
+LINES_PER_PAGE = 50
+
+def _paper_vocabulary(rng: random.Random) -> Tuple[List[str], List[float]]:
+    """Word list and cumulative weights for one paper (filler plus scaled term rates)."""
+    topic = rng.lognormvariate(0, 1.0)
+    words, weights = list(FILLER), [1000.0 / len(FILLER) * 0.97] * len(FILLER)
+    for term, rate in TERM_RATES.items():
+        forms = [term] + VARIANTS.get(term, [])
+        factor = topic if term in ('organ', 'keyboard', 'piano', 'clavichord', 'harpsichord', 'accordion') else 1.0
+        for form in forms:
+            words.append(form)
+            weights.append(rate * factor / len(forms))
+    cumulative, total = [], 0.0
+    for w in weights:
+        total += w
+        cumulative.append(total)
+    return words, cumulative
+
+def _lines(words: List[str]) -> Iterator[str]:
+    for i in range(0, len(words), WORDS_PER_LINE):
+        yield " ".join(words[i:i + WORDS_PER_LINE])
+
+def generate_paper_text(rng: random.Random, year: int) -> str:
+    """One synthetic paper: title, body, and (usually) a References/Citations section."""
+    vocab, cum_weights = _paper_vocabulary(rng)
+    n_words = max(500, int(rng.gauss(WORDS_PER_PAPER, WORDS_PER_PAPER / 4)))
+    body = rng.choices(vocab, cum_weights=cum_weights, k=n_words)
+    lines = [" ".join(rng.choices(vocab, cum_weights=cum_weights, k=8)).title(), ""]
+    lines.extend(_lines(body))
+
+    if rng.random() < 0.9:
+        lines.append("Citations" if year in (2021, 2022) else "References")
+        for n in range(rng.randint(8, 25)):
+            author = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            title = " ".join(rng.choices(vocab, cum_weights=cum_weights, k=7))
+            lines.append(f"[{n + 1}] {author}. {title}. In Proceedings of NIME, {rng.choice(YEARS)}.")
+    return "\n".join(lines) + "\n"
+
+def iter_papers(n_papers: int, seed: int = 0) -> Iterator[Tuple[str, str]]:
+    """Yield (stem, text) for n_papers deterministic synthetic papers."""
+    rng = random.Random(seed)
+    for i in range(n_papers):
+        year = YEARS[i % len(YEARS)]
+        yield f"nime{year}_{i:05d}", generate_paper_text(rng, year)
+
+def write_text_corpus(out_dir: str, n_papers: int, seed: int = 0) -> List[str]:
+    """Write n_papers .txt files to out_dir and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for stem, text in iter_papers(n_papers, seed):
+        path = os.path.join(out_dir, stem + ".txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(path: str, text: str, lines_per_page: int = LINES_PER_PAGE) -> None:
+    """Write text as a minimal multi-page PDF (Helvetica, one text object per page)."""
+    lines = text.splitlines() or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>".encode(),
+    ]
+    for i, page in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        content = "BT /F1 9 Tf 12 TL 40 760 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in page) + " ET"
+        stream = content.encode('latin-1', errors='replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(out)
+
+def write_pdf_corpus(out_dir: str, n_papers: int, seed: int = 0) -> List[str]:
+    """Write n_papers small PDFs to out_dir and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for stem, text in iter_papers(n_papers, seed):
+        path = os.path.join(out_dir, stem + ".pdf")
+        make_pdf(path, text)
+        paths.append(path)
+    return paths
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate a synthetic NIME-like corpus.")
+    parser.add_argument("kind", choices=["texts", "pdfs"], help="Plain-text corpus or small PDFs")
+    parser.add_argument("--papers", type=int, default=1000, help="Number of papers (default: 1000)")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    writer = write_text_corpus if args.kind == "texts" else write_pdf_corpus
+    paths = writer(args.out, args.papers, args.seed)
+    print(f"Wrote {len(paths)} synthetic {args.kind} to {args.out}")
+
+if __name__ == "__main__":
+    main()
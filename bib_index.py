@@ -0,0 +1,427 @@
+# bib_index.py
+"""
+Streaming BibTeX parser and persistent key / DOI / paper-ID index over the
+NIME proceedings bibliography (KWIC_Screening/NIME_2001-2025.bib).
+
+The .bib file is read line by line; one entry at a time is held in memory and
+split into fields with a brace-aware scanner. Entries are written to a SQLite
+index next to the .bib, with indexes on citation key, normalized DOI and year.
+Like the metadata store, the index is rebuilt automatically when the .bib's
+size/mtime change and its SHA-256 differs from the indexed one.
+
+The .bib has no NIME paper IDs (nime2002_Oboe, nime2021_44, ...). IDs are
+linked to entries when the merge step resolves them: by DOI when one is
+known, otherwise by finding the entry's title on the first page of the
+paper's extracted text (see match_title). Links are stored in the index,
+so later runs look IDs up directly.
+
+Usage:
+    python bib_index.py build [--bib KWIC_Screening/NIME_2001-2025.bib] [--db ...]
+    python bib_index.py lookup 10.5281/zenodo.1176452
+"""
+import os
+import re
+import sqlite3
+import argparse
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from text_cache import file_sha256
+
+BIB_PATH = os.path.join(os.getcwd(), "KWIC_Screening", "NIME_2001-2025.bib")
+BIB_INDEX_DB = os.path.join(os.getcwd(), "KWIC_Screening", "nime_bib_index.sqlite")
+
+# Fields copied into the index; everything else stays in the raw entry text
+INDEX_FIELDS = ["title", "author", "year", "doi", "keywords", "abstract", "booktitle", "journal", "pages", "address"]
+# Entry types that are not publications
+NON_ENTRY_TYPES = {"comment", "string", "preamble"}
+SCHEMA_VERSION = "1"
+
+# Title matching against extracted text (see match_title)
+TITLE_SEARCH_CHARS = 3000
+TITLE_GRAM = 4
+# Shorter normalized titles ("Now") only count as fuzzy matches, never as exact substrings
+MIN_EXACT_TITLE_CHARS = 12
+MIN_TITLE_SCORE = 0.7
+MIN_TITLE_MARGIN = 0.1
+
+_FIELD_RE = re.compile(r'\s*([A-Za-z][\w:.+-]*)\s*=\s*')
+_ENTRY_HEAD_RE = re.compile(r'@\s*([A-Za-z]+)\s*[{(]\s*')
+_YEAR_RE = re.compile(r'(?:19|20)\d\d')
+_DOI_PREFIX_RE = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+# LaTeX accent commands: \'e, \'{e}, {\"o}
+_ACCENT_RE = re.compile(r'\\([\'"`^~=.uvcHk])\s*\{?([A-Za-z])\}?')
+_ACCENT_MARKS = {
+    "'": "\u0301", '"': "\u0308", "`": "\u0300", "^": "\u0302", "~": "\u0303", "=": "\u0304",
+    ".": "\u0307", "u": "\u0306", "v": "\u030c", "c": "\u0327", "H": "\u030b", "k": "\u0328",
+}
+
+def _brace_delta(line: str) -> int:
+    return (line.count("{") - line.count("\\{")) - (line.count("}") - line.count("\\}"))
+
+def iter_raw_entries(path: str) -> Iterator[str]:
+    """Yield the text of each @entry in a .bib file, reading one line at a time."""
+    lines: List[str] = []
+    depth = 0
+    opened = False
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            if not lines:
+                if not line.lstrip().startswith("@"):
+                    continue  # text between entries is a comment in BibTeX
+                depth = 0
+                opened = False
+            lines.append(line)
+            depth += _brace_delta(line)
+            opened = opened or depth > 0
+            if opened and depth <= 0:
+                yield "".join(lines)
+                lines = []
+    if lines:
+        yield "".join(lines)
+
+def _scan_braced(text: str, start: int) -> int:
+    """Index just past the brace that closes the one at text[start]."""
+    depth = 0
+    i = start
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return len(text)
+
+def _scan_quoted(text: str, start: int) -> int:
+    """Index just past the closing quote of the string starting at text[start] (quotes inside braces don't count)."""
+    depth = 0
+    i = start + 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == '"' and depth == 0:
+            return i + 1
+        i += 1
+    return len(text)
+
+def parse_entry(raw: str) -> Optional[Tuple[str, str, Dict[str, str]]]:
+    """Split one raw entry into (entry_type, key, fields). Returns None for @comment/@string/@preamble."""
+    head = _ENTRY_HEAD_RE.match(raw.lstrip())
+    if not head:
+        return None
+    entry_type = head.group(1).lower()
+    if entry_type in NON_ENTRY_TYPES:
+        return None
+    body = raw.lstrip()[head.end():]
+    key_end = body.find(",")
+    if key_end < 0:
+        return entry_type, body.strip().rstrip("})").strip(), {}
+    key = body[:key_end].strip()
+    fields: Dict[str, str] = {}
+    pos = key_end + 1
+    while True:
+        m = _FIELD_RE.match(body, pos)
+        if not m:
+            break
+        name = m.group(1).lower()
+        pos = m.end()
+        parts = []
+        # Values may be concatenated with '#'
+        while pos < len(body):
+            c = body[pos]
+            if c == "{":
+                end = _scan_braced(body, pos)
+                parts.append(body[pos + 1:end - 1])
+            elif c == '"':
+                end = _scan_quoted(body, pos)
+                parts.append(body[pos + 1:end - 1])
+            else:
+                bare = re.match(r'[^,#}\s)]+', body[pos:])
+                end = pos + (bare.end() if bare else 1)
+                parts.append(bare.group(0) if bare else "")
+            pos = end
+            sep = re.match(r'\s*#\s*', body[pos:])
+            if not sep:
+                break
+            pos += sep.end()
+        fields[name] = "".join(parts)
+        comma = re.match(r'\s*,', body[pos:])
+        if not comma:
+            break
+        pos += comma.end()
+    return entry_type, key, fields
+
+def clean_value(value: str) -> str:
+    """Plain text of a BibTeX field value: LaTeX accents resolved, braces and line breaks removed."""
+    if "\\" in value:
+        value = _ACCENT_RE.sub(lambda m: unicodedata.normalize("NFC", m.group(2) + _ACCENT_MARKS[m.group(1)]), value)
+        value = value.replace("\\&", "&").replace("\\%", "%").replace("\\_", "_").replace("\\$", "$")
+    value = value.replace("{", "").replace("}", "")
+    return re.sub(r"\s+", " ", value).strip()
+
+def normalize_doi(doi: str) -> str:
+    return _DOI_PREFIX_RE.sub("", (doi or "").strip()).strip().lower()
+
+def bib_year(value: str) -> Optional[int]:
+    """Publication year; the last 4-digit year wins, so mangled values like '22--2003' still work."""
+    years = _YEAR_RE.findall(value or "")
+    return int(years[-1]) if years else None
+
+def normalize_title(text: str) -> str:
+    """Lowercase ASCII letters and digits only, for comparing titles with extracted PDF text."""
+    text = unicodedata.normalize("NFKD", clean_value(text)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def iter_bib_entries(path: str = BIB_PATH) -> Iterator[Dict[str, str]]:
+    """Yield one dict per publication: type, key, raw entry text, and the raw field values."""
+    for raw in iter_raw_entries(path):
+        parsed = parse_entry(raw)
+        if parsed is None:
+            continue
+        entry_type, key, fields = parsed
+        yield {"type": entry_type, "key": key, "raw": raw.strip(), **fields}
+
+def build_index(bib_path: str = BIB_PATH, db_path: str = BIB_INDEX_DB) -> int:
+    """(Re)build db_path from bib_path. Returns the number of indexed entries."""
+    stat = os.stat(bib_path)
+    digest = file_sha256(bib_path)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        columns = ", ".join(f'"{c}" TEXT' for c in INDEX_FIELDS if c != "year")
+        conn.execute(
+            f"CREATE TABLE entries (row INTEGER PRIMARY KEY, key TEXT, type TEXT, year INTEGER, "
+            f"doi_norm TEXT, title_norm TEXT, {columns}, raw TEXT)"
+        )
+        conn.execute("CREATE TABLE paper_ids (ID TEXT PRIMARY KEY, key TEXT, method TEXT)")
+        conn.execute("CREATE TABLE index_info (key TEXT PRIMARY KEY, value TEXT)")
+        text_fields = [c for c in INDEX_FIELDS if c != "year"]
+        placeholders = ", ".join("?" for _ in range(6 + len(text_fields)))
+        count = 0
+
+        def rows():
+            nonlocal count
+            for entry in iter_bib_entries(bib_path):
+                count += 1
+                yield (
+                    entry["key"], entry["type"], bib_year(entry.get("year", "")),
+                    normalize_doi(entry.get("doi", "")), normalize_title(entry.get("title", "")),
+                    *(clean_value(entry.get(c, "")) for c in text_fields), entry["raw"],
+                )
+        conn.executemany(
+            f"INSERT INTO entries (key, type, year, doi_norm, title_norm, {', '.join(text_fields)}, raw) "
+            f"VALUES ({placeholders})", rows()
+        )
+        conn.execute("CREATE INDEX idx_entries_key ON entries (key)")
+        conn.execute("CREATE INDEX idx_entries_doi ON entries (doi_norm)")
+        conn.execute("CREATE INDEX idx_entries_year ON entries (year)")
+        conn.executemany("INSERT INTO index_info VALUES (?, ?)", [
+            ("schema", SCHEMA_VERSION),
+            ("bib_size", str(stat.st_size)),
+            ("bib_mtime_ns", str(stat.st_mtime_ns)),
+            ("bib_sha256", digest),
+        ])
+        conn.commit()
+        linked = _carry_over_links(conn, db_path)
+        if linked:
+            print(f"Kept {linked} paper ID links from the previous index")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+def _carry_over_links(conn: sqlite3.Connection, old_db_path: str) -> int:
+    """Copy paper_ids links from the index being replaced, except those to keys no longer in the .bib.
+
+    Returns the number of links kept; an unreadable old index keeps none.
+    """
+    if not os.path.exists(old_db_path):
+        return 0
+    try:
+        conn.execute("ATTACH DATABASE ? AS old", (old_db_path,))
+    except sqlite3.Error as e:
+        print(f"  Warning: Could not read paper ID links from {old_db_path}: {e}")
+        return 0
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO paper_ids (ID, key, method) "
+                "SELECT ID, key, method FROM old.paper_ids WHERE key IN (SELECT key FROM entries)"
+            )
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        print(f"  Warning: Could not read paper ID links from {old_db_path}: {e}")
+        return 0
+    finally:
+        conn.execute("DETACH DATABASE old")
+
+def _index_info(db_path: str) -> Dict[str, str]:
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM index_info"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+
+def ensure_index(bib_path: str = BIB_PATH, db_path: str = BIB_INDEX_DB) -> None:
+    """Build db_path unless it already indexes the same .bib content."""
+    info = _index_info(db_path) if os.path.exists(db_path) else {}
+    if info.get("schema") == SCHEMA_VERSION:
+        stat = os.stat(bib_path)
+        if info.get("bib_size") == str(stat.st_size) and info.get("bib_mtime_ns") == str(stat.st_mtime_ns):
+            return
+        if info.get("bib_sha256") == file_sha256(bib_path):
+            conn = sqlite3.connect(db_path)
+            try:
+                with conn:
+                    conn.execute("UPDATE index_info SET value = ? WHERE key = 'bib_mtime_ns'", (str(stat.st_mtime_ns),))
+                    conn.execute("UPDATE index_info SET value = ? WHERE key = 'bib_size'", (str(stat.st_size),))
+            finally:
+                conn.close()
+            return
+    print(f"Indexing {bib_path} into {db_path}...")
+    count = build_index(bib_path, db_path)
+    print(f"Indexed {count} BibTeX entries")
+
+def _grams(text: str) -> set:
+    return {text[i:i + TITLE_GRAM] for i in range(len(text) - TITLE_GRAM + 1)}
+
+class BibIndex:
+    """Lookups into the BibTeX index, plus the persistent paper ID -> entry links."""
+
+    def __init__(self, db_path: str = BIB_INDEX_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._year_titles: Dict[int, List[Tuple[str, set, str]]] = {}
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _entry(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, str]]:
+        if row is None:
+            return None
+        return {k: row[k] for k in row.keys() if k != "row"}
+
+    def by_key(self, key: str) -> Optional[Dict[str, str]]:
+        return self._entry(self.conn.execute(
+            "SELECT * FROM entries WHERE key = ? ORDER BY row LIMIT 1", (key,)
+        ).fetchone())
+
+    def by_doi(self, doi: str) -> Optional[Dict[str, str]]:
+        doi = normalize_doi(doi)
+        if not doi:
+            return None
+        return self._entry(self.conn.execute(
+            "SELECT * FROM entries WHERE doi_norm = ? ORDER BY row LIMIT 1", (doi,)
+        ).fetchone())
+
+    def by_id(self, paper_id: str) -> Optional[Dict[str, str]]:
+        """Entry previously linked to a NIME paper ID, or None."""
+        row = self.conn.execute("SELECT key FROM paper_ids WHERE ID = ?", (paper_id,)).fetchone()
+        return self.by_key(row["key"]) if row else None
+
+    def link_id(self, paper_id: str, key: str, method: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO paper_ids VALUES (?, ?, ?)", (paper_id, key, method))
+
+    def _titles_for_year(self, year: int) -> List[Tuple[str, set, str]]:
+        if year not in self._year_titles:
+            self._year_titles[year] = [
+                (r["title_norm"], _grams(r["title_norm"]), r["key"])
+                for r in self.conn.execute("SELECT key, title_norm FROM entries WHERE year = ?", (year,))
+                if r["title_norm"]
+            ]
+        return self._year_titles[year]
+
+    def match_title(self, year: int, text: str) -> Optional[Dict[str, str]]:
+        """Entry of the given year whose title appears at the start of text (a paper's extracted text).
+
+        A title found verbatim (after normalization) scores 1.0; otherwise the
+        score is the share of the title's character 4-grams found in the first
+        TITLE_SEARCH_CHARS characters, which tolerates ligatures, hyphenation and
+        small wording differences between the PDF and the bibliography. The best
+        entry must score at least MIN_TITLE_SCORE and beat the runner-up by
+        MIN_TITLE_MARGIN; among verbatim hits the longest title wins.
+        """
+        head = normalize_title(text[:TITLE_SEARCH_CHARS])
+        if not head:
+            return None
+        head_grams = _grams(head)
+        scored = []
+        for title, grams, key in self._titles_for_year(year):
+            if len(title) >= MIN_EXACT_TITLE_CHARS and title in head:
+                score = 1.0
+            else:
+                score = len(grams & head_grams) / len(grams) if grams else 0.0
+            scored.append((score, len(title), key))
+        if not scored:
+            return None
+        scored.sort(reverse=True)
+        best = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        exact_tie = best[0] == 1.0 and runner_up == 1.0 and scored[1][1] < best[1]
+        if best[0] < MIN_TITLE_SCORE or (best[0] - runner_up < MIN_TITLE_MARGIN and not exact_tie):
+            return None
+        return self.by_key(best[2])
+
+def open_bib_index(bib_path: str = BIB_PATH, db_path: str = BIB_INDEX_DB) -> BibIndex:
+    """Open the index, building or refreshing it from bib_path first if needed."""
+    if not os.path.exists(bib_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Neither {bib_path} nor {db_path} exists")
+    else:
+        ensure_index(bib_path, db_path)
+    return BibIndex(db_path)
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Index the NIME BibTeX file for key/DOI/paper-ID lookups.")
+    parser.add_argument("--bib", default=BIB_PATH, help=f"BibTeX file (default: {BIB_PATH})")
+    parser.add_argument("--db", default=BIB_INDEX_DB, help=f"SQLite index (default: {BIB_INDEX_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="(Re)build the index from the .bib file")
+    look = sub.add_parser("lookup", help="Print the entry for a citation key, DOI or linked paper ID")
+    look.add_argument("value")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "build":
+        count = build_index(args.bib, args.db)
+        print(f"Indexed {count} entries from {args.bib} into {args.db}")
+    elif args.command == "lookup":
+        with open_bib_index(args.bib, args.db) as index:
+            entry = index.by_key(args.value) or index.by_doi(args.value) or index.by_id(args.value)
+            if entry is None:
+                print(f"No entry for {args.value}")
+                return
+            print(entry["raw"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# corpus_pack.py
+"""
+Packed, memory-mapped copy of Keyboard_Interface_Texts.
+
+All texts live in one file so that analyses open one file instead of
+thousands, decode nothing twice and never seek between small files:
+
+    header  MAGIC, format version, offset and length of the document table
+    data    one UTF-8 blob per document, optionally zlib-compressed
+    table   JSON: text_dir plus one entry per document with path, pdf_name,
+            Year, offset and length in the data region, codec, and the
+            source file's size, mtime and SHA-256
+
+Documents are stored exactly as kwic_screening.py reads them
+(open(..., errors='ignore'), universal newlines) and in the same order
+(top-level texts, then one subfolder level). Iterating a pack therefore
+gives the same results as reading the files. The data region is
+memory-mapped and slices are decoded directly from the mapping.
+
+ensure_pack() rebuilds the pack when the text folder changed. It compares
+the file list and (size, mtime) with the table and re-reads only new or
+changed files; unchanged documents are copied from the old pack.
+
+Usage:
+    python corpus_pack.py build [--compress]
+    python corpus_pack.py info
+"""
+import io
+import os
+import re
+import json
+import mmap
+import zlib
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+TEXT_DIR = os.path.join(os.getcwd(), "Keyboard_Interface_Texts")
+PACK_PATH = os.path.join(os.getcwd(), "KWIC_Screening", "corpus_texts.pack")
+
+MAGIC = b"NIMEPACK"
+FORMAT_VERSION = 1
+# magic, version, table offset, table length
+HEADER = struct.Struct("<8sIQQ")
+ZLIB_LEVEL = 6
+
+def collect_text_files(text_dir: str) -> List[Path]:
+    """The corpus in the order every stage reads it: top-level texts, then one subfolder level."""
+    return sorted(Path(text_dir).glob("*.txt")) + sorted(Path(text_dir).glob("*/*.txt"))
+
+def year_from_pdf_name(pdf_name: str) -> str:
+    """Extract Year from filename (e.g., nime2013_Batula.pdf -> 2013)."""
+    year_match = re.search(r'nime(\d{4})_', pdf_name)
+    return year_match.group(1) if year_match else "Unknown"
+
+def read_text(path: Union[str, Path]) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+def decode_text(data: bytes) -> str:
+    """Decode exactly like open(..., 'r', encoding='utf-8', errors='ignore'), including newline translation."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore').read()
+
+class CorpusPack:
+    """Read-only, memory-mapped view of a pack written by build_pack."""
+
+    def __init__(self, pack_path: str = PACK_PATH):
+        self.pack_path = pack_path
+        self._file = open(pack_path, 'rb')
+        try:
+            magic, version, table_offset, table_length = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{pack_path} is not a version {FORMAT_VERSION} corpus pack")
+            self._file.seek(table_offset)
+            meta = json.loads(self._file.read(table_length).decode('utf-8'))
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.text_dir: str = meta['text_dir']
+        self.docs: List[Dict] = meta['docs']
+        self._view = memoryview(self._map)
+
+    def close(self) -> None:
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def exclude(self, paths) -> int:
+        """Drop documents (by relative path) from this view, e.g. collapsed duplicates. Returns how many."""
+        paths = set(paths)
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if doc['path'] not in paths]
+        return before - len(self.docs)
+
+    def raw(self, doc: Dict) -> memoryview:
+        """The stored (possibly compressed) bytes of a document, as a zero-copy slice of the mapping."""
+        start = HEADER.size + doc['offset']
+        return self._view[start:start + doc['length']]
+
+    def text(self, doc: Dict) -> str:
+        data = self.raw(doc)
+        if doc['codec'] == 'zlib':
+            return zlib.decompress(data).decode('utf-8')
+        return str(data, 'utf-8')
+
+    def iter_texts(self) -> Iterator[Tuple[str, str, str]]:
+        """(Year, pdf_name, text) for every document, in pack order."""
+        for doc in self.docs:
+            yield doc['Year'], doc['pdf_name'], self.text(doc)
+
+    def stale(self, text_dir: Optional[str] = None) -> bool:
+        """True if the text folder's file list or any file's size/mtime differs from the table."""
+        text_dir = text_dir or self.text_dir
+        files = collect_text_files(text_dir)
+        if len(files) != len(self.docs):
+            return True
+        for path, doc in zip(files, self.docs):
+            stat = path.stat()
+            if (path.relative_to(text_dir).as_posix() != doc['path']
+                    or stat.st_size != doc['size'] or stat.st_mtime_ns != doc['mtime_ns']):
+                return True
+        return False
+
+def build_pack(text_dir: str = TEXT_DIR, pack_path: str = PACK_PATH, compress: bool = False,
+               previous: Optional[CorpusPack] = None) -> Dict[str, int]:
+    """Write every text under text_dir to pack_path.
+
+    With a previous pack, files whose size and mtime are unchanged (and whose
+    codec matches) are copied from it instead of being read and decoded again.
+    """
+    codec = 'zlib' if compress else 'none'
+    reuse = {}
+    if previous is not None:
+        reuse = {doc['path']: doc for doc in previous.docs}
+    docs = []
+    counts = {'docs': 0, 'read': 0, 'reused': 0, 'text_bytes': 0, 'stored_bytes': 0}
+
+    Path(pack_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        offset = 0
+        for path in collect_text_files(text_dir):
+            rel = path.relative_to(text_dir).as_posix()
+            stat = path.stat()
+            old = reuse.get(rel)
+            if (old is not None and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns
+                    and old['codec'] == codec):
+                stored = bytes(previous.raw(old))
+                text_length, digest = old['text_length'], old['sha256']
+                counts['reused'] += 1
+            else:
+                try:
+                    data = path.read_bytes()
+                except OSError as e:
+                    print(f"Error processing {path.name}: {e}")
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                encoded = decode_text(data).encode('utf-8')
+                text_length = len(encoded)
+                stored = zlib.compress(encoded, ZLIB_LEVEL) if compress else encoded
+                counts['read'] += 1
+            pdf_name = path.stem + '.pdf'
+            docs.append({
+                'path': rel, 'pdf_name': pdf_name, 'Year': year_from_pdf_name(pdf_name),
+                'offset': offset, 'length': len(stored), 'codec': codec, 'text_length': text_length,
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest,
+            })
+            out.write(stored)
+            offset += len(stored)
+            counts['text_bytes'] += text_length
+            counts['stored_bytes'] += len(stored)
+        table = json.dumps({'text_dir': os.path.abspath(text_dir), 'docs': docs}, ensure_ascii=False).encode('utf-8')
+        out.write(table)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, HEADER.size + offset, len(table)))
+    if previous is not None:
+        previous.close()
+    os.replace(tmp_path, pack_path)
+    counts['docs'] = len(docs)
+    return counts
+
+def ensure_pack(text_dir: str = TEXT_DIR, pack_path: str = PACK_PATH, compress: Optional[bool] = None) -> CorpusPack:
+    """Open the pack, (re)building it first if it is missing or the text folder changed.
+
+    compress=None keeps the existing pack's codec (uncompressed for a new pack).
+    """
+    previous = None
+    if os.path.exists(pack_path):
+        try:
+            previous = CorpusPack(pack_path)
+        except Exception as e:
+            print(f"   Warning: Rebuilding unreadable corpus pack {pack_path}: {e}")
+        else:
+            codecs = {doc['codec'] for doc in previous.docs}
+            if compress is None:
+                compress = codecs == {'zlib'}
+            if not previous.stale(text_dir) and codecs <= {'zlib' if compress else 'none'}:
+                return previous
+    print(f"   Packing {text_dir} into {pack_path}...")
+    counts = build_pack(text_dir, pack_path, bool(compress), previous)
+    print(f"   Packed {counts['docs']} texts ({counts['read']} read, {counts['reused']} reused from the old pack)")
+    return CorpusPack(pack_path)
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pack Keyboard_Interface_Texts into one memory-mapped file.")
+    parser.add_argument("--text-dir", default=TEXT_DIR, help=f"Text folder (default: {TEXT_DIR})")
+    parser.add_argument("--pack", default=PACK_PATH, help=f"Pack file (default: {PACK_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="(Re)build the pack from the text folder")
+    build.add_argument("--compress", action="store_true", help="Store each document zlib-compressed")
+    sub.add_parser("info", help="Show the pack's size, compression and freshness")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "build":
+        counts = build_pack(args.text_dir, args.pack, args.compress)
+        print(f"Packed {counts['docs']} texts into {args.pack} "
+              f"({counts['text_bytes'] / 1e6:.1f} MB of text, {counts['stored_bytes'] / 1e6:.1f} MB stored)")
+    elif args.command == "info":
+        with CorpusPack(args.pack) as pack:
+            text_bytes = sum(doc['text_length'] for doc in pack.docs)
+            stored_bytes = sum(doc['length'] for doc in pack.docs)
+            codecs = sorted({doc['codec'] for doc in pack.docs})
+            print(f"{args.pack}: {len(pack)} texts from {pack.text_dir}")
+            print(f"  {text_bytes / 1e6:.1f} MB of text, {stored_bytes / 1e6:.1f} MB stored (codec: {', '.join(codecs) or 'none'})")
+            print(f"  {'STALE: the text folder changed since the pack was built' if pack.stale(args.text_dir) else 'Up to date'}")
+
+if __name__ == "__main__":
+    main()
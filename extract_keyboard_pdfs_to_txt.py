@@ -1,11 +1,18 @@
 # extract_keyboard_pdfs_to_txt.py
 import os
 import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List
 
+from text_cache import CACHE_DIR, cached_extract, extract_or_empty
+from materialize import MANIFEST_NAME, read_manifest
+from pipeline_metrics import Metrics, add_metrics_args, measure
+
 try:
-    from pypdf import PdfReader
+    from pypdf import PdfReader, __version__ as PYPDF_VERSION
 except ImportError:
     print("pypdf is required.")
     print("Install with: pip install pypdf")
@@ -21,25 +28,30 @@ SOURCE_DIR = os.path.join(
     "Keyboard_Interface_Related"
 )
 OUTPUT_DIR = os.path.join(os.getcwd(), "Keyboard_Interface_Texts")
+FILTER_MANIFEST = os.path.join(os.getcwd(), "Metadata_Filtered_Results", MANIFEST_NAME)
+METRICS_JSON = os.path.join(OUTPUT_DIR, "extract_metrics.json")
+
+# Text cache key component; bump the suffix if extract_text_from_pdf changes
+EXTRACTOR_ID = f"pypdf-{PYPDF_VERSION}-v1"
+
+def _parse_pdf_text(pdf_path: str) -> str:
+    """Extract text from PDF using pypdf; raises if the PDF cannot be read at all."""
+    reader = PdfReader(pdf_path)
+    text_content = []
+    for page in reader.pages:
+        try:
+            # extract_text() usually handles the 2013 spacing issue better than pdfminer
+            page_text = page.extract_text()
+            if page_text:
+                text_content.append(page_text)
+        except Exception as page_err:
+            # If one page fails, continue to next
+            continue
+    return "\n".join(text_content)
 
 def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF using pypdf."""
-    try:
-        reader = PdfReader(pdf_path)
-        text_content = []
-        for page in reader.pages:
-            try:
-                # extract_text() usually handles the 2013 spacing issue better than pdfminer
-                page_text = page.extract_text()
-                if page_text:
-                    text_content.append(page_text)
-            except Exception as page_err:
-                # If one page fails, continue to next
-                continue
-        return "\n".join(text_content)
-    except Exception as e:
-        print(f"  Warning: Failed to extract text from {os.path.basename(pdf_path)}: {e}")
-        return ""
+    """Extract text from PDF using pypdf ("" with a warning on failure)."""
+    return extract_or_empty(pdf_path, _parse_pdf_text)
 
 def collect_all_pdfs(root_dir: str) -> List[tuple]:
     """Recursively collect all PDFs from root directory and subdirectories.
@@ -57,9 +69,101 @@ def collect_all_pdfs(root_dir: str) -> List[tuple]:
     
     return pdfs
 
-def main():
-    # Check source directory exists
-    if not os.path.isdir(SOURCE_DIR):
+def collect_pdfs_from_manifest(manifest_path: str, root_dir: str) -> List[tuple]:
+    """Collect PDFs recorded below root_dir in a materialize manifest.
+    Returns list of (physical_path, logical_filename) tuples.
+    """
+    return [
+        (source, os.path.basename(path))
+        for path, source in read_manifest(manifest_path, under=root_dir)
+        if path.lower().endswith('.pdf')
+    ]
+
+def txt_name_for_pdf(pdf_name: str) -> str:
+    """Generate output filename (replace .pdf with .txt)."""
+    return pdf_name[:-4] + ".txt" if pdf_name.lower().endswith('.pdf') else pdf_name + ".txt"
+
+def write_text_file(txt_path: str, text: str) -> bool:
+    """Write extracted text to txt_path. Returns True only for non-empty text that was written."""
+    txt_name = os.path.basename(txt_path)
+    try:
+        # Empty text - still create file but note it as failed
+        with open(txt_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    except Exception as e:
+        print(f"  Error writing {txt_name}: {e}")
+        return False
+    return bool(text)
+
+def _extract_job(pdf_path: str, use_cache: bool = True) -> str:
+    """Worker entry point for the process pool (must be importable at module level)."""
+    if use_cache:
+        return cached_extract(pdf_path, EXTRACTOR_ID, _parse_pdf_text)
+    return extract_text_from_pdf(pdf_path)
+
+def _timed_extract_job(pdf_path: str, use_cache: bool = True):
+    """_extract_job plus its timing record, measured inside the worker process."""
+    return measure(_extract_job, pdf_path, use_cache)
+
+def iter_extracted_texts(all_pdfs: List[tuple], workers: int, use_cache: bool = True, metrics: Metrics = None):
+    """Yield (pdf_path, pdf_name, text) in the order of all_pdfs.
+
+    With workers > 1 the PDFs are parsed in a process pool. Results are still
+    yielded in input order, so two PDFs with the same filename in different
+    subfolders resolve to the same .txt as in the serial path.
+    With enabled metrics, each PDF's extraction is timed and recorded.
+    """
+    timed = metrics is not None and metrics.enabled
+    job = _timed_extract_job if timed else _extract_job
+    if workers <= 1:
+        results = (job(pdf_path, use_cache) for pdf_path, _ in all_pdfs)
+        executor = None
+    else:
+        paths = [pdf_path for pdf_path, _ in all_pdfs]
+        # Small chunks keep every core busy even when a few PDFs are very slow
+        chunksize = max(1, min(8, len(paths) // (workers * 4)))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(partial(job, use_cache=use_cache), paths, chunksize=chunksize)
+    try:
+        for (pdf_path, pdf_name), result in zip(all_pdfs, results):
+            if timed:
+                result, timing = result
+                metrics.add_file(pdf_path, timing, "extract")
+            yield pdf_path, pdf_name, result
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert keyboard/interface-related PDFs to TXT files.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes for text extraction (default: 1, serial). "
+             "Use 0 for one worker per CPU core."
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"Always re-parse PDFs instead of reusing cached text from {CACHE_DIR}"
+    )
+    parser.add_argument(
+        "--from-manifest", nargs="?", const=FILTER_MANIFEST, default=None, metavar="CSV",
+        help=f"Read the PDF list from a materialize manifest (default: {FILTER_MANIFEST}) "
+             "instead of walking the source folder"
+    )
+    add_metrics_args(parser, METRICS_JSON)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    metrics = Metrics("extract_keyboard_pdfs_to_txt", args.metrics, args.metrics_top)
+
+    # Check source directory (or the manifest standing in for it) exists
+    if args.from_manifest and not os.path.isfile(args.from_manifest):
+        print(f"Error: Manifest not found: {args.from_manifest}")
+        print("Please run filter_renamed_pdfs_combined.py first.")
+        sys.exit(1)
+    if not args.from_manifest and not os.path.isdir(SOURCE_DIR):
         print(f"Error: Source directory not found: {SOURCE_DIR}")
         print("Please run filter_renamed_pdfs_combined.py first.")
         sys.exit(1)
@@ -69,8 +173,13 @@ def main():
     print(f"Output directory: {OUTPUT_DIR}\n")
     
     # Collect all PDFs
-    print(f"Collecting PDFs from {SOURCE_DIR}...")
-    all_pdfs = collect_all_pdfs(SOURCE_DIR)
+    with metrics.stage("collect"):
+        if args.from_manifest:
+            print(f"Collecting PDFs under {SOURCE_DIR} from manifest {args.from_manifest}...")
+            all_pdfs = collect_pdfs_from_manifest(args.from_manifest, SOURCE_DIR)
+        else:
+            print(f"Collecting PDFs from {SOURCE_DIR}...")
+            all_pdfs = collect_all_pdfs(SOURCE_DIR)
     
     if not all_pdfs:
         print(f"No PDFs found in {SOURCE_DIR}")
@@ -82,36 +191,22 @@ def main():
     success_count = 0
     failed_count = 0
     
-    print("Extracting text from PDFs...")
-    for i, (pdf_path, pdf_name) in enumerate(all_pdfs):
-        # Simple progress tracking without tqdm
-        if i % 50 == 0:
-            print(f"  Processing {i}/{len(all_pdfs)}...")
-            
-        # Generate output filename (replace .pdf with .txt)
-        txt_name = pdf_name[:-4] + ".txt" if pdf_name.lower().endswith('.pdf') else pdf_name + ".txt"
-        txt_path = os.path.join(OUTPUT_DIR, txt_name)
-        
-        # Extract text
-        text = extract_text_from_pdf(pdf_path)
-        
-        if text:
-            try:
-                # Write to text file
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.write(text)
+    if workers > 1:
+        print(f"Extracting text from PDFs with {workers} worker processes...")
+    else:
+        print("Extracting text from PDFs...")
+    # Each .txt is written as soon as its text is available
+    with metrics.stage("extract"):
+        texts = iter_extracted_texts(all_pdfs, workers, use_cache=not args.no_cache, metrics=metrics)
+        for i, (pdf_path, pdf_name, text) in enumerate(texts):
+            # Simple progress tracking without tqdm
+            if i % 50 == 0:
+                print(f"  Processing {i}/{len(all_pdfs)}...")
+
+            txt_path = os.path.join(OUTPUT_DIR, txt_name_for_pdf(pdf_name))
+            if write_text_file(txt_path, text):
                 success_count += 1
-            except Exception as e:
-                print(f"  Error writing {txt_name}: {e}")
-                failed_count += 1
-        else:
-            # Empty text - still create file but note it
-            try:
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.write("")
-                failed_count += 1
-            except Exception as e:
-                print(f"  Error writing {txt_name}: {e}")
+            else:
                 failed_count += 1
     
     # Print summary
@@ -124,5 +219,7 @@ def main():
     print(f"\nOutput directory: {OUTPUT_DIR}")
     print("="*70)
 
+    metrics.finish()
+
 if __name__ == "__main__":
     main()
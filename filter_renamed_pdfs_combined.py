@@ -2,22 +2,34 @@
 import os
 import sys
 import csv
-import shutil
+import argparse
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import List, Tuple
 import re
 
 try:
+    from pdfminer import __version__ as PDFMINER_VERSION
     from pdfminer.high_level import extract_text
+    from pdfminer.converter import TextConverter
     from pdfminer.layout import LAParams
-    import pandas as pd
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
 except ImportError:
-    print("pdfminer.six and pandas are required.")
-    print("Install with: pip install pdfminer.six pandas")
+    print("pdfminer.six is required.")
+    print("Install with: pip install pdfminer.six")
     sys.exit(1)
 
 from tqdm import tqdm
 
+from io import StringIO
+
+from text_cache import CACHE_DIR, cached_extract, extract_or_empty, file_sha256, read_cached_text, write_cached_text
+from normalized_text import load_normalized
+from materialize import LINK_MODES, MANIFEST_NAME, Materializer, read_manifest
+from metadata_store import CSV_NIME, open_metadata_store
+from pipeline_metrics import Metrics, add_metrics_args
+from pdf_sandbox import QUARANTINE_CSV, QUARANTINE_POLICIES, Quarantine, SandboxedWorker
+
 KEYWORDS = ["Organ", "Keyboard", "Piano", "Clavichord", "Harpsichord", "Accordion", "Interface", "Layout"]
 SOURCE_DIR = os.path.join(os.getcwd(), "Renamed_PDFs")
 MATCHED_DIR = os.path.join(SOURCE_DIR, "Matched")
@@ -25,27 +37,34 @@ UNMATCHED_DIR = os.path.join(SOURCE_DIR, "Unmatched")
 OUTPUT_BASE = os.path.join(os.getcwd(), "Metadata_Filtered_Results")
 FILTERED_YES_DIR = os.path.join(OUTPUT_BASE, "Keyword_Match")
 FILTERED_NO_DIR = os.path.join(OUTPUT_BASE, "No_Keyword_Match")
-CSV_NIME = os.path.join(os.getcwd(), "nime_papers.csv")
 RESULTS_CSV = os.path.join(OUTPUT_BASE, "filter_results.csv")
+METRICS_JSON = os.path.join(OUTPUT_BASE, "filter_metrics.json")
+SOURCE_MANIFEST = os.path.join(SOURCE_DIR, MANIFEST_NAME)
+OUTPUT_MANIFEST = os.path.join(OUTPUT_BASE, MANIFEST_NAME)
+
+# Text cache key component; bump the suffix if extract_text_from_pdf or its LAParams change
+EXTRACTOR_ID = f"pdfminer-{PDFMINER_VERSION}-laparams-v1"
+
+# Section headers that start the bibliography (matched on lowercased text)
+REFERENCE_HEADER_PATTERNS = [
+    r'\n\s*references\s*\n',
+    r'\n\s*citations\s*\n',
+]
+
+def _parse_pdf_text(pdf_path: str) -> str:
+    """Extract text from PDF using pdfminer; raises if pdfminer fails."""
+    text = extract_text(pdf_path, laparams=LAParams())
+    return text if text else ""
 
 def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF using pdfminer."""
-    try:
-        text = extract_text(pdf_path, laparams=LAParams())
-        return text if text else ""
-    except Exception as e:
-        print(f"  Warning: Failed to extract text from {os.path.basename(pdf_path)}: {e}")
-        return ""
+    """Extract text from PDF using pdfminer ("" with a warning on failure; MemoryError propagates)."""
+    return extract_or_empty(pdf_path, _parse_pdf_text)
 
-def safe_str(value) -> str:
-    """Convert pandas NaN/None to empty string."""
-    try:
-        if pd.isna(value):
-            return ""
-    except Exception:
-        if value is None:
-            return ""
-    return str(value)
+def load_pdf_text(pdf_path: str, use_cache: bool = True) -> str:
+    """Extract PDF text, reusing the shared content-addressed cache when enabled."""
+    if use_cache:
+        return cached_extract(pdf_path, EXTRACTOR_ID, _parse_pdf_text)
+    return extract_text_from_pdf(pdf_path)
 
 def normalize(s: str) -> str:
     """Normalize string to lowercase."""
@@ -69,13 +88,8 @@ def remove_references_section(text: str) -> str:
     
     # Pattern to match section headers (word at start of line or after newline)
     # Match: newline + optional whitespace + References/Citations + optional whitespace + newline
-    patterns = [
-        r'\n\s*references\s*\n',
-        r'\n\s*citations\s*\n',
-    ]
-    
     last_pos = -1
-    for pattern in patterns:
+    for pattern in REFERENCE_HEADER_PATTERNS:
         for match in re.finditer(pattern, text_lower):
             if match.start() > last_pos:
                 last_pos = match.start()
@@ -86,12 +100,15 @@ def remove_references_section(text: str) -> str:
     
     return text
 
-def search_keywords_in_text(text: str, keywords: List[str]) -> Tuple[bool, List[str]]:
+def search_keywords_in_text(text: str, keywords: List[str], normalized: bool = False,
+                            use_cache: bool = True) -> Tuple[bool, List[str]]:
     """Search for keywords in text (case-insensitive). Returns (found, list_of_found_keywords_lowercase).
 
     Special-case: match 'organ' only as whole word (organ or organs) to avoid matching 'organization', 'organic', etc.
+    With normalized=True the search runs on the cached normalized text
+    (ligatures expanded, hyphenated line breaks joined; see normalized_text.py).
     """
-    t = normalize(text)
+    t = load_normalized(text, use_cache).text if normalized else normalize(text)
     found_keywords = []
     for kw in keywords:
         kw_lower = normalize(kw)
@@ -106,6 +123,150 @@ def search_keywords_in_text(text: str, keywords: List[str]) -> Tuple[bool, List[
                     found_keywords.append(kw_lower)
     return (len(found_keywords) > 0, found_keywords)
 
+def iter_pdf_pages_text(pdf_path: str):
+    """Yield the text of each page as pdfminer's extract_text would produce it.
+
+    Joining all yielded chunks gives exactly extract_text(pdf_path, laparams=LAParams()),
+    but the caller may stop after any page.
+    """
+    with open(pdf_path, "rb") as fp, StringIO() as output_string:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = TextConverter(rsrcmgr, output_string, codec="utf-8", laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        written = 0
+        for page in PDFPage.get_pages(fp, caching=True):
+            interpreter.process_page(page)
+            text = output_string.getvalue()
+            yield text[written:]
+            written = len(text)
+
+def classification_settled(text_so_far: str, keywords: List[str]) -> bool:
+    """True when parsing further pages cannot change search_keywords_in_text's result.
+
+    More text can only add keywords, and remove_references_section can only take
+    text away at a References/Citations header. So the result is final once every
+    keyword occurs before the earliest point where a header could still start:
+    there is no header in the text so far, and the keywords are searched without
+    the trailing "whitespace + word + whitespace" that could be the beginning of
+    a header continued on the next page.
+    """
+    t = normalize(text_so_far)
+    if len(t) != len(text_so_far):
+        # Lowercasing changed offsets; remove_references_section would cut elsewhere
+        return False
+    if any(re.search(pattern, t) for pattern in REFERENCE_HEADER_PATTERNS):
+        return False
+    safe_prefix = t.rstrip().rstrip("abcdefghijklmnopqrstuvwxyz").rstrip()
+    found, found_keywords = search_keywords_in_text(safe_prefix, keywords)
+    return found and len(found_keywords) == len({normalize(kw) for kw in keywords})
+
+def classify_pdf_text(pdf_path: str, keywords: List[str], use_cache: bool = True) -> Tuple[str, bool]:
+    """Extract text page by page until the keyword classification is settled.
+
+    Returns (text, complete). When complete is False, the text is a prefix of the
+    full text that yields the same filter result. Only complete texts are cached.
+
+    A pdfminer failure before the result is settled gives ("", True), like
+    extract_text_from_pdf, and is not cached. Pages after the settling page
+    are never parsed, so a PDF that pdfminer would fail on only there is
+    classified from its first pages, where the full extraction gives no text.
+    """
+    digest = None
+    if use_cache:
+        try:
+            digest = file_sha256(pdf_path)
+        except OSError:
+            digest = None
+        if digest:
+            cached = read_cached_text(digest, EXTRACTOR_ID)
+            if cached is not None:
+                return cached, True
+
+    try:
+        text, complete = _classify_pages(pdf_path, keywords)
+    except MemoryError:
+        raise
+    except Exception as e:
+        # Same outcome as extract_text_from_pdf: no text, and nothing cached so the next run retries
+        print(f"  Warning: Failed to extract text from {os.path.basename(pdf_path)}: {e}")
+        return "", True
+
+    if complete and digest:
+        write_cached_text(digest, EXTRACTOR_ID, text)
+    return text, complete
+
+def _classify_pages(pdf_path: str, keywords: List[str]) -> Tuple[str, bool]:
+    """The page loop of classify_pdf_text; raises if pdfminer fails on any page read."""
+    chunks = []
+    for page_text in iter_pdf_pages_text(pdf_path):
+        chunks.append(page_text)
+        if classification_settled("".join(chunks), keywords):
+            return "".join(chunks), False
+    return "".join(chunks), True
+
+def _classify_job(pdf_path: str) -> Tuple[str, bool]:
+    """Sandbox entry point for --early-exit; failures come back as "error", the parent does the caching."""
+    return _classify_pages(pdf_path, KEYWORDS)
+
+def fallback_extract_text(pdf_path: str, use_cache: bool = True) -> str:
+    """pypdf extraction (and cache) shared with extract_keyboard_pdfs_to_txt.py, for quarantined PDFs."""
+    from extract_keyboard_pdfs_to_txt import _extract_job
+    return _extract_job(pdf_path, use_cache)
+
+def quarantined_text(pdf_path: str, sandbox: SandboxedWorker, policy: str, use_cache: bool = True) -> str:
+    """Text for a PDF pdfminer cannot handle: empty for 'skip', otherwise the sandboxed pypdf fallback."""
+    if policy == "skip":
+        return ""
+    status, text, seconds = sandbox.call(fallback_extract_text, pdf_path, use_cache)
+    if status != "ok":
+        print(f"  Warning: Fallback extraction of {os.path.basename(pdf_path)} failed ({status} after {seconds:.1f}s)")
+        return ""
+    return text
+
+def load_pdf_text_sandboxed(pdf_path: str, sandbox: SandboxedWorker, quarantine: Quarantine, policy: str,
+                            use_cache: bool = True, early_exit: bool = False) -> Tuple[str, bool]:
+    """Like load_pdf_text / classify_pdf_text, but pdfminer runs in the supervised worker.
+
+    Cache hits never start the worker. PDFs that hit the timeout or memory
+    limit are added to the quarantine list and handled by quarantined_text,
+    as are PDFs quarantined by earlier runs (unless policy is 'retry').
+    Returns (text, complete) like classify_pdf_text.
+    """
+    try:
+        digest = file_sha256(pdf_path)
+    except OSError:
+        digest = None
+    if use_cache and digest:
+        cached = read_cached_text(digest, EXTRACTOR_ID)
+        if cached is not None:
+            return cached, True
+
+    pdf_name = os.path.basename(pdf_path)
+    if policy != "retry" and quarantine.get(digest, EXTRACTOR_ID):
+        return quarantined_text(pdf_path, sandbox, policy, use_cache), True
+
+    if early_exit:
+        status, result, seconds = sandbox.call(_classify_job, pdf_path)
+    else:
+        # The raising variant, so a failed extraction comes back as "error" and is not cached
+        status, result, seconds = sandbox.call(_parse_pdf_text, pdf_path)
+        if status == "ok":
+            result = (result, True)
+
+    if status in ("ok", "error"):
+        if status == "error":
+            # Same outcome as an in-process extraction failure: no text, and nothing cached
+            print(f"  Warning: Failed to extract text from {pdf_name}: {result}")
+            return "", True
+        text, complete = result
+        if complete and use_cache and digest:
+            write_cached_text(digest, EXTRACTOR_ID, text)
+        return text, complete
+
+    print(f"  Warning: {pdf_name} hit the extraction {status} limit after {seconds:.1f}s; quarantined")
+    quarantine.add(digest, pdf_name, EXTRACTOR_ID, status, seconds)
+    return quarantined_text(pdf_path, sandbox, policy, use_cache), True
+
 def create_keyword_folder_name(keywords_list: List[str]) -> str:
     """Create folder name from keywords list. e.g., ['organ', 'piano'] -> 'organ_piano'"""
     sorted_kws = sorted(keywords_list)
@@ -117,26 +278,6 @@ def extract_id_from_filename(filename: str) -> str:
         return filename[:-4]
     return filename
 
-def build_id_to_meta_map(csv_path: str) -> Dict[str, Dict[str, str]]:
-    """Build a map from ID -> {title, abstract, keywords} from nime_papers.csv"""
-    meta: Dict[str, Dict[str, str]] = {}
-    try:
-        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_filter=False)
-    except Exception as e:
-        print(f"Error: Could not read {csv_path}: {e}")
-        sys.exit(1)
-    
-    for _, row in df.iterrows():
-        pdf_id = safe_str(row.get("ID")).strip()
-        if not pdf_id:
-            continue
-        meta[pdf_id] = {
-            "title": safe_str(row.get("title")),
-            "abstract": safe_str(row.get("abstract")),
-            "keywords": safe_str(row.get("keywords")),
-        }
-    return meta
-
 def collect_pdfs_from_folder(folder: str) -> List[Tuple[str, str]]:
     """Collect all PDFs from folder. Returns list of (full_path, filename) tuples."""
     pdfs = []
@@ -147,26 +288,104 @@ def collect_pdfs_from_folder(folder: str) -> List[Tuple[str, str]]:
         pdfs.append((str(pdf_file), pdf_file.name))
     return pdfs
 
-def main():
+def collect_pdfs_from_manifest(manifest_path: str, folder: str) -> List[Tuple[str, str]]:
+    """Collect PDFs recorded under folder in a materialize manifest.
+
+    Returns (physical_path, logical_filename) tuples, so PDFs that were never
+    written to folder (manifest link mode) are read from their original location.
+    """
+    return [
+        (source, os.path.basename(path))
+        for path, source in read_manifest(manifest_path, under=folder)
+        if path.endswith(".pdf")
+    ]
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Filter renamed NIME PDFs by full-text and metadata keywords.")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"Always re-parse PDFs instead of reusing cached text from {CACHE_DIR}"
+    )
+    parser.add_argument(
+        "--early-exit", action="store_true",
+        help="Parse PDFs page by page and stop once the keyword result can no longer change "
+             "(every keyword seen before any References/Citations header)"
+    )
+    parser.add_argument(
+        "--link-mode", choices=LINK_MODES, default="copy",
+        help="How to place PDFs in the result folders: copy (default), reflink, hardlink, symlink, "
+             "auto (reflink > hardlink > copy) or manifest (no files, only materialize_manifest.csv)"
+    )
+    parser.add_argument(
+        "--from-manifest", nargs="?", const=SOURCE_MANIFEST, default=None, metavar="CSV",
+        help=f"Read the input PDF list from a materialize manifest (default: {SOURCE_MANIFEST}) "
+             "instead of scanning the Renamed_PDFs folders"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120,
+        help="Per-PDF pdfminer time limit in seconds, enforced in a supervised worker process "
+             "(default: 120; 0 together with --max-memory-mb 0 parses in-process)"
+    )
+    parser.add_argument(
+        "--max-memory-mb", type=int, default=2048,
+        help="Address-space limit of the extraction worker in MB (default: 2048; 0 = unlimited)"
+    )
+    parser.add_argument(
+        "--quarantine", default=QUARANTINE_CSV, metavar="CSV",
+        help=f"Persistent list of PDFs that exceeded a limit (default: {QUARANTINE_CSV})"
+    )
+    parser.add_argument(
+        "--quarantine-policy", choices=QUARANTINE_POLICIES, default="fallback",
+        help="Quarantined PDFs: fallback = extract with pypdf (default), skip = treat as no text, "
+             "retry = run pdfminer again"
+    )
+    parser.add_argument(
+        "--normalized", action="store_true",
+        help="Search the full text after normalization (ligatures expanded, words hyphenated across "
+             "line breaks joined), cached per document next to the extracted text"
+    )
+    add_metrics_args(parser, METRICS_JSON)
+    args = parser.parse_args(argv)
+    if args.normalized and args.early_exit:
+        # --early-exit settles on a raw-text prefix; joining decisions need the whole document
+        parser.error("--normalized cannot be combined with --early-exit")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics("filter_renamed_pdfs_combined", args.metrics, args.metrics_top)
+
     # Create output directories
     Path(OUTPUT_BASE).mkdir(parents=True, exist_ok=True)
-    Path(FILTERED_YES_DIR).mkdir(parents=True, exist_ok=True)
-    Path(FILTERED_NO_DIR).mkdir(parents=True, exist_ok=True)
+    materializer = Materializer(args.link_mode, OUTPUT_MANIFEST)
+    materializer.makedirs(FILTERED_YES_DIR)
+    materializer.makedirs(FILTERED_NO_DIR)
 
     # Ensure parent folder for keyboard/interface/layout-related keyword combos exists
     keyboard_parent = os.path.join(FILTERED_YES_DIR, "Keyboard_Interface_Related")
-    Path(keyboard_parent).mkdir(parents=True, exist_ok=True)
+    materializer.makedirs(keyboard_parent)
 
     # Load metadata
     print(f"Loading metadata from {CSV_NIME}...")
-    id_to_meta = build_id_to_meta_map(CSV_NIME)
-    print(f"Loaded metadata for {len(id_to_meta)} papers\n")
+    try:
+        with metrics.stage("load_metadata"):
+            store = open_metadata_store(CSV_NIME)
+    except Exception as e:
+        print(f"Error: Could not load metadata from {CSV_NIME}: {e}")
+        sys.exit(1)
+    print(f"Loaded metadata for {store.count_ids()} papers\n")
 
     # Collect PDFs
-    print("Collecting PDFs from Renamed_PDFs folder...")
     all_pdfs = []
-    all_pdfs.extend(collect_pdfs_from_folder(MATCHED_DIR))
-    all_pdfs.extend(collect_pdfs_from_folder(UNMATCHED_DIR))
+    with metrics.stage("collect"):
+        if args.from_manifest:
+            print(f"Collecting PDFs from manifest {args.from_manifest}...")
+            all_pdfs.extend(collect_pdfs_from_manifest(args.from_manifest, MATCHED_DIR))
+            all_pdfs.extend(collect_pdfs_from_manifest(args.from_manifest, UNMATCHED_DIR))
+        else:
+            print("Collecting PDFs from Renamed_PDFs folder...")
+            all_pdfs.extend(collect_pdfs_from_folder(MATCHED_DIR))
+            all_pdfs.extend(collect_pdfs_from_folder(UNMATCHED_DIR))
     
     if not all_pdfs:
         print(f"Error: No PDFs found in {MATCHED_DIR} or {UNMATCHED_DIR}")
@@ -174,121 +393,153 @@ def main():
     
     print(f"Found {len(all_pdfs)} PDFs to process\n")
 
+    # pdfminer runs in a supervised worker unless both limits are disabled
+    sandbox = None
+    quarantine = Quarantine(args.quarantine)
+    quarantined_before = len(quarantine)
+    if args.timeout > 0 or args.max_memory_mb > 0:
+        sandbox = SandboxedWorker(args.timeout, args.max_memory_mb)
+
     # Process each PDF: full-text search, then metadata filter
     results = []
     copied_yes = 0
     copied_no = 0
+    early_exits = 0
     keyword_folders = set()
 
     print("Scanning PDFs and filtering...")
-    for pdf_path, pdf_name in tqdm(all_pdfs, desc="Progress"):
-        pdf_id = extract_id_from_filename(pdf_name)
+    with metrics.stage("filter"):
+        for pdf_path, pdf_name in tqdm(all_pdfs, desc="Progress"):
+            with metrics.file(pdf_path, "filter") as rec:
+                pdf_id = extract_id_from_filename(pdf_name)
         
-        # Step 1: Full-text search for keywords (excluding References/Citations section)
-        pdf_text = extract_text_from_pdf(pdf_path)
-        pdf_text = remove_references_section(pdf_text)  # Remove references section
-        found_fulltext, found_kw_fulltext = search_keywords_in_text(pdf_text, KEYWORDS)
-
-        # Treat 'interface' and 'layout' as dependent keywords: they only count if they co-occur with an instrument keyword (organ, keyboard, piano, clavichord, harpsichord, accordion)
-        instrument_kws = {"organ", "keyboard", "piano", "clavichord", "harpsichord", "accordion"}
-        found_instruments = [kw for kw in found_kw_fulltext if kw in instrument_kws]
-        found_ui_layout = [kw for kw in found_kw_fulltext if kw in ("interface", "layout")]
-
-        # If no keywords or only interface/layout without any instrument keyword, treat as no match
-        if (not found_fulltext) or (found_ui_layout and not found_instruments):
-            # No eligible keywords in full text - copy to No_Keyword_Match
-            results.append({
-                "pdf_name": pdf_name,
-                "contains_keywords": "No",
-                "keywords_found": "; ".join(found_kw_fulltext) if found_kw_fulltext else "",
-                "reason": "No instrument keyword found in full text (only interface/layout present)" if found_ui_layout else "No keyword match in full text"
-            })
-            try:
-                shutil.copy2(pdf_path, os.path.join(FILTERED_NO_DIR, pdf_name))
-                copied_no += 1
-            except Exception as e:
-                print(f"Error copying {pdf_name}: {e}")
-            continue
+                # Step 1: Full-text search for keywords (excluding References/Citations section)
+                with rec.step("extract"):
+                    if sandbox is not None:
+                        pdf_text, complete = load_pdf_text_sandboxed(
+                            pdf_path, sandbox, quarantine, args.quarantine_policy,
+                            use_cache=not args.no_cache, early_exit=args.early_exit
+                        )
+                    elif args.early_exit:
+                        pdf_text, complete = classify_pdf_text(pdf_path, KEYWORDS, use_cache=not args.no_cache)
+                    else:
+                        pdf_text, complete = load_pdf_text(pdf_path, use_cache=not args.no_cache), True
+                    if not complete:
+                        early_exits += 1
+                with rec.step("classify"):
+                    pdf_text = remove_references_section(pdf_text)  # Remove references section
+                    found_fulltext, found_kw_fulltext = search_keywords_in_text(
+                        pdf_text, KEYWORDS, args.normalized, use_cache=not args.no_cache
+                    )
+
+                # Treat 'interface' and 'layout' as dependent keywords: they only count if they co-occur with an instrument keyword (organ, keyboard, piano, clavichord, harpsichord, accordion)
+                instrument_kws = {"organ", "keyboard", "piano", "clavichord", "harpsichord", "accordion"}
+                found_instruments = [kw for kw in found_kw_fulltext if kw in instrument_kws]
+                found_ui_layout = [kw for kw in found_kw_fulltext if kw in ("interface", "layout")]
+
+                # If no keywords or only interface/layout without any instrument keyword, treat as no match
+                if (not found_fulltext) or (found_ui_layout and not found_instruments):
+                    # No eligible keywords in full text - copy to No_Keyword_Match
+                    results.append({
+                        "pdf_name": pdf_name,
+                        "contains_keywords": "No",
+                        "keywords_found": "; ".join(found_kw_fulltext) if found_kw_fulltext else "",
+                        "reason": "No instrument keyword found in full text (only interface/layout present)" if found_ui_layout else "No keyword match in full text"
+                    })
+                    try:
+                        with rec.step("place"):
+                            materializer.place(pdf_path, os.path.join(FILTERED_NO_DIR, pdf_name))
+                        copied_no += 1
+                    except Exception as e:
+                        print(f"Error placing {pdf_name}: {e}")
+                    continue
         
-        # Step 2: Metadata filter (only for PDFs with keywords in full text)
-        meta = id_to_meta.get(pdf_id, {})
-        title = meta.get("title", "")
-        abstract = meta.get("abstract", "")
-        keywords_field = meta.get("keywords", "")
+                # Step 2: Metadata filter (only for PDFs with keywords in full text)
+                meta = store.get(pdf_id) or {}
+                title = meta.get("title", "")
+                abstract = meta.get("abstract", "")
+                keywords_field = meta.get("keywords", "")
         
-        # Create subfolder based on full-text keywords
-        folder_name = create_keyword_folder_name(found_kw_fulltext)
-        # If this keyword combo includes 'keyboard', 'interface' or 'layout', place it under Keyboard_Interface_Related parent
-        if any(x in folder_name for x in ("keyboard", "interface", "layout")):
-            keyword_folder = os.path.join(FILTERED_YES_DIR, "Keyboard_Interface_Related", folder_name)
-        else:
-            keyword_folder = os.path.join(FILTERED_YES_DIR, folder_name)
-        Path(keyword_folder).mkdir(parents=True, exist_ok=True)
-        keyword_folders.add(folder_name)
+                # Create subfolder based on full-text keywords
+                folder_name = create_keyword_folder_name(found_kw_fulltext)
+                # If this keyword combo includes 'keyboard', 'interface' or 'layout', place it under Keyboard_Interface_Related parent
+                if any(x in folder_name for x in ("keyboard", "interface", "layout")):
+                    keyword_folder = os.path.join(FILTERED_YES_DIR, "Keyboard_Interface_Related", folder_name)
+                else:
+                    keyword_folder = os.path.join(FILTERED_YES_DIR, folder_name)
+                materializer.makedirs(keyword_folder)
+                keyword_folders.add(folder_name)
         
-        # Check metadata
-        if not (title or abstract or keywords_field):
-            # No metadata - copy to No_Metadata_Match subfolder
-            no_meta_dir = os.path.join(keyword_folder, "No_Metadata_Match")
-            Path(no_meta_dir).mkdir(parents=True, exist_ok=True)
+                # Check metadata
+                if not (title or abstract or keywords_field):
+                    # No metadata - copy to No_Metadata_Match subfolder
+                    no_meta_dir = os.path.join(keyword_folder, "No_Metadata_Match")
+                    materializer.makedirs(no_meta_dir)
             
-            results.append({
-                "pdf_name": pdf_name,
-                "contains_keywords": "Yes",
-                "keywords_found": "; ".join(found_kw_fulltext),
-                "reason": "Full-text match; no metadata available"
-            })
-            try:
-                shutil.copy2(pdf_path, os.path.join(no_meta_dir, pdf_name))
-                copied_yes += 1
-            except Exception as e:
-                print(f"Error copying {pdf_name}: {e}")
-            continue
+                    results.append({
+                        "pdf_name": pdf_name,
+                        "contains_keywords": "Yes",
+                        "keywords_found": "; ".join(found_kw_fulltext),
+                        "reason": "Full-text match; no metadata available"
+                    })
+                    try:
+                        with rec.step("place"):
+                            materializer.place(pdf_path, os.path.join(no_meta_dir, pdf_name))
+                        copied_yes += 1
+                    except Exception as e:
+                        print(f"Error placing {pdf_name}: {e}")
+                    continue
         
-        # Combine metadata text
-        text_blob = " ".join([title, abstract, keywords_field])
+                # Combine metadata text
+                text_blob = " ".join([title, abstract, keywords_field])
         
-        # Check if keywords also in metadata
-        found_metadata, found_kw_metadata = search_keywords_in_text(text_blob, KEYWORDS)
+                # Check if keywords also in metadata
+                found_metadata, found_kw_metadata = search_keywords_in_text(text_blob, KEYWORDS)
         
-        if found_metadata:
-            # Keywords in both full-text and metadata - copy to Metadata_Match subfolder
-            meta_match_dir = os.path.join(keyword_folder, "Metadata_Match")
-            Path(meta_match_dir).mkdir(parents=True, exist_ok=True)
+                if found_metadata:
+                    # Keywords in both full-text and metadata - copy to Metadata_Match subfolder
+                    meta_match_dir = os.path.join(keyword_folder, "Metadata_Match")
+                    materializer.makedirs(meta_match_dir)
             
-            results.append({
-                "pdf_name": pdf_name,
-                "contains_keywords": "Yes",
-                "keywords_found": "; ".join(found_kw_fulltext),
-                "reason": "Full-text and metadata match"
-            })
-            try:
-                shutil.copy2(pdf_path, os.path.join(meta_match_dir, pdf_name))
-                copied_yes += 1
-            except Exception as e:
-                print(f"Error copying {pdf_name}: {e}")
-        else:
-            # Keywords in full-text but not metadata - copy to No_Metadata_Match subfolder
-            no_meta_dir = os.path.join(keyword_folder, "No_Metadata_Match")
-            Path(no_meta_dir).mkdir(parents=True, exist_ok=True)
+                    results.append({
+                        "pdf_name": pdf_name,
+                        "contains_keywords": "Yes",
+                        "keywords_found": "; ".join(found_kw_fulltext),
+                        "reason": "Full-text and metadata match"
+                    })
+                    try:
+                        with rec.step("place"):
+                            materializer.place(pdf_path, os.path.join(meta_match_dir, pdf_name))
+                        copied_yes += 1
+                    except Exception as e:
+                        print(f"Error placing {pdf_name}: {e}")
+                else:
+                    # Keywords in full-text but not metadata - copy to No_Metadata_Match subfolder
+                    no_meta_dir = os.path.join(keyword_folder, "No_Metadata_Match")
+                    materializer.makedirs(no_meta_dir)
             
-            results.append({
-                "pdf_name": pdf_name,
-                "contains_keywords": "Yes",
-                "keywords_found": "; ".join(found_kw_fulltext),
-                "reason": "Full-text match; no keyword match in metadata"
-            })
-            try:
-                shutil.copy2(pdf_path, os.path.join(no_meta_dir, pdf_name))
-                copied_yes += 1
-            except Exception as e:
-                print(f"Error copying {pdf_name}: {e}")
+                    results.append({
+                        "pdf_name": pdf_name,
+                        "contains_keywords": "Yes",
+                        "keywords_found": "; ".join(found_kw_fulltext),
+                        "reason": "Full-text match; no keyword match in metadata"
+                    })
+                    try:
+                        with rec.step("place"):
+                            materializer.place(pdf_path, os.path.join(no_meta_dir, pdf_name))
+                        copied_yes += 1
+                    except Exception as e:
+                        print(f"Error placing {pdf_name}: {e}")
+
+    store.close()
+    if sandbox is not None:
+        sandbox.close()
 
     # Write results CSV
     print(f"\nWriting results to {RESULTS_CSV}...")
     fieldnames = ["pdf_name", "contains_keywords", "keywords_found", "reason"]
     try:
-        with open(RESULTS_CSV, "w", newline="", encoding="utf-8") as csvfile:
+        with metrics.stage("write_results"), open(RESULTS_CSV, "w", newline="", encoding="utf-8") as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             for row in results:
@@ -304,6 +555,11 @@ def main():
     print(f"Total PDFs processed:                    {len(all_pdfs)}")
     print(f"PDFs with keyword match (full-text):     {copied_yes}")
     print(f"PDFs without keyword match:              {copied_no}")
+    if args.early_exit:
+        print(f"PDFs classified before the last page:    {early_exits}")
+    if sandbox is not None:
+        print(f"Newly quarantined PDFs:                  {len(quarantine) - quarantined_before} "
+              f"(policy: {args.quarantine_policy}, list: {args.quarantine})")
     print(f"\nKeyword combinations found:")
     for kw_folder in sorted(keyword_folders):
         print(f"  - {kw_folder}/")
@@ -314,17 +570,26 @@ def main():
     keyboard_parent = os.path.join(FILTERED_YES_DIR, "Keyboard_Interface_Related")
     keyboard_folders = [kf for kf in keyword_folders if any(x in kf for x in ("keyboard", "interface", "layout"))]
     files_in_keyboard = 0
-    for kf in sorted(keyboard_folders):
-        src_dir = os.path.join(keyboard_parent, kf)
-        if not os.path.isdir(src_dir):
-            # fallback: older runs might have top-level folder (rare), also check there
-            src_dir = os.path.join(FILTERED_YES_DIR, kf)
+    if materializer.virtual:
+        # Nothing was written to disk; count the manifest entries instead
+        keyboard_prefix = os.path.relpath(keyboard_parent, os.getcwd()) + os.sep
+        files_in_keyboard = sum(1 for row in materializer.rows if row["path"].startswith(keyboard_prefix))
+    else:
+        for kf in sorted(keyboard_folders):
+            src_dir = os.path.join(keyboard_parent, kf)
             if not os.path.isdir(src_dir):
-                continue
-        for _, _, files in os.walk(src_dir):
-            files_in_keyboard += len(files)
+                # fallback: older runs might have top-level folder (rare), also check there
+                src_dir = os.path.join(FILTERED_YES_DIR, kf)
+                if not os.path.isdir(src_dir):
+                    continue
+            for _, _, files in os.walk(src_dir):
+                files_in_keyboard += len(files)
     print(f"\nPlaced keyboard/interface/layout-related folders under {keyboard_parent} with {len(keyboard_folders)} subfolders and {files_in_keyboard} files")
 
+    materializer.write_manifest()
+    print(f"Placement ({args.link_mode}): {materializer.summary()}")
+    print(f"Manifest saved to: {OUTPUT_MANIFEST}")
+
     print(f"\nOutput structure:")
     print(f"  {OUTPUT_BASE}/")
     print(f"  ├── Keyword_Match/")
@@ -332,8 +597,11 @@ def main():
     print(f"  │       ├── Metadata_Match/")
     print(f"  │       └── No_Metadata_Match/")
     print(f"  ├── No_Keyword_Match/")
+    print(f"  ├── {MANIFEST_NAME}")
     print(f"  └── filter_results.csv")
     print("="*70)
 
+    metrics.finish()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,144 @@
+# fulltext_rank.py
+"""
+Full-text BM25 / TF-IDF ranking of papers against a weighted term query.
+
+Auto_Priority_Score only sees the snippets around keyword hits. This
+module instead counts every word of every paper once into a sparse
+paper x term matrix (CSR: indptr, indices, data as numpy arrays) and
+scores all papers against a query in one vectorized pass over that matrix.
+
+A query maps terms to weights; negative weights penalize (e.g. 'qwerty').
+Single words may list extra surface forms (keyword suffix variants such as
+'pianos', 'pianist'), whose counts are added to the term. Multi-word terms
+('text entry') are counted as phrases of consecutive tokens while the
+matrix is built. Texts are tokenized after folding (lowercase, ligatures
+expanded; see normalized_text.py), and a paper's texts are merged into one
+document.
+
+    bm25    sum_q  w_q * idf_q * tf (k1 + 1) / (tf + k1 (1 - b + b * len / avg_len))
+            idf_q = ln(1 + (N - df_q + 0.5) / (df_q + 0.5))
+    tfidf   sum_q  w_q * (1 + ln tf) * ln(N / df_q)     (terms with tf > 0)
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from normalized_text import WORD_PATTERN, fold
+
+RANK_METHODS = ["bm25", "tfidf"]
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def parse_query(spec: str) -> Dict[str, float]:
+    """'piano=2, qwerty=-1.5, text entry=-1' -> {term: weight}."""
+    query = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        term, sep, weight = part.rpartition('=')
+        if not sep or not term.strip():
+            raise ValueError(f"expected term=weight, got {part.strip()!r}")
+        query[' '.join(term.lower().split())] = float(weight)
+    return query
+
+class TermFrequencies:
+    """Sparse paper x term counts over full texts, built once per run."""
+
+    def __init__(self, docs: Iterable[Tuple[Tuple[str, str], str]], phrases: Sequence[str] = ()):
+        """docs yields ((Year, pdf_name), text); texts of the same paper are merged."""
+        self.vocab: Dict[str, int] = {}
+        phrase_tokens = [p.split() for p in phrases]
+        per_paper: Dict[Tuple[str, str], List[Tuple[np.ndarray, np.ndarray]]] = {}
+        lengths: Dict[Tuple[str, str], int] = {}
+        for key, text in docs:
+            ids = np.array([self._term_id(word) for word in WORD_PATTERN.findall(fold(text))], dtype=np.int64)
+            terms, counts = np.unique(ids, return_counts=True)
+            phrase_ids, phrase_counts = self._count_phrases(ids, phrases, phrase_tokens)
+            per_paper.setdefault(key, []).append((np.concatenate([terms, phrase_ids]),
+                                                  np.concatenate([counts, phrase_counts])))
+            lengths[key] = lengths.get(key, 0) + len(ids)
+
+        self.keys: List[Tuple[str, str]] = list(per_paper)
+        indptr, indices, data = [0], [], []
+        for key in self.keys:
+            parts = per_paper[key]
+            terms = np.concatenate([t for t, _ in parts])
+            counts = np.concatenate([c for _, c in parts])
+            if len(parts) > 1:
+                terms, inverse = np.unique(terms, return_inverse=True)
+                counts = np.bincount(inverse, weights=counts).astype(np.int64)
+            indices.append(terms)
+            data.append(counts)
+            indptr.append(indptr[-1] + len(terms))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        self.data = np.concatenate(data) if data else np.empty(0, dtype=np.int64)
+        self.doc_lengths = np.array([lengths[key] for key in self.keys], dtype=np.float64)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.vocab)
+        return term_id
+
+    def _count_phrases(self, ids: np.ndarray, phrases: Sequence[str],
+                       phrase_tokens: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(phrase column ids, counts) of the phrases occurring in one token sequence."""
+        found_ids, found_counts = [], []
+        for phrase, tokens in zip(phrases, phrase_tokens):
+            n = len(ids) - len(tokens) + 1
+            if n <= 0 or any(t not in self.vocab for t in tokens):
+                continue
+            hits = np.ones(n, dtype=bool)
+            for offset, token in enumerate(tokens):
+                hits &= ids[offset:offset + n] == self.vocab[token]
+            count = int(hits.sum())
+            if count:
+                found_ids.append(self._term_id(phrase))
+                found_counts.append(count)
+        return np.array(found_ids, dtype=np.int64), np.array(found_counts, dtype=np.int64)
+
+    def query_counts(self, query: Dict[str, float],
+                     variants: Optional[Dict[str, Sequence[str]]] = None) -> np.ndarray:
+        """Dense (papers x query terms) counts, summing each term's surface-form columns."""
+        variants = variants or {}
+        column_of = np.full(len(self.vocab), -1, dtype=np.int64)
+        for q, term in enumerate(query):
+            for form in [term] + list(variants.get(term, ())):
+                if form in self.vocab:
+                    column_of[self.vocab[form]] = q
+        rows = np.repeat(np.arange(len(self.keys)), np.diff(self.indptr))
+        cols = column_of[self.indices]
+        mask = cols >= 0
+        counts = np.zeros((len(self.keys), len(query)), dtype=np.float64)
+        np.add.at(counts, (rows[mask], cols[mask]), self.data[mask])
+        return counts
+
+    def scores(self, query: Dict[str, float], method: str = "bm25",
+               variants: Optional[Dict[str, Sequence[str]]] = None,
+               k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+        """One score per paper (in self.keys order)."""
+        tf = self.query_counts(query, variants)
+        weights = np.array(list(query.values()), dtype=np.float64)
+        n_docs = len(self.keys)
+        if not n_docs or not len(query):
+            return np.zeros(n_docs)
+        df = (tf > 0).sum(axis=0)
+        if method == "bm25":
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            avg_len = self.doc_lengths.mean() or 1.0
+            norm = k1 * (1 - b + b * self.doc_lengths / avg_len)
+            return (tf * (k1 + 1) / (tf + norm[:, np.newaxis])) @ (weights * idf)
+        if method == "tfidf":
+            idf = np.log(n_docs / np.maximum(df, 1))
+            log_tf = np.zeros_like(tf)
+            present = tf > 0
+            log_tf[present] = 1 + np.log(tf[present])
+            return log_tf @ (weights * idf)
+        raise ValueError(f"unknown ranking method {method!r} (choose from {', '.join(RANK_METHODS)})")
+
+def rank_column(method: str) -> str:
+    return {"bm25": "BM25_Score", "tfidf": "TFIDF_Score"}[method]
+
+def phrases_of(query: Dict[str, float]) -> List[str]:
+    return [term for term in query if ' ' in term]
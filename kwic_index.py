@@ -0,0 +1,280 @@
+# kwic_index.py
+"""
+Positional inverted index over Keyboard_Interface_Texts for ad-hoc KWIC queries.
+
+Build once, then answer term, phrase and proximity queries in milliseconds
+instead of editing TARGET_KEYWORDS and rescanning the whole corpus:
+
+    python kwic_index.py build [--normalized]
+    python kwic_index.py query piano
+    python kwic_index.py query '"grand piano"'
+    python kwic_index.py query 'velocity NEAR/10 keyboard' --limit 20
+
+On-disk layout (INDEX_DIR):
+    docs.json      document table: relative path, pdf_name, Year, size, mtime
+    vocab.json     term -> [first posting, posting count], terms sorted
+    doc_ids.npy    int32 document id per posting        \
+    positions.npy  int32 token position per posting      | grouped by term,
+    starts.npy     int32 character start per posting     | then doc, position
+    ends.npy       int32 character end per posting      /
+The .npy arrays are opened with mmap_mode='r', so a query only touches the
+postings of its own terms. Snippets are cut straight from the stored offsets.
+
+With --normalized, tokens come from the cached normalized text
+(normalized_text.py: ligatures expanded, hyphenated line breaks joined)
+and their offsets are mapped back to the raw text before they are stored.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from corpus_pack import collect_text_files, read_text, year_from_pdf_name
+from normalized_text import HYPHEN_GAP, NORMALIZER_ID, load_normalized
+
+# Paths
+TEXT_DIR = os.path.join(os.getcwd(), "Keyboard_Interface_Texts")
+INDEX_DIR = os.path.join(os.getcwd(), "KWIC_Screening", "kwic_index")
+
+TOKEN_PATTERN = re.compile(r'\w+')
+POSTING_ARRAYS = ['doc_ids', 'positions', 'starts', 'ends']
+CONTEXT_WINDOW = 80
+NEAR_PATTERN = re.compile(r'^(.+?)\s+NEAR/(\d+)\s+(.+)$')
+
+def tokenize_query(text: str) -> List[str]:
+    """Lowercased word tokens, using the same tokenizer as the index."""
+    return [tok.lower() for tok in TOKEN_PATTERN.findall(text)]
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def build_index(text_dir: str = TEXT_DIR, index_dir: str = INDEX_DIR, normalized: bool = False) -> Dict[str, int]:
+    """Tokenize every text once and write the positional index to index_dir."""
+    txt_files = collect_text_files(text_dir)
+    term_ids: Dict[str, int] = {}
+    columns = {name: array('i') for name in ['terms'] + POSTING_ARRAYS}
+    docs = []
+
+    for doc_id, txt_file in enumerate(txt_files):
+        text = read_text(txt_file)
+        stat = txt_file.stat()
+        pdf_name = txt_file.stem + '.pdf'
+        docs.append({
+            'path': txt_file.relative_to(text_dir).as_posix(),
+            'pdf_name': pdf_name,
+            'Year': year_from_pdf_name(pdf_name),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        })
+        view = load_normalized(text) if normalized else None
+        for position, match in enumerate(TOKEN_PATTERN.finditer(view.text if view else text)):
+            term = match.group().lower()
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(term_ids)
+            start, end = view.raw_span(*match.span()) if view else match.span()
+            columns['terms'].append(term_id)
+            columns['doc_ids'].append(doc_id)
+            columns['positions'].append(position)
+            columns['starts'].append(start)
+            columns['ends'].append(end)
+
+    # Renumber terms alphabetically, then group postings by term (stable keeps doc/position order)
+    vocab_terms = sorted(term_ids)
+    remap = np.empty(len(vocab_terms), dtype=np.int32)
+    for new_id, term in enumerate(vocab_terms):
+        remap[term_ids[term]] = new_id
+    terms = remap[np.frombuffer(columns['terms'], dtype=np.int32)]
+    order = np.argsort(terms, kind='stable')
+    counts = np.bincount(terms, minlength=len(vocab_terms))
+    firsts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    Path(index_dir).mkdir(parents=True, exist_ok=True)
+    for name in POSTING_ARRAYS:
+        np.save(os.path.join(index_dir, name + '.npy'), np.frombuffer(columns[name], dtype=np.int32)[order])
+    with open(os.path.join(index_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump({term: [int(firsts[i]), int(counts[i])] for i, term in enumerate(vocab_terms)}, f, ensure_ascii=False)
+    with open(os.path.join(index_dir, 'docs.json'), 'w', encoding='utf-8') as f:
+        json.dump({'text_dir': os.path.abspath(text_dir), 'normalizer': NORMALIZER_ID if normalized else None,
+                   'docs': docs}, f, ensure_ascii=False)
+
+    return {'docs': len(docs), 'terms': len(vocab_terms), 'postings': int(len(order))}
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+class KwicIndex:
+    """Read-only, memory-mapped view of an index written by build_index."""
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        with open(os.path.join(index_dir, 'vocab.json'), 'r', encoding='utf-8') as f:
+            self.vocab: Dict[str, List[int]] = json.load(f)
+        with open(os.path.join(index_dir, 'docs.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.text_dir = meta['text_dir']
+        self.normalizer = meta.get('normalizer')
+        self.docs = meta['docs']
+        self.arrays = {name: np.load(os.path.join(index_dir, name + '.npy'), mmap_mode='r')
+                       for name in POSTING_ARRAYS}
+
+    def stale_docs(self) -> List[str]:
+        """Documents changed or removed since the index was built (their offsets may be wrong)."""
+        stale = []
+        for doc in self.docs:
+            path = os.path.join(self.text_dir, doc['path'])
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stale.append(doc['path'])
+                continue
+            if stat.st_size != doc['size'] or stat.st_mtime_ns != doc['mtime_ns']:
+                stale.append(doc['path'])
+        return stale
+
+    def postings(self, term: str) -> Dict[str, np.ndarray]:
+        """All postings for one term (empty arrays when the term is not indexed)."""
+        first, count = self.vocab.get(term, (0, 0))
+        return {name: np.asarray(arr[first:first + count]) for name, arr in self.arrays.items()}
+
+    def phrase(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Consecutive-token matches -> (doc_ids, first positions, char starts, char ends)."""
+        if not tokens:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, empty, empty
+        head = self.postings(tokens[0])
+        keys = _posting_keys(head['doc_ids'], head['positions'])
+        keep = np.ones(len(keys), dtype=bool)
+        ends = head['ends']
+        for offset, token in enumerate(tokens[1:], start=1):
+            post = self.postings(token)
+            other = _posting_keys(post['doc_ids'], post['positions'])
+            idx = np.searchsorted(other, keys + offset)
+            idx_clipped = np.minimum(idx, max(len(other) - 1, 0))
+            found = (idx < len(other)) & (other[idx_clipped] == keys + offset) if len(other) else np.zeros(len(keys), bool)
+            keep &= found
+            if len(other):
+                ends = np.where(found, post['ends'][idx_clipped], ends)
+        return head['doc_ids'][keep], head['positions'][keep], head['starts'][keep], ends[keep]
+
+    def near(self, left: List[str], right: List[str], distance: int):
+        """Matches of phrase `left` within `distance` tokens of phrase `right` (either order)."""
+        l_docs, l_pos, l_starts, l_ends = self.phrase(left)
+        r_docs, r_pos, r_starts, r_ends = self.phrase(right)
+        if not len(l_docs) or not len(r_docs):
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, empty, empty
+        r_keys = _posting_keys(r_docs, r_pos)
+        l_keys = _posting_keys(l_docs, l_pos)
+        idx = np.searchsorted(r_keys, l_keys)
+        best = np.full(len(l_keys), -1)
+        best_gap = np.full(len(l_keys), np.iinfo(np.int64).max)
+        # The nearest right-hand match is just before or at the insertion point
+        for cand in (idx - 1, idx):
+            valid = (cand >= 0) & (cand < len(r_keys))
+            c = np.clip(cand, 0, len(r_keys) - 1)
+            gap = np.abs(r_keys[c] - l_keys)
+            same_doc = r_docs[c] == l_docs
+            better = valid & same_doc & (gap < best_gap)
+            best = np.where(better, c, best)
+            best_gap = np.where(better, gap, best_gap)
+        # Phrase lengths count towards the window
+        span = np.where(r_keys[np.maximum(best, 0)] >= l_keys, len(left) - 1, len(right) - 1)
+        keep = (best >= 0) & (best_gap - span <= distance)
+        b = best[keep]
+        return (l_docs[keep], l_pos[keep],
+                np.minimum(l_starts[keep], r_starts[b]), np.maximum(l_ends[keep], r_ends[b]))
+
+    def search(self, query: str):
+        """Dispatch a query string: 'term', '"a phrase"' or 'A NEAR/k B'."""
+        near = NEAR_PATTERN.match(query.strip())
+        if near:
+            return self.near(tokenize_query(near.group(1)), tokenize_query(near.group(3)), int(near.group(2)))
+        return self.phrase(tokenize_query(query))
+
+    def snippet(self, doc_id: int, start: int, end: int, window: int = CONTEXT_WINDOW,
+                cache: Dict[int, str] = None) -> str:
+        """KWIC snippet for a hit, cut from the original text at the stored offsets."""
+        if cache is not None and doc_id in cache:
+            text = cache[doc_id]
+        else:
+            text = read_text(Path(self.text_dir) / self.docs[doc_id]['path'])
+            if cache is not None:
+                cache[doc_id] = text
+        before = text[max(0, start - window):start].replace('\n', ' ').strip()
+        after = text[end:end + window].replace('\n', ' ').strip()
+        word = text[start:end]
+        if self.normalizer:
+            # Tokens joined across a line break ("key-\nboard") are shown whole
+            word = HYPHEN_GAP.sub('', word)
+        return f"...{before} [{word.replace(chr(10), ' ').upper()}] {after}..."
+
+def _posting_keys(doc_ids: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Combine (doc, position) into one sortable int64 key."""
+    return (doc_ids.astype(np.int64) << 32) | positions.astype(np.int64)
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Positional inverted index for ad-hoc KWIC queries.")
+    parser.add_argument("--index-dir", default=INDEX_DIR, help=f"Index location (default: {INDEX_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from the text corpus")
+    build.add_argument("--text-dir", default=TEXT_DIR, help=f"Text corpus (default: {TEXT_DIR})")
+    build.add_argument("--normalized", action="store_true",
+                       help="Tokenize the normalized text (ligatures expanded, hyphenated line breaks joined)")
+
+    query = sub.add_parser("query", help="Run a term, phrase or 'A NEAR/k B' query")
+    query.add_argument("query", help="e.g. piano, '\"grand piano\"', 'velocity NEAR/10 keyboard'")
+    query.add_argument("--limit", type=int, default=10, help="Snippets to print (default: 10, 0 = counts only)")
+    query.add_argument("--window", type=int, default=CONTEXT_WINDOW, help="Context characters per side")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "build":
+        if not os.path.isdir(args.text_dir):
+            print(f"Error: Text directory not found: {args.text_dir}")
+            sys.exit(1)
+        t0 = time.perf_counter()
+        stats = build_index(args.text_dir, args.index_dir, args.normalized)
+        print(f"✓ Indexed {stats['docs']} documents, {stats['terms']} terms, {stats['postings']} postings "
+              f"in {time.perf_counter() - t0:.1f}s -> {args.index_dir}")
+        return
+
+    if not os.path.exists(os.path.join(args.index_dir, 'vocab.json')):
+        print(f"Error: No index found in {args.index_dir}")
+        print("Please run: python kwic_index.py build")
+        sys.exit(1)
+
+    index = KwicIndex(args.index_dir)
+    stale = index.stale_docs()
+    if stale:
+        print(f"Warning: {len(stale)} texts changed since the index was built; rebuild for exact offsets.")
+
+    t0 = time.perf_counter()
+    doc_ids, _, starts, ends = index.search(args.query)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    n_docs = len(np.unique(doc_ids))
+    print(f"{len(doc_ids)} hits in {n_docs} of {len(index.docs)} papers ({elapsed_ms:.1f} ms)")
+
+    cache: Dict[int, str] = {}
+    for doc_id, start, end in list(zip(doc_ids, starts, ends))[:max(args.limit, 0)]:
+        doc = index.docs[int(doc_id)]
+        print(f"\n[{doc['Year']}] {doc['pdf_name']}")
+        print("  " + index.snippet(int(doc_id), int(start), int(end), args.window, cache))
+
+if __name__ == "__main__":
+    main()
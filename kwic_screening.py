@@ -5,191 +5,1155 @@ Step 1: Generates context snippets around keyboard/interface keywords.
 Step 2: Aggregates to paper-level with auto-scoring based on NIME context.
 """
 import os
+import sys
 import csv
 import re
+import json
+import hashlib
+import math
+import heapq
+import pickle
+import argparse
+import itertools
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Sized, Tuple, Union
+import numpy as np
 import pandas as pd
 
+from corpus_pack import CorpusPack, collect_text_files, decode_text, ensure_pack, read_text, year_from_pdf_name
+from fulltext_rank import RANK_METHODS, TermFrequencies, parse_query, phrases_of, rank_column
+from near_duplicates import DUPLICATES_CSV, load_collapsed
+from normalized_text import HYPHEN_GAP, NORMALIZER_ID, NormalizedText, load_normalized
+from pipeline_metrics import NO_METRICS, Metrics, add_metrics_args, measure
+
 # Paths
 TEXT_DIR = os.path.join(os.getcwd(), "Keyboard_Interface_Texts")
 OUTPUT_DIR = os.path.join(os.getcwd(), "KWIC_Screening")
 KWIC_DETAILS_CSV = os.path.join(OUTPUT_DIR, "kwic_details_all_instances.csv")
+KWIC_DETAILS_PARQUET = os.path.join(OUTPUT_DIR, "kwic_details_all_instances.parquet")
 KWIC_SCREENING_CSV = os.path.join(OUTPUT_DIR, "kwic_context_screening.csv")
+KWIC_ORPHANED_LABELS_CSV = os.path.join(OUTPUT_DIR, "kwic_orphaned_labels.csv")
+KWIC_MANIFEST_JSON = os.path.join(OUTPUT_DIR, "kwic_manifest.json")
+KWIC_METRICS_JSON = os.path.join(OUTPUT_DIR, "kwic_metrics.json")
+KWIC_PACK = os.path.join(OUTPUT_DIR, "corpus_texts.pack")
 
 # Keywords
 TARGET_KEYWORDS = ['organ', 'keyboard', 'piano', 'clavichord', 'harpsichord', 'accordion', 'interface', 'layout']
 CONTEXT_WINDOW = 80
 
-def get_kwic_snippets(text: str, keywords: List[str], window: int = CONTEXT_WINDOW) -> List[dict]:
-    snippets = []
-    t = text.lower()
+# Manual screening columns, carried over between runs by pdf_name
+LABEL_COLUMNS = ['KEEP(1)_or_EXCLUDE(0)', 'EXCLUSION_REASON']
+# Bump when the manifest layout or snippet/score semantics change
+MANIFEST_VERSION = 1
+
+DETAIL_COLUMNS = ['Year', 'pdf_name', 'context_before', 'keyword', 'matched_word', 'context_after', 'manual_decision']
+CATEGORICAL_DETAIL_COLUMNS = ['Year', 'keyword', 'pdf_name']
+
+# Scoring vocabulary (see calculate_scores)
+# "High Reliability Musical Instruments": uniform +5.0 boost per occurrence
+INSTRUMENT_BOOST_KEYWORDS = ['piano', 'harpsichord', 'clavichord', 'accordion', 'organ']
+# Musical context terms (+1.5 points per occurrence)
+MUSICAL_TERMS = ['musical', 'expression', 'haptic', 'force', 'sensor', 'velocity', 'synthesizer', 'midi', 'controller', 'timbre']
+# HCI/typing noise terms (-2.5 points per occurrence)
+EXCLUDE_TERMS = ['qwerty', 'typing', 'text entry', 'alphanumeric', 'computer keyboard', 'password', 'office']
+SNIPPET_PREVIEW_CHARS = 60
+MAX_PREVIEW_SNIPPETS = 8
+# Papers whose scoring blobs are counted together in the default mode
+TERM_BATCH_PAPERS = 256
+# With --jobs: most files per worker task, and tasks in flight per worker (bounds buffered results)
+SCAN_CHUNK_FILES = 16
+SCAN_WINDOW_CHUNKS = 4
+
+# Keywords that also match player forms (pianist, organists, ...); the rest only take a plural 's'
+PLAYER_SUFFIX_KEYWORDS = ['keyboard', 'piano', 'organ', 'accordion']
+
+# Weighted query for the optional full-text ranking (--rank, see fulltext_rank.py)
+FULLTEXT_QUERY = {
+    **{kw: 2.0 for kw in INSTRUMENT_BOOST_KEYWORDS},
+    'keyboard': 1.5, 'interface': 0.5, 'layout': 0.5,
+    **{w: 1.0 for w in MUSICAL_TERMS},
+    **{w: -1.5 for w in EXCLUDE_TERMS},
+}
+
+@lru_cache(maxsize=None)
+def build_keyword_matcher(keywords: Tuple[str, ...]) -> re.Pattern:
+    """Compile one alternation regex that finds every keyword (with suffix variants) in a single scan.
+
+    Each keyword gets its own capturing group, so match.lastindex - 1 is the
+    keyword's index in `keywords`. Matches always span a whole word, so hits of
+    different keywords never overlap and one pass finds exactly the union of
+    the per-keyword scans.
+    """
+    alternatives = []
     for keyword in keywords:
-        if keyword in ['keyboard', 'piano', 'organ', 'accordion']:
-            pattern = r'\b' + re.escape(keyword) + r'(s|ist|ists)?\b'
-        else:
-            pattern = r'\b' + re.escape(keyword) + r's?\b'
-        
-        for match in re.finditer(pattern, t):
-            start_pos = max(0, match.start() - window)
-            end_pos = min(len(text), match.end() + window)
-            # Remove internal newlines for cleaner CSV
-            before = text[start_pos:match.start()].replace('\n', ' ').strip()
-            after = text[match.end():end_pos].replace('\n', ' ').strip()
-            matched_word = text[match.start():match.end()]
-            
-            snippets.append({
-                'keyword': keyword,
-                'matched_word': matched_word,
-                'before': before,
-                'after': after
-            })
+        suffix = r'(?:s|ist|ists)?' if keyword in PLAYER_SUFFIX_KEYWORDS else r's?'
+        alternatives.append('(' + re.escape(keyword) + ')' + suffix)
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b')
+
+def find_keyword_hits(text: str, keywords: List[str],
+                      normalized: NormalizedText = None) -> Tuple[array, array, array]:
+    """(keyword ids, starts, ends) of every keyword hit in text, as typed arrays of raw offsets.
+
+    With a NormalizedText of text, matching runs on the normalized form
+    (ligatures, hyphenated line breaks) and each hit is mapped back to its
+    raw span, so snippets still show the original extraction.
+    """
+    t = normalized.text if normalized is not None else text.lower()
+    # Single pass over the text; hits are bucketed per keyword so they keep
+    # the keyword-major, position-minor order of the original per-keyword scans.
+    starts = [array('i') for _ in keywords]
+    ends = [array('i') for _ in keywords]
+    for match in build_keyword_matcher(tuple(keywords)).finditer(t):
+        start, end = normalized.raw_span(*match.span()) if normalized is not None else match.span()
+        starts[match.lastindex - 1].append(start)
+        ends[match.lastindex - 1].append(end)
+
+    keyword_ids, all_starts, all_ends = array('h'), array('i'), array('i')
+    for keyword_id in range(len(keywords)):
+        keyword_ids.extend(itertools.repeat(keyword_id, len(starts[keyword_id])))
+        all_starts.extend(starts[keyword_id])
+        all_ends.extend(ends[keyword_id])
+    return keyword_ids, all_starts, all_ends
+
+def kwic_context(text: str, start: int, end: int, window: int = CONTEXT_WINDOW,
+                 normalized: bool = False) -> Tuple[str, str, str]:
+    """(before, matched_word, after) for the hit text[start:end]."""
+    start_pos = max(0, start - window)
+    end_pos = min(len(text), end + window)
+    # Remove internal newlines for cleaner CSV
+    before = text[start_pos:start].replace('\n', ' ').strip()
+    after = text[end:end_pos].replace('\n', ' ').strip()
+    matched_word = text[start:end]
+    if normalized:
+        # A word joined across a line break ("key-\nboard") is reported whole
+        matched_word = HYPHEN_GAP.sub('', matched_word)
+    return before, matched_word, after
+
+def get_kwic_snippets(text: str, keywords: List[str], window: int = CONTEXT_WINDOW,
+                      normalized: NormalizedText = None) -> List[dict]:
+    """Keyword hits with their context, cut from text (see find_keyword_hits)."""
+    snippets = []
+    for keyword_id, start, end in zip(*find_keyword_hits(text, keywords, normalized)):
+        before, matched_word, after = kwic_context(text, start, end, window, normalized is not None)
+        snippets.append({
+            'keyword': keywords[keyword_id],
+            'matched_word': matched_word,
+            'before': before,
+            'after': after
+        })
     return snippets
 
-def main():
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    txt_files = sorted(Path(TEXT_DIR).glob("*.txt")) + sorted(Path(TEXT_DIR).glob("*/*.txt"))
-    if not txt_files:
-        print(f"No .txt files found in {TEXT_DIR}")
-        return
+def compute_idf_weights(df: pd.DataFrame, keywords: List[str]) -> Dict[str, float]:
+    """IDF per keyword over the papers in df: log10(Total Docs / Docs containing keyword)."""
+    total_docs = df['pdf_name'].nunique()
+    docs_per_kw = df.groupby('keyword')['pdf_name'].nunique()
+    idf_weights = {}
+    for kw in keywords:
+        docs_with_kw = int(docs_per_kw.get(kw, 0))
+        idf_weights[kw] = math.log10(total_docs / docs_with_kw) if docs_with_kw > 0 else 0
+    return idf_weights
+
+@lru_cache(maxsize=None)
+def build_term_counters(terms: Tuple[str, ...]) -> List[Tuple[re.Pattern, Dict[str, int]]]:
+    """Compile alternation regexes that count whole-word terms in one scan each.
+
+    Returns (pattern, {matched text: column}) layers. Multi-word terms only
+    consume their first word and check the rest with a lookahead, so
+    overlapping terms from different lists ('computer keyboard' and
+    'keyboard') are each counted, as separate re.findall calls would. Terms
+    sharing a first word ('force' / 'force sensor') go into separate layers;
+    the default vocabulary needs a single layer. Terms must start with a
+    word character.
+    """
+    layers: List[Dict[str, int]] = []
+    for col, term in enumerate(terms):
+        first_word = re.match(r'\w+', term).group()
+        for layer in layers:
+            if first_word not in layer:
+                break
+        else:
+            layer = {}
+            layers.append(layer)
+        layer[first_word] = col
+
+    counters = []
+    for layer in layers:
+        alternatives = []
+        for first_word, col in layer.items():
+            rest = terms[col][len(first_word):]
+            lookahead = '(?=' + re.escape(rest) + r'\b)' if rest else r'\b'
+            alternatives.append(re.escape(first_word) + lookahead)
+        # No capturing groups: they make Python's regex engine several times slower
+        counters.append((re.compile(r'\b(?:' + '|'.join(alternatives) + ')'), layer))
+    return counters
+
+def build_term_matrix(blobs: Sequence[str], terms: Sequence[str]) -> np.ndarray:
+    """Count whole-word occurrences of every term in every blob -> (len(blobs), len(terms)) int matrix.
+
+    The blobs are joined into one newline-separated corpus and scanned once;
+    match positions are mapped back to their blob with a binary search.
+    Terms must not contain newlines, so no match can span two blobs.
+    """
+    matrix = np.zeros((len(blobs), len(terms)), dtype=np.int64)
+    if not len(blobs) or not len(terms):
+        return matrix
+    corpus = '\n'.join(blobs)
+    # Start offset of each blob inside the joined corpus
+    starts = np.cumsum([0] + [len(b) + 1 for b in blobs[:-1]])
+    for pattern, columns in build_term_counters(tuple(terms)):
+        positions = []
+        cols = []
+        for match in pattern.finditer(corpus):
+            positions.append(match.start())
+            cols.append(columns[match.group()])
+        if positions:
+            rows = np.searchsorted(starts, np.asarray(positions), side='right') - 1
+            np.add.at(matrix, (rows, np.asarray(cols)), 1)
+    return matrix
+
+def calculate_scores(hit_counts: np.ndarray, term_matrix: np.ndarray, terms: Sequence[str],
+                     idf_weights: Dict[str, float]) -> np.ndarray:
+    """Frequency-based Density Scoring (Objective + Contextual) for all papers at once.
+
+    term_matrix[i, j] counts terms[j] in paper i's snippets (see build_term_matrix).
+    Operations are applied column by column in the same order as the original
+    per-paper loop, so scores are bit-for-bit identical to it.
+    """
+    column = {term: j for j, term in enumerate(terms)}
+
+    def counts(term: str) -> np.ndarray:
+        return term_matrix[:, column[term]]
+
+    # 1. Global Hit Reward: The more times keywords appear in the paper, the more relevant.
+    scores = np.array([math.log2(h + 1) * 2 for h in hit_counts], dtype=np.float64)
+
+    # 2. IDF-based Instrumental Density
+    for kw, weight in idf_weights.items():
+        count = counts(kw)
+        # Basic contribution from mathematical rarity (IDF)
+        contribution = (weight * 5) * count
+        # Domain Knowledge Boost:
+        # These terms are treated as "High Reliability Musical Instruments".
+        # They receive a uniform +5.0 boost per occurrence because their presence
+        # is a near-certain indicator of musical relevance, regardless of their frequency.
+        if kw in INSTRUMENT_BOOST_KEYWORDS:
+            contribution = contribution + 5.0 * count
+        scores += contribution
+
+    # 3. Musical Context Density (+1.5 points per occurrence)
+    for w in MUSICAL_TERMS:
+        scores += counts(w) * 1.5
+
+    # 4. HCI/Typing Penalty (Slightly higher penalty to filter noise)
+    for w in EXCLUDE_TERMS:
+        scores -= counts(w) * 2.5
+
+    return scores
+
+def scoring_terms(keywords: Sequence[str]) -> List[str]:
+    """Columns of the paper x term matrix: IDF keywords, musical terms, HCI penalty terms."""
+    return list(dict.fromkeys(list(keywords) + MUSICAL_TERMS + EXCLUDE_TERMS))
+
+def aggregate_papers(df: pd.DataFrame, idf_weights: Dict[str, float]) -> pd.DataFrame:
+    """Aggregate snippet rows to one scored row per (Year, pdf_name), sorted by Auto_Priority_Score."""
+    before = df['context_before'].fillna('').astype(str)
+    after = df['context_after'].fillna('').astype(str)
+    word = df['matched_word'].fillna('KEYWORD').astype(str)
+    keys = df[['Year', 'pdf_name']]
+
+    # Preview: up to 8 unique snippets per paper, in row order
+    snippets = keys.assign(
+        snippet='...' + before.str[-SNIPPET_PREVIEW_CHARS:] + ' [' + word.str.upper() + '] '
+                + after.str[:SNIPPET_PREVIEW_CHARS] + '...'
+    )
+    snippets = snippets.drop_duplicates().groupby(['Year', 'pdf_name'], sort=False).head(MAX_PREVIEW_SNIPPETS)
+    previews = snippets.groupby(['Year', 'pdf_name'])['snippet'].agg(' \n\n '.join)
+
+    # Score on the ENTIRE set of snippets for a paper, not just the 8-snippet preview
+    blobs = keys.assign(blob=before + ' ' + df['keyword'].astype(str) + ' ' + after)
+    grouped = blobs.groupby(['Year', 'pdf_name'])['blob']
+    paper_blobs = grouped.agg(' '.join).str.lower()
+    hit_counts = grouped.size()
+
+    terms = scoring_terms(list(idf_weights))
+    term_matrix = build_term_matrix(paper_blobs.tolist(), terms)
+    return build_consolidated(hit_counts.index, previews.loc[hit_counts.index].tolist(),
+                              hit_counts.to_numpy(), term_matrix, idf_weights)
 
-    print(f"1. Extracting KWIC from {len(txt_files)} files...")
-    kwic_data = []
+def build_consolidated(paper_keys, previews: List[str], hit_counts: np.ndarray,
+                       term_matrix: np.ndarray, idf_weights: Dict[str, float]) -> pd.DataFrame:
+    """Score papers and return the screening table sorted by Auto_Priority_Score.
+
+    paper_keys are the (Year, pdf_name) pairs in sorted order; term_matrix
+    columns follow scoring_terms(idf_weights).
+    """
+    terms = scoring_terms(list(idf_weights))
+    scores = calculate_scores(hit_counts, term_matrix, terms, idf_weights)
+    index = pd.MultiIndex.from_tuples(list(paper_keys), names=['Year', 'pdf_name'])
+    consolidated = pd.DataFrame({
+        'Aggregated_Context': previews,
+        'Hit_Count': hit_counts,
+        'Auto_Priority_Score': scores,
+    }, index=index).reset_index()
+    return consolidated.sort_values(by='Auto_Priority_Score', ascending=False).reset_index(drop=True)
+
+def iter_corpus_texts(txt_files: List[Path]) -> Iterator[Tuple[str, str, str]]:
+    """Lazily read the corpus, yielding (Year, pdf_name, text) one file at a time."""
     for txt_file in txt_files:
         try:
-            with open(txt_file, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read()
-            pdf_name = txt_file.stem + '.pdf'
-            
-            # Extract Year from filename (e.g., nime2013_Batula.pdf -> 2013)
-            year_match = re.search(r'nime(\d{4})_', pdf_name)
-            year = year_match.group(1) if year_match else "Unknown"
-
-            snippets = get_kwic_snippets(text, TARGET_KEYWORDS)
-            for s in snippets:
-                kwic_data.append({
-                    'Year': year,
-                    'pdf_name': pdf_name,
-                    'context_before': s['before'],
-                    'keyword': s['keyword'],
-                    'matched_word': s['matched_word'],
-                    'context_after': s['after'],
-                    'manual_decision': ''
-                })
+            text = read_text(txt_file)
         except Exception as e:
             print(f"Error processing {txt_file.name}: {e}")
+            continue
+        pdf_name = txt_file.stem + '.pdf'
+        yield year_from_pdf_name(pdf_name), pdf_name, text
 
-    # Sorting
-    kwic_data.sort(key=lambda x: (x['Year'], x['pdf_name'], x['keyword']))
-    
-    # Write Word-level Details (Detailed data for record)
-    with open(KWIC_DETAILS_CSV, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['Year', 'pdf_name', 'context_before', 'keyword', 'matched_word', 'context_after', 'manual_decision']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(kwic_data)
-    print(f"✓ Detailed instance backup saved: {KWIC_DETAILS_CSV}")
+def corpus_texts(txt_files: List[Path], pack: CorpusPack = None) -> Iterator[Tuple[str, str, str]]:
+    """(Year, pdf_name, text) from the packed corpus when given, else from the text files."""
+    return pack.iter_texts() if pack is not None else iter_corpus_texts(txt_files)
+
+def iter_detail_rows(year: str, pdf_name: str, text: str, normalized: bool = False) -> Iterator[tuple]:
+    """Yield one row per keyword instance, with fields in DETAIL_COLUMNS order."""
+    view = load_normalized(text) if normalized else None
+    for s in get_kwic_snippets(text, TARGET_KEYWORDS, normalized=view):
+        yield (year, pdf_name, s['before'], s['keyword'], s['matched_word'], s['after'], '')
+
+def scan_text(year: str, pdf_name: str, text: str, metrics: Metrics = NO_METRICS,
+              normalized: bool = False) -> List[tuple]:
+    """All detail rows of one text, timed per file when metrics are enabled."""
+    with metrics.file(pdf_name, "kwic", size_bytes=len(text)):
+        return list(iter_detail_rows(year, pdf_name, text, normalized))
+
+# A text to scan in a worker process: a .txt path, a pack document, or an already loaded (Year, pdf_name, text)
+ScanSource = Union[str, Dict, Tuple[str, str, str]]
+# Pack opened once per worker process (see _init_scan_worker)
+_worker_pack: Optional[CorpusPack] = None
+
+def _init_scan_worker(pack_path: Optional[str]) -> None:
+    global _worker_pack
+    if pack_path:
+        _worker_pack = CorpusPack(pack_path)
+
+def read_source(source: ScanSource, pack: CorpusPack = None) -> Tuple[str, str, str]:
+    """(Year, pdf_name, text) of a scan source; pack documents come from pack, else the worker's pack."""
+    if isinstance(source, str):
+        text = read_text(source)
+        pdf_name = Path(source).stem + '.pdf'
+        return year_from_pdf_name(pdf_name), pdf_name, text
+    if isinstance(source, dict):
+        return source['Year'], source['pdf_name'], (pack if pack is not None else _worker_pack).text(source)
+    return source
+
+def _scan_job(source: ScanSource, normalized: bool = False, timed: bool = False, hits: bool = False,
+              pack: CorpusPack = None) -> tuple:
+    """Scan one text (also the worker entry point): (Year, pdf_name, result, error, timing, size).
+
+    result is the text's detail rows, with hits=True its find_keyword_hits
+    arrays, or None when the text was skipped. Errors are returned instead
+    of printed, so messages appear in corpus order.
+    """
+    try:
+        year, pdf_name, text = read_source(source, pack)
+    except Exception as e:
+        name = Path(source).name if isinstance(source, str) else source['pdf_name']
+        return None, None, None, f"Error processing {name}: {e}", None, 0
+
+    def scan():
+        if hits:
+            return find_keyword_hits(text, TARGET_KEYWORDS, load_normalized(text) if normalized else None)
+        return list(iter_detail_rows(year, pdf_name, text, normalized))
+
+    try:
+        result, timing = measure(scan) if timed else (scan(), None)
+    except Exception as e:
+        return year, pdf_name, None, f"Error processing {pdf_name}: {e}", None, len(text)
+    return year, pdf_name, result, None, timing, len(text)
+
+def corpus_sources(txt_files: List[Path], pack: CorpusPack = None) -> List[ScanSource]:
+    """The corpus as scan sources: pack documents when given, else the text file paths."""
+    return list(pack.docs) if pack is not None else [str(t) for t in txt_files]
+
+def _scan_chunk(sources: List[ScanSource], **options) -> List[tuple]:
+    """_scan_job over several sources in one task (worker entry point)."""
+    return [_scan_job(source, **options) for source in sources]
+
+def scan_sources(sources: Iterable[ScanSource], jobs: int = 1, metrics: Metrics = NO_METRICS,
+                 pack: CorpusPack = None, normalized: bool = False, hits: bool = False) -> Iterator[tuple]:
+    """(Year, pdf_name, result) per source in input order (see _scan_job); skipped texts give result None.
+
+    With jobs > 1 the texts are read and scanned in worker processes (each
+    maps the pack itself), so only file paths or pack entries and the
+    results cross process boundaries. At most jobs * SCAN_WINDOW_CHUNKS
+    tasks are in flight and they are consumed in submission order, so
+    memory stays bounded (sources may be a lazy iterator) and the caller
+    sees exactly the sequence of the serial loop, whatever the number of
+    workers.
+    """
+    options = dict(normalized=normalized, timed=metrics.enabled, hits=hits)
+    if jobs <= 1:
+        results = map(partial(_scan_job, pack=pack, **options), sources)
+        executor = None
+    else:
+        # Several files per task amortize the inter-process round trip of small texts
+        chunksize = max(1, min(SCAN_CHUNK_FILES, len(sources) // (jobs * SCAN_WINDOW_CHUNKS))) \
+            if isinstance(sources, Sized) else 1
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_scan_worker,
+                                       initargs=(pack.pack_path if pack is not None else None,))
+        results = _windowed_results(executor, partial(_scan_chunk, **options), iter(sources),
+                                    chunksize, jobs * SCAN_WINDOW_CHUNKS)
+    try:
+        for year, pdf_name, result, error, timing, size in results:
+            if error:
+                print(error)
+            if timing is not None:
+                metrics.add_file(pdf_name, timing, "kwic", size_bytes=size)
+            yield year, pdf_name, result
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def _windowed_results(executor: ProcessPoolExecutor, job: Callable[[List[ScanSource]], List[tuple]],
+                      sources: Iterator[ScanSource], chunksize: int, window: int) -> Iterator[tuple]:
+    """job's results per source in order, with at most window chunks submitted ahead of the consumer."""
+    pending = deque()
+
+    def submit_next() -> None:
+        chunk = list(itertools.islice(sources, chunksize))
+        if chunk:
+            pending.append(executor.submit(job, chunk))
+
+    for _ in range(window):
+        submit_next()
+    while pending:
+        results = pending.popleft().result()
+        submit_next()
+        yield from results
+
+def scan_corpus(txt_files: List[Path], metrics: Metrics = NO_METRICS, pack: CorpusPack = None,
+                normalized: bool = False, jobs: int = 1) -> Iterator[Tuple[str, str, List[tuple]]]:
+    """(Year, pdf_name, detail rows) per text in corpus order; unreadable texts are reported and skipped."""
+    for year, pdf_name, rows in scan_sources(corpus_sources(txt_files, pack), jobs, metrics, pack, normalized):
+        if rows is not None:
+            yield year, pdf_name, rows
+
+class KwicHits:
+    """Keyword hits of a corpus as typed arrays: one (doc, keyword, start, end) entry per hit.
+
+    Scanning keeps only these offsets (about 14 bytes per hit) and the
+    document list. Detail rows with their context strings are cut from the
+    document text on demand, one paper at a time (iter_papers), for the
+    details output, the Aggregated_Context preview and the scoring blobs.
+    """
+
+    def __init__(self, keywords: Sequence[str], load_text: Callable[[ScanSource], Tuple[str, str, str]],
+                 normalized: bool = False):
+        self.keywords = list(keywords)
+        self.load_text = load_text
+        self.normalized = normalized
+        self.docs: List[Tuple[str, str, ScanSource]] = []
+        self.doc_ids, self.keyword_ids = array('i'), array('h')
+        self.starts, self.ends = array('i'), array('i')
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, year: str, pdf_name: str, source: ScanSource,
+            keyword_ids: array, starts: array, ends: array) -> None:
+        """Record one document's find_keyword_hits result; documents without hits are not stored."""
+        if not len(keyword_ids):
+            return
+        self.doc_ids.extend(itertools.repeat(len(self.docs), len(keyword_ids)))
+        self.docs.append((year, pdf_name, source))
+        self.keyword_ids.extend(keyword_ids)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+
+    def _paper_of_doc(self) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """Sorted (Year, pdf_name) keys and the key index of every document."""
+        papers = sorted({(year, pdf_name) for year, pdf_name, _ in self.docs})
+        index = {key: i for i, key in enumerate(papers)}
+        return papers, np.array([index[(year, pdf_name)] for year, pdf_name, _ in self.docs], dtype=np.int64)
+
+    def idf_weights(self) -> Dict[str, float]:
+        """compute_idf_weights on the hits: documents are counted by pdf_name."""
+        names, pdf_of_doc = np.unique([pdf_name for _, pdf_name, _ in self.docs], return_inverse=True)
+        hit_pdfs = pdf_of_doc.reshape(-1)[np.frombuffer(self.doc_ids, dtype=np.int32)]
+        pairs = np.unique(hit_pdfs * len(self.keywords) + np.frombuffer(self.keyword_ids, dtype=np.int16))
+        docs_per_kw = np.bincount(pairs % len(self.keywords), minlength=len(self.keywords))
+        total_docs = len(np.unique(hit_pdfs))
+        return {kw: math.log10(total_docs / int(docs_per_kw[k])) if docs_per_kw[k] > 0 else 0
+                for k, kw in enumerate(self.keywords)}
+
+    def iter_papers(self) -> Iterator[Tuple[Tuple[str, str], List[tuple]]]:
+        """((Year, pdf_name), detail rows) per paper, sorted like extract_kwic_details' rows.
+
+        The stable sort on (paper, keyword name) keeps the per-file snippet
+        order; each document is loaded once, while its paper's rows are built.
+        """
+        if not len(self):
+            return
+        papers, paper_of_doc = self._paper_of_doc()
+        keyword_rank = np.argsort(np.argsort(self.keywords, kind='stable'), kind='stable')
+        doc_ids = np.frombuffer(self.doc_ids, dtype=np.int32)
+        keyword_ids = np.frombuffer(self.keyword_ids, dtype=np.int16)
+        hit_papers = paper_of_doc[doc_ids]
+        order = np.argsort(hit_papers * len(self.keywords) + keyword_rank[keyword_ids], kind='stable')
+        # Positions in order where a new paper starts
+        bounds = np.flatnonzero(np.diff(hit_papers[order])) + 1
+        for group in np.split(order, bounds):
+            year, pdf_name = papers[hit_papers[group[0]]]
+            texts: Dict[int, str] = {}
+            rows = []
+            for i in group.tolist():
+                doc_id = self.doc_ids[i]
+                text = texts.get(doc_id)
+                if text is None:
+                    text = texts[doc_id] = self.load_text(self.docs[doc_id][2])[2]
+                before, word, after = kwic_context(text, self.starts[i], self.ends[i], CONTEXT_WINDOW, self.normalized)
+                rows.append((year, pdf_name, before, self.keywords[self.keyword_ids[i]], word, after, ''))
+            yield (year, pdf_name), rows
+
+def collect_kwic_hits(txt_files: List[Path], metrics: Metrics = NO_METRICS, pack: CorpusPack = None,
+                      normalized: bool = False, jobs: int = 1) -> KwicHits:
+    """Scan every text for keyword hits, keeping offsets only (see KwicHits).
+
+    Rows are later cut from the pack, or from the text files read again, so
+    the texts must not change until the hits have been consumed.
+    """
+    hits = KwicHits(TARGET_KEYWORDS, partial(read_source, pack=pack), normalized)
+    sources = corpus_sources(txt_files, pack)
+    for source, (year, pdf_name, found) in zip(sources, scan_sources(sources, jobs, metrics, pack, normalized,
+                                                                       hits=True)):
+        if found is not None:
+            hits.add(year, pdf_name, source, *found)
+    return hits
+
+def detail_sort_key(row: tuple) -> tuple:
+    """(Year, pdf_name, keyword) ordering of the word-level details."""
+    return row[0], row[1], row[3]
+
+def extract_kwic_details(txt_files: List[Path], metrics: Metrics = NO_METRICS, pack: CorpusPack = None,
+                         normalized: bool = False, jobs: int = 1) -> pd.DataFrame:
+    """All detail rows of the corpus as one DataFrame, sorted by (Year, pdf_name, keyword).
+
+    Materializes every snippet of collect_kwic_hits at once; the default
+    mode (run_in_memory) works on the hits directly instead.
+    """
+    columns = {name: [] for name in DETAIL_COLUMNS}
+    for _, rows in collect_kwic_hits(txt_files, metrics, pack, normalized, jobs).iter_papers():
+        for name, values in zip(DETAIL_COLUMNS, zip(*rows)):
+            columns[name].extend(values)
+    return pd.DataFrame(columns, columns=DETAIL_COLUMNS, dtype=object)
+
+class DetailsWriter:
+    """Incremental writer for word-level details (csv or parquet), used by the streaming mode."""
+
+    def __init__(self, fmt: str, path: str, batch_rows: int = 50_000):
+        self.fmt = fmt
+        self.path = path
+        self.batch_rows = batch_rows
+        self._batch: List[tuple] = []
+        self._file = None
+        self._writer = None
+        if fmt == "csv":
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(DETAIL_COLUMNS)
+
+    def write(self, row: tuple) -> None:
+        if self.fmt == "csv":
+            self._writer.writerow(row)
+            return
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_rows:
+            self._flush_parquet()
+
+    def _flush_parquet(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._batch:
+            return
+        arrays = []
+        for name, values in zip(DETAIL_COLUMNS, zip(*self._batch)):
+            array = pa.array(values, type=pa.string())
+            if name in CATEGORICAL_DETAIL_COLUMNS:
+                array = array.dictionary_encode()
+            arrays.append(array)
+        table = pa.Table.from_arrays(arrays, names=DETAIL_COLUMNS)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+        self._batch = []
+
+    def close(self) -> None:
+        if self.fmt == "csv":
+            self._file.close()
+        else:
+            self._flush_parquet()
+            if self._writer is not None:
+                self._writer.close()
+
+def spill_sorted_runs(rows: Iterable[tuple], run_dir: str, run_rows: int) -> List[str]:
+    """Sort rows in chunks of run_rows and spill each chunk to a pickle run file."""
+    run_paths = []
+    buffer: List[tuple] = []
+
+    def spill():
+        buffer.sort(key=detail_sort_key)
+        path = os.path.join(run_dir, f"run_{len(run_paths):05d}.pkl")
+        with open(path, 'wb') as f:
+            for row in buffer:
+                pickle.dump(row, f, protocol=pickle.HIGHEST_PROTOCOL)
+        run_paths.append(path)
+        buffer.clear()
+
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= run_rows:
+            spill()
+    if buffer:
+        spill()
+    return run_paths
+
+def iter_run(path: str) -> Iterator[tuple]:
+    """Read rows back from a run file written by spill_sorted_runs."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def summarize_paper(rows: List[tuple]) -> Tuple[str, int, str]:
+    """(Aggregated_Context preview, Hit_Count, lowercased scoring blob) for one paper's detail rows.
+
+    Row-wise equivalent of the vectorized preview/blob construction in aggregate_papers.
+    """
+    snippets = []
+    blob_parts = []
+    for _, _, before, keyword, word, after, _ in rows:
+        snippets.append(f"...{before[-SNIPPET_PREVIEW_CHARS:]} [{word.upper()}] {after[:SNIPPET_PREVIEW_CHARS]}...")
+        blob_parts.append(f"{before} {keyword} {after}")
+    preview = " \n\n ".join(list(dict.fromkeys(snippets))[:MAX_PREVIEW_SNIPPETS])
+    return preview, len(rows), " ".join(blob_parts).lower()
+
+def run_streaming(txt_files: List[Path], details_fmt: str, run_rows: int,
+                  metrics: Metrics = NO_METRICS, pack: CorpusPack = None, normalized: bool = False,
+                  jobs: int = 1) -> pd.DataFrame:
+    """Bounded-memory KWIC: texts are read lazily, snippets spilled in sorted runs and merged externally.
+
+    Peak memory is one text plus run_rows buffered snippets plus one summary
+    row per paper; the result equals the in-memory pipeline.
+    """
+    docs_per_kw: Dict[str, set] = {kw: set() for kw in TARGET_KEYWORDS}
+    papers = set()
+
+    def rows_with_stats():
+        for _, _, rows in scan_corpus(txt_files, metrics, pack, normalized, jobs):
+            for row in rows:
+                papers.add(row[1])
+                docs_per_kw[row[3]].add(row[1])
+                yield row
+
+    with tempfile.TemporaryDirectory(prefix="kwic_runs_", dir=OUTPUT_DIR) as run_dir:
+        run_paths = spill_sorted_runs(rows_with_stats(), run_dir, run_rows)
+        print(f"   Spilled snippets to {len(run_paths)} sorted run(s)")
+
+        # Step 2: Aggregation while merging the runs
+        print("2. Calculating IDF weights for objective scoring...")
+
+        total_docs = len(papers)
+        idf_weights = {kw: math.log10(total_docs / len(docs_per_kw[kw])) if docs_per_kw[kw] else 0
+                       for kw in TARGET_KEYWORDS}
+        print_idf_weights(idf_weights)
+
+        details_path = {"csv": KWIC_DETAILS_CSV, "parquet": KWIC_DETAILS_PARQUET}.get(details_fmt)
+        writer = DetailsWriter(details_fmt, details_path) if details_path else None
+
+        terms = scoring_terms(TARGET_KEYWORDS)
+        paper_keys, previews, hit_counts, term_rows = [], [], [], []
+        # heapq.merge is stable across runs, so ties keep their original file order
+        merged = heapq.merge(*(iter_run(path) for path in run_paths), key=detail_sort_key)
+        for key, group in itertools.groupby(merged, key=lambda row: (row[0], row[1])):
+            rows = list(group)
+            if writer:
+                for row in rows:
+                    writer.write(row)
+            preview, hit_count, blob = summarize_paper(rows)
+            paper_keys.append(key)
+            previews.append(preview)
+            hit_counts.append(hit_count)
+            term_rows.append(build_term_matrix([blob], terms)[0])
+        if writer:
+            writer.close()
+            print(f"✓ Detailed instance backup saved: {details_path}")
+
+    term_matrix = np.array(term_rows, dtype=np.int64).reshape(len(term_rows), len(terms))
+    return build_consolidated(paper_keys, previews, np.array(hit_counts, dtype=np.int64), term_matrix, idf_weights)
+
+def kwic_config_fingerprint(normalized: bool = False) -> str:
+    """Hash of every setting that affects snippets or paper summaries; a change invalidates the manifest."""
+    config = {
+        'version': MANIFEST_VERSION,
+        'keywords': TARGET_KEYWORDS,
+        'player_suffix_keywords': PLAYER_SUFFIX_KEYWORDS,
+        'window': CONTEXT_WINDOW,
+        'terms': scoring_terms(TARGET_KEYWORDS),
+        'preview': [SNIPPET_PREVIEW_CHARS, MAX_PREVIEW_SNIPPETS],
+    }
+    if normalized:
+        config['normalizer'] = NORMALIZER_ID
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_manifest(path: str, normalized: bool = False) -> dict:
+    """Load the incremental-scan manifest, or return an empty one if missing, unreadable or stale."""
+    empty = {'config': kwic_config_fingerprint(normalized), 'files': {}, 'papers': {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"   Warning: Ignoring unreadable manifest {path}: {e}")
+        return empty
+    if manifest.get('config') != empty['config']:
+        print("   Keyword/scoring settings changed since the last run; rescanning everything")
+        return empty
+    return manifest
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """Write the manifest atomically so an interrupted run never leaves a truncated file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def paper_id(year: str, pdf_name: str) -> str:
+    return f"{year}\t{pdf_name}"
+
+def iter_hashed_texts(txt_files: List[Path], pack: CorpusPack = None
+                      ) -> Iterator[Tuple[str, str, str, Callable[[], str], ScanSource]]:
+    """(relative path, file stem, SHA-256 of the file, text loader, scan source) per document.
+
+    From a pack, digests come from its table and texts are only decoded when
+    the loader is called, so unchanged documents cost nothing. The scan
+    source (pack entry or file path) lets worker processes read the text
+    themselves.
+    """
+    if pack is not None:
+        for doc in pack.docs:
+            yield doc['path'], doc['pdf_name'][:-4], doc['sha256'], (lambda doc=doc: pack.text(doc)), doc
+        return
+    for txt_file in txt_files:
+        rel = txt_file.relative_to(TEXT_DIR).as_posix()
+        try:
+            with open(txt_file, 'rb') as f:
+                data = f.read()
+        except Exception as e:
+            print(f"Error processing {txt_file.name}: {e}")
+            continue
+        yield rel, txt_file.stem, hashlib.sha256(data).hexdigest(), (lambda data=data: decode_text(data)), str(txt_file)
+
+def run_incremental(txt_files: List[Path], details_fmt: str, metrics: Metrics = NO_METRICS,
+                    pack: CorpusPack = None, normalized: bool = False, jobs: int = 1) -> pd.DataFrame:
+    """Rescan only new or changed texts, tracked by content hash in KWIC_MANIFEST_JSON.
+
+    The manifest stores each file's snippets and each paper's summary
+    (preview, Hit_Count, term counts, keywords). Only papers touched by a
+    changed file are re-summarized; IDF weights and scores are then
+    recomputed from the cached summaries, which matches a full run.
+    """
+    manifest = load_manifest(KWIC_MANIFEST_JSON, normalized)
+    old_files = manifest['files']
+    files = {}
+    dirty_papers = set()
+    rescanned = 0
+
+    def changed_texts():
+        for rel, stem, digest, load_text, source in iter_hashed_texts(txt_files, pack):
+            entry = old_files.get(rel)
+            # Every file takes its place in corpus order now; changed entries are replaced once scanned
+            files[rel] = entry
+            if entry is None or entry['sha256'] != digest:
+                yield rel, stem, digest, load_text, source
+
+    def scanned(changed):
+        """(rel, digest, Year, pdf_name, detail rows or None) for each changed text, in order.
+
+        Texts are loaded one at a time. With the pool, workers read them from
+        their path or pack entry; only (rel, digest) of the texts in flight
+        are kept here.
+        """
+        if jobs > 1:
+            in_flight = deque()
+
+            def sources():
+                for rel, _, digest, _, source in changed:
+                    in_flight.append((rel, digest))
+                    yield source
+
+            for year, pdf_name, rows in scan_sources(sources(), jobs, metrics, pack, normalized):
+                rel, digest = in_flight.popleft()
+                yield rel, digest, year, pdf_name, rows
+            return
+        for rel, stem, digest, load_text, _ in changed:
+            text = load_text()
+            pdf_name = stem + '.pdf'
+            year = year_from_pdf_name(pdf_name)
+            try:
+                rows = scan_text(year, pdf_name, text, metrics, normalized)
+            except Exception as e:
+                print(f"Error processing {stem}.txt: {e}")
+                rows = None
+            yield rel, digest, year, pdf_name, rows
+
+    for rel, digest, year, pdf_name, rows in scanned(changed_texts()):
+        entry = files[rel]
+        if rows is None:
+            del files[rel]
+            continue
+        if entry is not None:
+            dirty_papers.add(paper_id(entry['year'], entry['pdf_name']))
+        files[rel] = {'sha256': digest, 'year': year, 'pdf_name': pdf_name,
+                      'rows': [[r[2], r[3], r[4], r[5]] for r in rows]}
+        dirty_papers.add(paper_id(year, pdf_name))
+        rescanned += 1
+
+    for rel in old_files.keys() - files.keys():
+        dirty_papers.add(paper_id(old_files[rel]['year'], old_files[rel]['pdf_name']))
+    removed = len(old_files.keys() - files.keys())
+    print(f"   Rescanned {rescanned} new/changed of {len(files)} files ({removed} removed)")
+
+    # Detail rows per paper, in file order (txt_files is already sorted)
+    paper_rows: Dict[str, List[tuple]] = {}
+    for rel, entry in files.items():
+        key = paper_id(entry['year'], entry['pdf_name'])
+        if details_fmt != "none" or key in dirty_papers:
+            paper_rows.setdefault(key, []).extend(
+                (entry['year'], entry['pdf_name'], before, keyword, word, after, '')
+                for before, keyword, word, after in entry['rows']
+            )
+    for rows in paper_rows.values():
+        rows.sort(key=detail_sort_key)
+
+    terms = scoring_terms(TARGET_KEYWORDS)
+    papers = {key: summary for key, summary in manifest['papers'].items() if key not in dirty_papers}
+    for key in dirty_papers:
+        rows = paper_rows.get(key)
+        if not rows:
+            continue
+        preview, hit_count, blob = summarize_paper(rows)
+        papers[key] = {
+            'preview': preview,
+            'hit_count': hit_count,
+            'terms': build_term_matrix([blob], terms)[0].tolist(),
+            'keywords': sorted({row[3] for row in rows}),
+        }
+
+    manifest = {'config': manifest['config'], 'files': files, 'papers': papers}
+    save_manifest(KWIC_MANIFEST_JSON, manifest)
+
+    ordered = sorted(papers, key=lambda key: tuple(key.split('\t', 1)))
+    if details_fmt != "none":
+        details_path = KWIC_DETAILS_CSV if details_fmt == "csv" else KWIC_DETAILS_PARQUET
+        writer = DetailsWriter(details_fmt, details_path)
+        for key in ordered:
+            for row in paper_rows[key]:
+                writer.write(row)
+        writer.close()
+        print(f"✓ Detailed instance backup saved: {details_path}")
 
-    # Step 2: Aggregation for easier screening
     print("2. Calculating IDF weights for objective scoring...")
-    
-    # Read the data back for processing
-    df = pd.read_csv(KWIC_DETAILS_CSV)
-    
-    # 2.1 Calculate IDF (Inverse Document Frequency)
-    # This provides a mathematical weights based on keyword exclusivity
-    # Formula: log10(Total Docs / Docs containing keyword)
-    total_docs = consolidated_for_idf = df['pdf_name'].nunique()
+    total_docs = len({key.split('\t', 1)[1] for key in papers})
     idf_weights = {}
     for kw in TARGET_KEYWORDS:
-        # Number of papers containing this keyword
-        docs_with_kw = df[df['keyword'] == kw]['pdf_name'].nunique()
-        if docs_with_kw > 0:
-            import math
-            weight = math.log10(total_docs / docs_with_kw)
-            idf_weights[kw] = weight
-        else:
-            idf_weights[kw] = 0
-            
+        docs_with_kw = len({key.split('\t', 1)[1] for key in papers if kw in papers[key]['keywords']})
+        idf_weights[kw] = math.log10(total_docs / docs_with_kw) if docs_with_kw > 0 else 0
+    print_idf_weights(idf_weights)
+
+    term_matrix = np.array([papers[key]['terms'] for key in ordered], dtype=np.int64).reshape(len(ordered), len(terms))
+    return build_consolidated(
+        [tuple(key.split('\t', 1)) for key in ordered],
+        [papers[key]['preview'] for key in ordered],
+        np.array([papers[key]['hit_count'] for key in ordered], dtype=np.int64),
+        term_matrix, idf_weights,
+    )
+
+def aggregate_hits(hits: KwicHits, idf_weights: Dict[str, float], writer: DetailsWriter = None) -> pd.DataFrame:
+    """aggregate_papers on offsets: each paper's rows are cut once, summarized and dropped.
+
+    Rows also go to writer when given. Scoring terms are counted in batches
+    of TERM_BATCH_PAPERS blobs, so only a few papers' strings are alive at
+    a time.
+    """
+    terms = scoring_terms(list(idf_weights))
+    paper_keys, previews, hit_counts, term_blocks, blobs = [], [], [], [], []
+    for key, rows in hits.iter_papers():
+        if writer:
+            for row in rows:
+                writer.write(row)
+        preview, hit_count, blob = summarize_paper(rows)
+        paper_keys.append(key)
+        previews.append(preview)
+        hit_counts.append(hit_count)
+        blobs.append(blob)
+        if len(blobs) >= TERM_BATCH_PAPERS:
+            term_blocks.append(build_term_matrix(blobs, terms))
+            blobs = []
+    term_blocks.append(build_term_matrix(blobs, terms))
+    return build_consolidated(paper_keys, previews, np.array(hit_counts, dtype=np.int64),
+                              np.concatenate(term_blocks), idf_weights)
+
+def read_labeled_rows(csv_path: str) -> pd.DataFrame:
+    """Rows of a screening CSV that carry a manual label, indexed by pdf_name (empty if unreadable)."""
+    empty = pd.DataFrame(columns=LABEL_COLUMNS, index=pd.Index([], name='pdf_name'))
+    if not os.path.exists(csv_path):
+        return empty
+    try:
+        previous = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    except Exception as e:
+        print(f"   Warning: Could not read existing labels from {csv_path}: {e}")
+        return empty
+    label_cols = [col for col in LABEL_COLUMNS if col in previous.columns]
+    if 'pdf_name' not in previous.columns or not label_cols:
+        return empty
+    labeled = previous[(previous[label_cols] != "").any(axis=1)]
+    return labeled.drop_duplicates('pdf_name', keep='first').set_index('pdf_name')
+
+def merge_existing_labels(consolidated: pd.DataFrame, screening_csv: str,
+                          orphans_csv: str = KWIC_ORPHANED_LABELS_CSV) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Add the label columns, carrying over manual decisions by pdf_name.
+
+    Labels come from the previous screening CSV and from orphans_csv, which
+    holds labeled papers that were missing from an earlier run. Returns the
+    labeled consolidated frame and the labeled rows still missing from the
+    corpus, to be kept in orphans_csv so a paper that comes back (or whose
+    text is restored) gets its decision again.
+    """
+    for col in LABEL_COLUMNS:
+        consolidated[col] = ""
+    labeled = read_labeled_rows(screening_csv)
+    parked = read_labeled_rows(orphans_csv)
+    # The screening CSV is the newer record for a paper present in both
+    labeled = pd.concat([labeled, parked[~parked.index.isin(labeled.index)]])
+    for col in LABEL_COLUMNS:
+        if col in labeled.columns:
+            consolidated[col] = consolidated['pdf_name'].map(labeled[col]).fillna("")
+
+    present = labeled.index.isin(consolidated['pdf_name'])
+    carried = int(present.sum())
+    restored = int(parked.index.isin(consolidated['pdf_name']).sum())
+    orphans = labeled[~present].reset_index()
+    orphans = orphans[[col for col in ['Year', 'pdf_name'] + LABEL_COLUMNS if col in orphans.columns]].fillna("")
+    if len(labeled):
+        notes = [f"{restored} restored from {os.path.basename(orphans_csv)}"] if restored else []
+        if len(orphans):
+            notes.append(f"{len(orphans)} labeled papers not in the corpus kept in {os.path.basename(orphans_csv)}")
+        print(f"   Carried over manual labels for {carried} papers" + (f" ({'; '.join(notes)})" if notes else ""))
+    return consolidated, orphans
+
+def write_orphaned_labels(orphans: pd.DataFrame, orphans_csv: str = KWIC_ORPHANED_LABELS_CSV) -> None:
+    """Keep labeled rows of papers missing from this run; remove the file once none are left."""
+    if len(orphans):
+        orphans.to_csv(orphans_csv, index=False, encoding='utf-8-sig')
+    elif os.path.exists(orphans_csv):
+        os.remove(orphans_csv)
+
+def print_idf_weights(idf_weights: Dict[str, float]) -> None:
     print("   IDF Weights calculated:")
     for kw, w in idf_weights.items():
         print(f"   - {kw}: {w:.4f}")
 
-    def aggregate_context(group):
-        snippets = []
-        for _, row in group.iterrows():
-            before = str(row['context_before']) if pd.notnull(row['context_before']) else ""
-            after = str(row['context_after']) if pd.notnull(row['context_after']) else ""
-            word = str(row['matched_word']) if pd.notnull(row['matched_word']) else "KEYWORD"
-            snip = f"...{before[-60:]} [{word.upper()}] {after[:60]}..."
-            snippets.append(snip)
-        unique_snippets = list(dict.fromkeys(snippets))[:8]
-        return " \n\n ".join(unique_snippets)
-
-    # Scoring Logic - Frequency-based Density Scoring (Objective + Contextual)
-    # Applied to the ENTIRE set of snippets for a paper, not just the 8-snippet preview.
-    def calculate_paper_score(group):
-        # Flatten all snippets for this paper into one big text block for scoring
-        full_paper_context = " ".join([
-            f"{row['context_before']} {row['keyword']} {row['context_after']}" 
-            for _, row in group.iterrows()
-        ]).lower()
-        
-        hit_count = len(group)
-        score = 0
-        
-        # 1. Global Hit Reward: The more times keywords appear in the paper, the more relevant.
-        import math
-        score += math.log2(hit_count + 1) * 2
-
-        # 2. IDF-based Instrumental Density
-        for kw, weight in idf_weights.items():
-            # Count occurrences in all snippets
-            count = len(re.findall(r'\b' + re.escape(kw) + r'\b', full_paper_context))
-            if count > 0:
-                # Basic contribution from mathematical rarity (IDF)
-                contribution = (weight * 5) * count
-                
-                # Domain Knowledge Boost:
-                # These terms are treated as "High Reliability Musical Instruments".
-                # They receive a uniform +5.0 boost per occurrence because their presence
-                # is a near-certain indicator of musical relevance, regardless of their frequency.
-                if kw in ['piano', 'harpsichord', 'clavichord', 'accordion', 'organ']:
-                    contribution += 5.0 * count
-                
-                score += contribution
-            
-        # 3. Musical Context Density (+1.5 points per occurrence)
-        musical_terms = ['musical', 'expression', 'haptic', 'force', 'sensor', 'velocity', 'synthesizer', 'midi', 'controller', 'timbre']
-        for w in musical_terms:
-            count = len(re.findall(r'\b' + re.escape(w) + r'\b', full_paper_context))
-            score += count * 1.5
-            
-        # 4. HCI/Typing Penalty (-2 points per occurrence)
-        exclude_kw = ['qwerty', 'typing', 'text entry', 'alphanumeric', 'computer keyboard', 'password', 'office']
-        for w in exclude_kw:
-            count = len(re.findall(r'\b' + re.escape(w) + r'\b', full_paper_context))
-            score -= count * 2.5 # Slightly higher penalty to filter noise
-            
-        return score
-
-    # Group by year and paper
-    consolidated = df.groupby(['Year', 'pdf_name']).apply(lambda x: pd.Series({
-        'Aggregated_Context': aggregate_context(x),
-        'Hit_Count': len(x),
-        'Auto_Priority_Score': calculate_paper_score(x)
-    })).reset_index()
-
-    consolidated = consolidated.sort_values(by='Auto_Priority_Score', ascending=False).reset_index(drop=True)
-
-    # Final Decision Columns
-    consolidated['KEEP(1)_or_EXCLUDE(0)'] = ""
-    consolidated['EXCLUSION_REASON'] = ""
+def collapse_duplicates(txt_files: List[Path], pack: CorpusPack, duplicates_csv: str) -> List[Path]:
+    """Drop texts that near_duplicates.py marked 'collapse', unless they changed since it ran.
+
+    Only the kept copy of each duplicate cluster is scanned, so re-exports
+    no longer add to Hit_Count or to the IDF document counts.
+    """
+    collapsed = load_collapsed(duplicates_csv)
+    if pack is not None:
+        current = {doc['path']: doc['sha256'] for doc in pack.docs if doc['path'] in collapsed}
+    else:
+        current = {}
+        for txt_file in txt_files:
+            rel = txt_file.relative_to(TEXT_DIR).as_posix()
+            if rel in collapsed:
+                with open(txt_file, 'rb') as f:
+                    current[rel] = hashlib.sha256(f.read()).hexdigest()
+    drop = {rel for rel, digest in current.items() if collapsed[rel] == digest}
+    changed = len(current) - len(drop)
+    if changed:
+        print(f"   Warning: {changed} duplicate(s) changed since {os.path.basename(duplicates_csv)} was written; "
+              "keeping them (rerun near_duplicates.py)")
+    if pack is not None:
+        pack.exclude(drop)
+    print(f"   Collapsed {len(drop)} near-duplicate texts")
+    return [t for t in txt_files if t.relative_to(TEXT_DIR).as_posix() not in drop]
+
+def keyword_variants(keywords: Sequence[str]) -> Dict[str, List[str]]:
+    """Surface forms build_keyword_matcher accepts for each keyword (plural, player forms)."""
+    return {kw: [kw + suffix for suffix in (['s', 'ist', 'ists'] if kw in PLAYER_SUFFIX_KEYWORDS else ['s'])]
+            for kw in keywords}
+
+def add_fulltext_scores(consolidated: pd.DataFrame, txt_files: List[Path], pack: CorpusPack,
+                        method: str, query: Dict[str, float]) -> pd.DataFrame:
+    """Rank every paper's full text against query and add the score next to Auto_Priority_Score.
+
+    Term counts come from one pass over the corpus into a sparse paper x term
+    matrix; IDF statistics cover all texts, including those without hits.
+    """
+    docs = (((year, pdf_name), text) for year, pdf_name, text in corpus_texts(txt_files, pack))
+    tf = TermFrequencies(docs, phrases_of(query))
+    scores = pd.Series(tf.scores(query, method, keyword_variants(TARGET_KEYWORDS)),
+                       index=pd.MultiIndex.from_tuples(tf.keys, names=['Year', 'pdf_name']), dtype=np.float64)
+    keys = pd.MultiIndex.from_frame(consolidated[['Year', 'pdf_name']])
+    column = consolidated.columns.get_loc('Auto_Priority_Score') + 1
+    consolidated.insert(column, rank_column(method), scores.reindex(keys).fillna(0.0).to_numpy())
+    print(f"   {rank_column(method)}: {len(tf.keys)} papers, {len(tf.vocab)} terms, {len(tf.data)} nonzero counts")
+    return consolidated
+
+def run_in_memory(txt_files: List[Path], details_fmt: str, metrics: Metrics = NO_METRICS,
+                  pack: CorpusPack = None, normalized: bool = False, jobs: int = 1) -> pd.DataFrame:
+    """Default mode: all hits are held as offsets (KwicHits) and aggregated paper by paper."""
+    with metrics.stage("extract_kwic"):
+        hits = collect_kwic_hits(txt_files, metrics, pack, normalized, jobs)
+    print(f"   {len(hits)} keyword hits in {len(hits.docs)} texts")
+
+    # Step 2: Aggregation for easier screening
+    print("2. Calculating IDF weights for objective scoring...")
+
+    # 2.1 Calculate IDF (Inverse Document Frequency)
+    # This provides a mathematical weights based on keyword exclusivity
+    idf_weights = hits.idf_weights()
+    print_idf_weights(idf_weights)
+
+    # 2.2 Group by year and paper; word-level details (Detailed data for record) only on request
+    details_path = {"csv": KWIC_DETAILS_CSV, "parquet": KWIC_DETAILS_PARQUET}.get(details_fmt)
+    writer = DetailsWriter(details_fmt, details_path) if details_path else None
+    with metrics.stage("aggregate"):
+        consolidated = aggregate_hits(hits, idf_weights, writer)
+    if writer:
+        writer.close()
+        print(f"✓ Detailed instance backup saved: {details_path}")
+    return consolidated
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="KWIC screening: keyword snippets and paper-level auto-scoring.")
+    parser.add_argument(
+        "--details", choices=["none", "csv", "parquet"], default="none",
+        help="Also save word-level details: csv -> kwic_details_all_instances.csv, "
+             "parquet -> kwic_details_all_instances.parquet (requires pyarrow). Default: none"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--stream", action="store_true",
+        help="Bounded-memory mode for very large corpora: read texts lazily and order snippets "
+             "with an external merge of sorted runs instead of an in-memory sort"
+    )
+    mode.add_argument(
+        "--incremental", action="store_true",
+        help=f"Only rescan texts whose content hash changed since the last run (state in {os.path.basename(KWIC_MANIFEST_JSON)})"
+    )
+    parser.add_argument(
+        "--run-rows", type=int, default=200_000,
+        help="Snippets buffered per sorted run in --stream mode (default: 200000)"
+    )
+    parser.add_argument(
+        "--pack", action="store_true",
+        help=f"Read texts from one memory-mapped pack file ({os.path.basename(KWIC_PACK)}) instead of "
+             "thousands of .txt files; the pack is built or refreshed first when the text folder changed"
+    )
+    parser.add_argument(
+        "--normalized", action="store_true",
+        help="Match keywords on normalized text (ligatures expanded, words hyphenated across line "
+             "breaks joined), cached per document in the text cache; snippets are still cut from the "
+             "original text"
+    )
+    parser.add_argument(
+        "--collapse-duplicates", nargs="?", const=DUPLICATES_CSV, default=None, metavar="CSV",
+        help=f"Skip texts marked as near-duplicates by near_duplicates.py (default: {DUPLICATES_CSV}), "
+             "so re-exports do not inflate Hit_Count and IDF"
+    )
+    parser.add_argument(
+        "--rank", choices=["none"] + RANK_METHODS, default="none",
+        help="Also rank papers on their full text (bm25 or tfidf) against a weighted term query and "
+             "write the score next to Auto_Priority_Score (BM25_Score / TFIDF_Score). Default: none"
+    )
+    parser.add_argument(
+        "--rank-query", type=parse_query, default=None, metavar="TERM=WEIGHT,...",
+        help="Query for --rank, e.g. 'piano=2,midi=1,qwerty=-1.5,text entry=-1' "
+             "(default: instruments and musical terms up, HCI/typing terms down)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Worker processes for reading and scanning texts (default: 1, serial; 0 = one per CPU core). "
+             "Results are merged in corpus order, so every output is identical for any value"
+    )
+    add_metrics_args(parser, KWIC_METRICS_JSON)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    metrics = Metrics("kwic_screening", args.metrics, args.metrics_top)
+    if args.details == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow is required for --details parquet.")
+            print("Install with: pip install pyarrow")
+            sys.exit(1)
+
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+    txt_files = collect_text_files(TEXT_DIR)
+    if not txt_files:
+        print(f"No .txt files found in {TEXT_DIR}")
+        return
+    if args.collapse_duplicates and not os.path.exists(args.collapse_duplicates):
+        print(f"Error: Duplicate clusters not found: {args.collapse_duplicates}")
+        print("Please run: python near_duplicates.py")
+        sys.exit(1)
+
+    pack = None
+    if args.pack:
+        with metrics.stage("pack"):
+            pack = ensure_pack(TEXT_DIR, KWIC_PACK)
+    if args.collapse_duplicates:
+        txt_files = collapse_duplicates(txt_files, pack, args.collapse_duplicates)
+    print(f"1. Extracting KWIC from {len(txt_files)} files{' (packed)' if pack else ''}"
+          f"{' on normalized text' if args.normalized else ''}{f' with {jobs} workers' if jobs > 1 else ''}...")
+    if args.incremental:
+        with metrics.stage("incremental"):
+            consolidated = run_incremental(txt_files, args.details, metrics, pack, args.normalized, jobs)
+    elif args.stream:
+        with metrics.stage("stream"):
+            consolidated = run_streaming(txt_files, args.details, args.run_rows, metrics, pack, args.normalized, jobs)
+    else:
+        consolidated = run_in_memory(txt_files, args.details, metrics, pack, args.normalized, jobs)
+    if args.rank != "none":
+        print(f"   Ranking full texts with {args.rank}...")
+        with metrics.stage("fulltext_rank"):
+            consolidated = add_fulltext_scores(consolidated, txt_files, pack, args.rank,
+                                               args.rank_query or FULLTEXT_QUERY)
+    if pack is not None:
+        pack.close()
+
+    # Final Decision Columns (existing manual labels are preserved by pdf_name)
+    with metrics.stage("merge_labels"):
+        consolidated, orphans = merge_existing_labels(consolidated, KWIC_SCREENING_CSV)
 
     # Using the name requested by user for the main screening file
-    consolidated.to_csv(KWIC_SCREENING_CSV, index=False, encoding='utf-8-sig')
+    with metrics.stage("write_screening"):
+        consolidated.to_csv(KWIC_SCREENING_CSV, index=False, encoding='utf-8-sig')
+        write_orphaned_labels(orphans)
     print(f"✓ Main Screening CSV saved: {KWIC_SCREENING_CSV}")
     print(f"Total Papers to screen: {len(consolidated)}")
+    metrics.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,147 @@
+# materialize.py
+"""
+Place classified PDFs into the Renamed_PDFs / Metadata_Filtered_Results trees
+without duplicating the ~17 GB of PDF data.
+
+Link modes (--link-mode):
+    copy      shutil.copy2, the historical behaviour
+    reflink   copy-on-write clone (Btrfs/XFS/APFS), independent file, no extra space
+    hardlink  second directory entry for the same file (same filesystem only)
+    symlink   symbolic link to the original file
+    auto      reflink, then hardlink, then copy
+    manifest  no files or folders at all; only the manifest CSV is written
+Every link mode falls back to copy when the filesystem refuses the link.
+
+Each stage also writes a manifest CSV (path, source, method) that maps every
+logical output path to the physical PDF it stands for. Downstream stages can
+read that manifest (--from-manifest) instead of walking directories, which is
+what makes the manifest-only mode usable end to end.
+"""
+import os
+import csv
+import sys
+import errno
+import shutil
+from typing import Dict, List, Tuple
+
+LINK_MODES = ["copy", "reflink", "hardlink", "symlink", "auto", "manifest"]
+MANIFEST_NAME = "materialize_manifest.csv"
+MANIFEST_FIELDS = ["path", "source", "method"]
+
+def _reflink(src: str, dest: str) -> None:
+    """Copy-on-write clone; raises OSError where unsupported."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+            try:
+                fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdest.close()
+                os.unlink(dest)
+                raise
+        shutil.copystat(src, dest)
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dest), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+    else:
+        raise OSError(errno.ENOTSUP, "reflink not supported on this platform")
+
+def _hardlink(src: str, dest: str) -> None:
+    os.link(src, dest)
+
+def _symlink(src: str, dest: str) -> None:
+    os.symlink(os.path.abspath(src), dest)
+
+def _copy(src: str, dest: str) -> None:
+    shutil.copy2(src, dest)
+
+_LINKERS = {"reflink": _reflink, "hardlink": _hardlink, "symlink": _symlink, "copy": _copy}
+_ATTEMPTS = {
+    "copy": ["copy"],
+    "reflink": ["reflink", "copy"],
+    "hardlink": ["hardlink", "copy"],
+    "symlink": ["symlink", "copy"],
+    "auto": ["reflink", "hardlink", "copy"],
+}
+
+def place_file(src: str, dest: str, mode: str = "copy") -> str:
+    """Materialize src at dest using mode (with fallback). Returns the method that succeeded.
+
+    An existing dest is replaced, matching shutil.copy2's overwrite behaviour.
+    """
+    if os.path.lexists(dest):
+        if os.path.exists(dest) and os.path.samefile(src, dest):
+            return "existing"
+        os.unlink(dest)
+    last_error = None
+    for method in _ATTEMPTS[mode]:
+        try:
+            _LINKERS[method](src, dest)
+            return method
+        except (OSError, NotImplementedError) as e:
+            last_error = e
+    raise last_error
+
+def _rel(path: str) -> str:
+    return os.path.relpath(path, os.getcwd())
+
+def _abs(path: str) -> str:
+    return os.path.normpath(os.path.join(os.getcwd(), path))
+
+class Materializer:
+    """Places files according to a link mode and records every placement in a manifest."""
+
+    def __init__(self, mode: str, manifest_path: str):
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {mode}")
+        self.mode = mode
+        self.manifest_path = manifest_path
+        self.rows: List[Dict[str, str]] = []
+        self.planned = set()
+        self.method_counts: Dict[str, int] = {}
+
+    @property
+    def virtual(self) -> bool:
+        return self.mode == "manifest"
+
+    def makedirs(self, path: str) -> None:
+        if not self.virtual:
+            os.makedirs(path, exist_ok=True)
+
+    def exists(self, path: str) -> bool:
+        """True if path exists on disk or was already placed in this run."""
+        return os.path.normpath(path) in self.planned or (not self.virtual and os.path.exists(path))
+
+    def place(self, src: str, dest: str, source: str = None) -> str:
+        """Materialize src at dest. `source` is the physical file src stands for (defaults to src)."""
+        method = "manifest" if self.virtual else place_file(src, dest, self.mode)
+        self.planned.add(os.path.normpath(dest))
+        self.rows.append({"path": _rel(dest), "source": _rel(source or src), "method": method})
+        self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        return method
+
+    def write_manifest(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def summary(self) -> str:
+        return ", ".join(f"{method}: {count}" for method, count in sorted(self.method_counts.items()))
+
+def read_manifest(manifest_path: str, under: str = None) -> List[Tuple[str, str]]:
+    """Return (logical path, physical source path) pairs, optionally only those below directory `under`."""
+    entries = []
+    prefix = os.path.normpath(under) + os.sep if under else None
+    with open(manifest_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            path = _abs(row["path"])
+            if prefix and not path.startswith(prefix):
+                continue
+            entries.append((path, _abs(row["source"])))
+    return entries
@@ -1,59 +1,183 @@
 # merge_screening_with_metadata.py
 import pandas as pd
 import os
+import sys
+import argparse
+
+from bib_index import BIB_INDEX_DB, BIB_PATH, open_bib_index
+from corpus_pack import collect_text_files
+from metadata_store import METADATA_DB, open_metadata_store
+from pipeline_metrics import Metrics, add_metrics_args
 
 # Paths
 SCREENING_CSV = os.path.join("KWIC_Screening", "kwic_context_screening.csv")
 RENAME_MAP_CSV = os.path.join("Renamed_PDFs", "rename_map.csv")
 METADATA_CSV = "nime_papers.csv"
+TEXT_DIR = "Keyboard_Interface_Texts"
+METADATA_COLUMNS = ['ID', 'title', 'author', 'keywords', 'abstract', 'doi', 'bibtex']
 OUTPUT_CSV = os.path.join("KWIC_Screening", "kwic_screened_metadata.csv")
+METRICS_JSON = os.path.join("KWIC_Screening", "merge_metrics.json")
+DECISION_COLUMN = 'KEEP(1)_or_EXCLUDE(0)'
+SOURCES = ["bib", "csv"]
 
-def main():
-    print("Loading data...")
-    # 1. Load screening results and filter for KEEP=1
-    screening_df = pd.read_csv(SCREENING_CSV)
-    # Ensure column name matches exactly and handle potential type issues (some might be strings/ints)
-    kept_df = screening_df[screening_df['KEEP(1)_or_EXCLUDE(0)'].astype(str) == '1'].copy()
-    
-    if kept_df.empty:
-        print("No papers marked as KEEP(1). Exiting.")
-        return
-    
-    # 2. Load rename map to link pdf_name to metadata ID
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Merge KEEP(1) screening decisions with NIME metadata.")
+    parser.add_argument(
+        "--source", choices=SOURCES, default="csv",
+        help="Metadata source: nime_papers.csv joined through Renamed_PDFs/rename_map.csv (default), or "
+             "the BibTeX index over NIME_2001-2025.bib (authors as 'Last, First' and the .bib's own "
+             "keywords and bibtex keys)"
+    )
+    parser.add_argument("--bib", default=BIB_PATH, help=f"BibTeX file (default: {BIB_PATH})")
+    parser.add_argument("--bib-index", default=BIB_INDEX_DB, help=f"SQLite index of the BibTeX file (default: {BIB_INDEX_DB})")
+    add_metrics_args(parser, METRICS_JSON)
+    return parser.parse_args(argv)
+
+def load_screening(metrics: Metrics) -> pd.DataFrame:
+    """The screening table with every cell as a string (blank labels stay "", not NaN)."""
+    with metrics.stage("load_screening"):
+        return pd.read_csv(SCREENING_CSV, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+
+def screening_decisions(screening_df: pd.DataFrame) -> pd.Series:
+    """KEEP(1)_or_EXCLUDE(0) per row, stripped; '1.0' from a spreadsheet round trip counts as '1'."""
+    return screening_df[DECISION_COLUMN].str.strip().str.replace(r'\.0$', '', regex=True)
+
+def merge_from_csv(kept_df: pd.DataFrame, metrics: Metrics) -> pd.DataFrame:
+    """Join kept papers with nime_papers.csv through the rename map."""
+    # Load rename map to link pdf_name to metadata ID
     rename_map = pd.read_csv(RENAME_MAP_CSV)
     # rename_map has columns: original, new_name, ID, method
     # we need to join on pdf_name (screening) == new_name (rename_map)
-    
-    # 3. Load full metadata
-    metadata_df = pd.read_csv(METADATA_CSV, low_memory=False)
-    
-    # 4. Merge
+
+    # Look up metadata for the kept papers only (indexed SQLite store)
+    with metrics.stage("load_metadata"), open_metadata_store(os.path.abspath(METADATA_CSV)) as store:
+        kept_ids = rename_map.loc[rename_map['new_name'].isin(kept_df['pdf_name']), 'ID']
+        metadata_df = pd.DataFrame(store.rows_for_ids(kept_ids, METADATA_COLUMNS), columns=METADATA_COLUMNS)
+    # Empty fields were NaN when read from the CSV; keep the same output
+    metadata_df = metadata_df.replace('', float('nan'))
+
     print(f"Merging {len(kept_df)} kept papers with metadata...")
-    
+
     # First join screening with map
     merged_step1 = pd.merge(
-        kept_df[['Year', 'pdf_name']], 
-        rename_map[['new_name', 'ID']], 
-        left_on='pdf_name', 
-        right_on='new_name', 
+        kept_df[['Year', 'pdf_name']],
+        rename_map[['new_name', 'ID']],
+        left_on='pdf_name',
+        right_on='new_name',
         how='left'
     )
-    
+
     # Then join with metadata
     final_merged = pd.merge(
         merged_step1,
-        metadata_df[['ID', 'title', 'author', 'keywords', 'abstract', 'doi', 'bibtex']],
+        metadata_df[METADATA_COLUMNS],
         on='ID',
         how='left'
     )
-    
+
     # Drop the redundant 'new_name' column from the join
-    final_merged = final_merged.drop(columns=['new_name'])
-    
-    # 5. Save output
-    final_merged.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
+    return final_merged.drop(columns=['new_name'])
+
+def paper_ids_for(pdf_names) -> dict:
+    """pdf_name -> NIME ID. Renamed PDFs are named <ID>.pdf; the rename map, when present, also covers _1 duplicates."""
+    ids = {name: os.path.splitext(name)[0] for name in pdf_names}
+    if os.path.exists(RENAME_MAP_CSV):
+        rename_map = pd.read_csv(RENAME_MAP_CSV, usecols=['new_name', 'ID'])
+        ids.update(dict(zip(rename_map['new_name'], rename_map['ID'])))
+    return ids
+
+def doi_hints_for(paper_ids) -> dict:
+    """ID -> DOI from the metadata store, if nime_papers.csv or its SQLite copy is around; empty otherwise."""
+    if not (os.path.exists(METADATA_CSV) or os.path.exists(METADATA_DB)):
+        return {}
+    with open_metadata_store(os.path.abspath(METADATA_CSV)) as store:
+        return {r['ID']: r['doi'] for r in store.rows_for_ids(paper_ids, ['ID', 'doi']) if r['doi']}
+
+def text_paths(text_dir: str = TEXT_DIR) -> dict:
+    """File stem -> text path, top-level texts before subfolders (the kwic/pack/index order); first one wins."""
+    paths = {}
+    for path in collect_text_files(text_dir):
+        paths.setdefault(path.stem, path)
+    return paths
+
+def read_paper_text(pdf_name: str, paths: dict) -> str:
+    path = paths.get(os.path.splitext(pdf_name)[0])
+    if path is None:
+        return ""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+def merge_from_bib(kept_df: pd.DataFrame, bib_path: str, index_path: str, metrics: Metrics) -> pd.DataFrame:
+    """Attach BibTeX metadata to kept papers, resolving each paper by cached ID link, DOI, or title."""
+    ids = paper_ids_for(kept_df['pdf_name'])
+    with metrics.stage("load_metadata"):
+        doi_hints = doi_hints_for(ids.values())
+
+    print(f"Merging {len(kept_df)} kept papers with {bib_path}...")
+    rows, methods, unmatched = [], {}, []
+    paths = text_paths()
+    with metrics.stage("resolve_bib"), open_bib_index(bib_path, index_path) as index:
+        for year, pdf_name in zip(kept_df['Year'], kept_df['pdf_name']):
+            paper_id = ids.get(pdf_name)
+            entry, method = index.by_id(paper_id), "cached"
+            if entry is None and doi_hints.get(paper_id):
+                entry, method = index.by_doi(doi_hints[paper_id]), "doi"
+            if entry is None:
+                # Title matching is per publication year; "Unknown" years stay unmatched
+                entry, method = (index.match_title(int(year), read_paper_text(pdf_name, paths))
+                                 if str(year).isdigit() else None), "title"
+                if entry is not None:
+                    index.link_id(paper_id, entry['key'], method)
+            elif method == "doi":
+                index.link_id(paper_id, entry['key'], method)
+            row = {'Year': year, 'pdf_name': pdf_name, 'ID': paper_id}
+            if entry is None:
+                unmatched.append(pdf_name)
+            else:
+                methods[method] = methods.get(method, 0) + 1
+                row.update({c: entry[c] for c in METADATA_COLUMNS if c not in ('ID', 'bibtex')})
+                row['bibtex'] = entry['raw']
+            rows.append(row)
+
+    print("Resolved: " + ", ".join(f"{n} by {m}" for m, n in sorted(methods.items())) if methods else "Resolved: none")
+    if unmatched:
+        print(f"⚠ No BibTeX entry found for {len(unmatched)} papers: {', '.join(unmatched)}")
+    # Missing fields stay NaN, as with the CSV source
+    return pd.DataFrame(rows, columns=['Year', 'pdf_name'] + METADATA_COLUMNS).replace('', float('nan'))
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics("merge_screening_with_metadata", args.metrics, args.metrics_top)
+    print("Loading data...")
+    screening_df = load_screening(metrics)
+    decisions = screening_decisions(screening_df)
+    kept_df = screening_df[decisions == '1'].copy()
+
+    if kept_df.empty:
+        invalid = decisions[(decisions != '') & (decisions != '0')]
+        if len(invalid):
+            # Labels are there but none reads as KEEP(1): fail rather than leave a stale output behind
+            examples = ", ".join(repr(v) for v in invalid.unique()[:5])
+            print(f"Error: {len(invalid)} {DECISION_COLUMN} values are neither 1 nor 0 (e.g. {examples}).")
+            sys.exit(1)
+        print("No papers marked as KEEP(1). Exiting.")
+        return
+
+    if args.source == "csv":
+        if not os.path.exists(RENAME_MAP_CSV):
+            print(f"Error: Rename map not found: {RENAME_MAP_CSV}")
+            print("Please run: python rename_pdfs_by_nime_id.py (or merge with --source bib)")
+            sys.exit(1)
+        final_merged = merge_from_csv(kept_df, metrics)
+    else:
+        final_merged = merge_from_bib(kept_df, args.bib, args.bib_index, metrics)
+
+    # Save output
+    with metrics.stage("write_output"):
+        final_merged.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
     print(f"✓ Final metadata for kept papers saved to: {OUTPUT_CSV}")
     print(f"Total papers exported: {len(final_merged)}")
+    metrics.finish()
 
 if __name__ == "__main__":
     main()
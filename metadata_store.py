@@ -0,0 +1,198 @@
+# metadata_store.py
+"""
+Indexed SQLite copy of nime_papers.csv shared by rename, filter and merge.
+
+The CSV is imported once into nime_papers.sqlite (one row per CSV row, with
+indexes on ID and on the PDF basename of the url column). Every later open
+only stats the CSV: the database is rebuilt automatically when the CSV's
+size/mtime change and its SHA-256 differs from the imported one, so the
+stages never parse the full CSV or loop over it row by row at startup.
+
+Duplicate IDs are kept in CSV order. Single-row lookups return the last
+matching row, which is what the old dict-building loops ended up with.
+
+Usage:
+    python metadata_store.py import [--csv nime_papers.csv] [--db nime_papers.sqlite]
+"""
+import os
+import sys
+import csv
+import sqlite3
+import argparse
+from typing import Dict, Iterable, List, Optional
+
+from text_cache import file_sha256
+
+CSV_NIME = os.path.join(os.getcwd(), "nime_papers.csv")
+METADATA_DB = os.path.join(os.getcwd(), "nime_papers.sqlite")
+
+# CSV columns copied into the store; pdf_name is derived from url
+STORE_COLUMNS = ["ID", "url", "pdf_name", "title", "author", "abstract", "keywords", "doi", "bibtex"]
+SCHEMA_VERSION = "1"
+
+def _pdf_name_from_url(url: str) -> str:
+    return os.path.basename((url or "").strip())
+
+def import_csv(csv_path: str = CSV_NIME, db_path: str = METADATA_DB) -> int:
+    """(Re)build db_path from csv_path. Returns the number of imported rows."""
+    stat = os.stat(csv_path)
+    digest = file_sha256(csv_path)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # bibtex/abstract fields can exceed the csv module's default field limit
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    conn = sqlite3.connect(tmp_path)
+    try:
+        columns = ", ".join(f'"{c}" TEXT' for c in STORE_COLUMNS)
+        conn.execute(f"CREATE TABLE papers (row INTEGER PRIMARY KEY, {columns})")
+        conn.execute("CREATE TABLE store_info (key TEXT PRIMARY KEY, value TEXT)")
+        placeholders = ", ".join("?" for _ in STORE_COLUMNS)
+        count = 0
+        with open(csv_path, "r", newline="", encoding="utf-8-sig") as f:
+            def rows():
+                nonlocal count
+                for row in csv.DictReader(f):
+                    count += 1
+                    record = {k: (row.get(k) or "") for k in STORE_COLUMNS}
+                    record["ID"] = record["ID"].strip()
+                    record["pdf_name"] = _pdf_name_from_url(record["url"])
+                    yield tuple(record[c] for c in STORE_COLUMNS)
+            conn.executemany(
+                f"INSERT INTO papers ({', '.join(STORE_COLUMNS)}) VALUES ({placeholders})", rows()
+            )
+        conn.execute("CREATE INDEX idx_papers_id ON papers (ID)")
+        conn.execute("CREATE INDEX idx_papers_pdf_name ON papers (pdf_name)")
+        conn.executemany("INSERT INTO store_info VALUES (?, ?)", [
+            ("schema", SCHEMA_VERSION),
+            ("csv_size", str(stat.st_size)),
+            ("csv_mtime_ns", str(stat.st_mtime_ns)),
+            ("csv_sha256", digest),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+def _store_info(db_path: str) -> Dict[str, str]:
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM store_info"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+
+def ensure_store(csv_path: str = CSV_NIME, db_path: str = METADATA_DB) -> None:
+    """Import csv_path unless db_path already holds the same CSV content."""
+    info = _store_info(db_path) if os.path.exists(db_path) else {}
+    if info.get("schema") == SCHEMA_VERSION:
+        stat = os.stat(csv_path)
+        if info.get("csv_size") == str(stat.st_size) and info.get("csv_mtime_ns") == str(stat.st_mtime_ns):
+            return
+        if info.get("csv_sha256") == file_sha256(csv_path):
+            # Touched but unchanged: remember the new mtime and keep the data
+            conn = sqlite3.connect(db_path)
+            try:
+                with conn:
+                    conn.execute("UPDATE store_info SET value = ? WHERE key = 'csv_mtime_ns'", (str(stat.st_mtime_ns),))
+                    conn.execute("UPDATE store_info SET value = ? WHERE key = 'csv_size'", (str(stat.st_size),))
+            finally:
+                conn.close()
+            return
+    print(f"Importing {csv_path} into {db_path}...")
+    count = import_csv(csv_path, db_path)
+    print(f"Imported {count} metadata rows")
+
+class MetadataStore:
+    """Read-only lookups into the SQLite metadata store."""
+
+    def __init__(self, db_path: str = METADATA_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count_ids(self) -> int:
+        """Number of distinct non-empty IDs."""
+        return self.conn.execute("SELECT COUNT(DISTINCT ID) FROM papers WHERE ID != ''").fetchone()[0]
+
+    def count_pdf_names(self) -> int:
+        """Number of distinct url basenames ending in .pdf that map to an ID."""
+        return self.conn.execute(
+            "SELECT COUNT(DISTINCT pdf_name) FROM papers WHERE ID != '' AND pdf_name GLOB '*.pdf'"
+        ).fetchone()[0]
+
+    def has_id(self, paper_id: str) -> bool:
+        return bool(paper_id) and self.conn.execute(
+            "SELECT 1 FROM papers WHERE ID = ? LIMIT 1", (paper_id,)
+        ).fetchone() is not None
+
+    def id_for_pdf_name(self, pdf_name: str) -> Optional[str]:
+        """ID of the last row whose url ends in pdf_name, or None."""
+        if not pdf_name.endswith(".pdf"):
+            return None
+        row = self.conn.execute(
+            "SELECT ID FROM papers WHERE pdf_name = ? AND ID != '' ORDER BY row DESC LIMIT 1", (pdf_name,)
+        ).fetchone()
+        return row["ID"] if row else None
+
+    def get(self, paper_id: str) -> Optional[Dict[str, str]]:
+        """Metadata of the last row with this ID, or None."""
+        if not paper_id:
+            return None
+        row = self.conn.execute(
+            "SELECT * FROM papers WHERE ID = ? ORDER BY row DESC LIMIT 1", (paper_id,)
+        ).fetchone()
+        return {c: row[c] for c in STORE_COLUMNS} if row else None
+
+    def rows_for_ids(self, paper_ids: Iterable[str], columns: List[str] = STORE_COLUMNS) -> List[Dict[str, str]]:
+        """All rows (duplicates included, in CSV order) whose ID is in paper_ids."""
+        wanted = sorted({i for i in paper_ids if isinstance(i, str) and i})
+        rows = []
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            placeholders = ", ".join("?" for _ in batch)
+            rows.extend(self.conn.execute(
+                f"SELECT row, {', '.join(columns)} FROM papers WHERE ID IN ({placeholders})", batch
+            ))
+        rows.sort(key=lambda r: r["row"])
+        return [{c: r[c] for c in columns} for r in rows]
+
+def open_metadata_store(csv_path: str = CSV_NIME, db_path: str = METADATA_DB) -> MetadataStore:
+    """Open the store, importing or refreshing it from csv_path first if needed."""
+    if not os.path.exists(csv_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Neither {csv_path} nor {db_path} exists")
+    else:
+        ensure_store(csv_path, db_path)
+    return MetadataStore(db_path)
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import nime_papers.csv into an indexed SQLite store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="(Re)build the SQLite store from the CSV")
+    imp.add_argument("--csv", default=CSV_NIME, help=f"Source CSV (default: {CSV_NIME})")
+    imp.add_argument("--db", default=METADATA_DB, help=f"SQLite file (default: {METADATA_DB})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "import":
+        count = import_csv(args.csv, args.db)
+        print(f"Imported {count} rows from {args.csv} into {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# near_duplicates.py
+"""
+Near-duplicate detection over Keyboard_Interface_Texts with MinHash and LSH.
+
+The corpus holds re-exports of the same paper: the _1, _2 copies that
+rename_pdfs_by_nime_id.py's counter loop creates for repeated IDs,
+failed_export_fixed/ versions next to their originals, and similar. They
+inflate Hit_Count and the IDF document counts in kwic_screening.py.
+
+Each text is folded (lowercase, ligatures expanded), split into words and
+shingled into overlapping SHINGLE_WORDS-word sequences. A MinHash
+signature of NUM_PERM values estimates the Jaccard similarity of two
+shingle sets. Instead of comparing all pairs, signatures are cut into
+LSH_BANDS bands of LSH_ROWS values, and only texts that share a whole band
+become candidates (a pair with 0.6 similarity does so with 99% probability,
+one with 0.2 with 5%). A candidate
+pair counts as a duplicate when its estimated similarity is at least
+MIN_SIMILARITY, and duplicate pairs are joined into clusters.
+
+The first member of a cluster in corpus order is kept (nime2003_Young.txt
+before nime2003_Young_1.txt, top-level texts before subfolders). The others
+are marked "collapse" in DUPLICATES_CSV, which kwic_screening.py
+--collapse-duplicates reads to drop them before counting hits and IDF.
+Rows carry each text's SHA-256, so edited texts are never dropped on a
+stale decision.
+
+Usage:
+    python near_duplicates.py [--threshold 0.8]
+"""
+import os
+import csv
+import zlib
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from corpus_pack import collect_text_files, decode_text
+from normalized_text import WORD_PATTERN, fold
+from pipeline_metrics import NO_METRICS, Metrics, add_metrics_args
+
+TEXT_DIR = os.path.join(os.getcwd(), "Keyboard_Interface_Texts")
+DUPLICATES_CSV = os.path.join(os.getcwd(), "KWIC_Screening", "near_duplicates.csv")
+METRICS_JSON = os.path.join(os.getcwd(), "KWIC_Screening", "near_duplicates_metrics.json")
+DUPLICATE_FIELDS = ["cluster", "path", "pdf_name", "sha256", "action", "kept_path", "similarity", "shingles"]
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+MIN_SIMILARITY = 0.8
+# Permutations are multiply-shift hashes h(x) = ((a * x + b) mod 2**64) >> 32 of 32-bit shingle
+# hashes (a odd); uint64 arithmetic wraps, so no modulo is needed
+MAX_HASH = np.uint64((1 << 32) - 1)
+SEED = 1
+
+class MinHasher:
+    """MinHash signatures of word shingles, with a stable token hash shared across texts."""
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_words: int = SHINGLE_WORDS, seed: int = SEED):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        self.shingle_words = shingle_words
+        self._token_hashes: Dict[str, int] = {}
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Distinct 32-bit hashes of the text's word shingles."""
+        hashes = self._token_hashes
+        tokens = []
+        for word in WORD_PATTERN.findall(fold(text)):
+            h = hashes.get(word)
+            if h is None:
+                # crc32 is stable across processes, unlike hash()
+                h = hashes[word] = zlib.crc32(word.encode('utf-8'))
+            tokens.append(h)
+        n = len(tokens) - self.shingle_words + 1
+        if n <= 0:
+            return np.empty(0, dtype=np.uint64)
+        tokens = np.array(tokens, dtype=np.uint64)
+        # Polynomial combination of the window's token hashes; uint64 arithmetic wraps around
+        combined = np.zeros(n, dtype=np.uint64)
+        for offset in range(self.shingle_words):
+            combined = combined * np.uint64(1000003) + tokens[offset:offset + n]
+        return np.unique((combined ^ (combined >> np.uint64(32))) & MAX_HASH)
+
+    def signature(self, shingles: np.ndarray) -> Optional[np.ndarray]:
+        """NUM_PERM minimum permuted hashes, or None for texts too short to shingle."""
+        if not len(shingles):
+            return None
+        permuted = (self.a * shingles[np.newaxis, :] + self.b) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+def lsh_candidates(signatures: List[Optional[np.ndarray]], bands: int = LSH_BANDS) -> set:
+    """Index pairs that share at least one whole band of their signatures."""
+    rows = NUM_PERM // bands
+    pairs = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, sig in enumerate(signatures):
+            if sig is not None:
+                buckets.setdefault(sig[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            for x, i in enumerate(members):
+                for j in members[x + 1:]:
+                    pairs.add((i, j))
+    return pairs
+
+def estimated_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+def cluster_pairs(n: int, pairs: List[Tuple[int, int]]) -> List[List[int]]:
+    """Connected components (union-find) with at least two members, members in index order."""
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+def find_near_duplicates(text_dir: str = TEXT_DIR, threshold: float = MIN_SIMILARITY,
+                         metrics: Metrics = NO_METRICS) -> List[Dict[str, str]]:
+    """Duplicate clusters of the corpus as DUPLICATE_FIELDS rows (empty when there are none)."""
+    files = collect_text_files(text_dir)
+    hasher = MinHasher()
+    signatures, digests, shingle_counts = [], [], []
+    for path in files:
+        try:
+            data = path.read_bytes()
+            text, digest = decode_text(data), hashlib.sha256(data).hexdigest()
+        except OSError as e:
+            print(f"Error processing {path.name}: {e}")
+            text, digest = "", ""
+        with metrics.file(path.name, "minhash", size_bytes=len(text)):
+            shingles = hasher.shingles(text)
+        signatures.append(hasher.signature(shingles))
+        digests.append(digest)
+        shingle_counts.append(len(shingles))
+
+    candidates = lsh_candidates(signatures)
+    similarity = {}
+    for i, j in candidates:
+        score = estimated_similarity(signatures[i], signatures[j])
+        if score >= threshold:
+            similarity[(i, j)] = score
+    print(f"   {len(candidates)} LSH candidate pairs, {len(similarity)} above {threshold:.2f} similarity")
+
+    rows = []
+    for cluster_id, members in enumerate(cluster_pairs(len(files), list(similarity)), start=1):
+        kept = members[0]
+        for i in members:
+            rel = files[i].relative_to(text_dir).as_posix()
+            score = 1.0 if i == kept else estimated_similarity(signatures[kept], signatures[i])
+            rows.append({
+                "cluster": cluster_id, "path": rel, "pdf_name": files[i].stem + ".pdf", "sha256": digests[i],
+                "action": "keep" if i == kept else "collapse",
+                "kept_path": files[kept].relative_to(text_dir).as_posix(),
+                "similarity": f"{score:.3f}", "shingles": shingle_counts[i],
+            })
+    return rows
+
+def write_duplicates(rows: List[Dict[str, str]], path: str = DUPLICATES_CSV) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=DUPLICATE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def load_collapsed(path: str = DUPLICATES_CSV) -> Dict[str, str]:
+    """Relative text path -> SHA-256 for every text marked 'collapse' in the duplicates CSV."""
+    collapsed = {}
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["action"] == "collapse":
+                collapsed[row["path"]] = row["sha256"]
+    return collapsed
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Find near-duplicate texts with MinHash/LSH.")
+    parser.add_argument("--text-dir", default=TEXT_DIR, help=f"Text corpus (default: {TEXT_DIR})")
+    parser.add_argument("--output", default=DUPLICATES_CSV, help=f"Cluster CSV (default: {DUPLICATES_CSV})")
+    parser.add_argument(
+        "--threshold", type=float, default=MIN_SIMILARITY,
+        help=f"Minimum estimated Jaccard similarity of word {SHINGLE_WORDS}-gram shingles (default: {MIN_SIMILARITY})"
+    )
+    add_metrics_args(parser, METRICS_JSON)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics("near_duplicates", args.metrics, args.metrics_top)
+    print(f"Signing texts in {args.text_dir} ({NUM_PERM} permutations, {LSH_BANDS} bands)...")
+    with metrics.stage("minhash"):
+        rows = find_near_duplicates(args.text_dir, args.threshold, metrics)
+    write_duplicates(rows, args.output)
+    clusters = len({row["cluster"] for row in rows})
+    collapsed = sum(1 for row in rows if row["action"] == "collapse")
+    print(f"✓ {clusters} duplicate clusters, {collapsed} texts to collapse -> {args.output}")
+    metrics.finish()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# normalized_text.py
+"""
+Normalized matching text with an offset map back to the raw extraction.
+
+PDF text extraction leaves artefacts that hide keywords from plain
+lowercase matching: typographic ligatures (ﬁ, ﬀ, ﬂ, ﬃ, ...), non-breaking
+and soft hyphens, and words hyphenated across a line break ("key-\\nboard",
+"inter-\\nface"). normalize_text() removes them once per document and
+lowercases the result:
+
+    ligatures        expanded to their letters (ﬁ -> fi)
+    U+00A0           becomes a space
+    U+00AD           (soft hyphen) is dropped
+    U+2010, U+2011   become '-'
+    word-\\nword      joined into one word when the joined form also occurs
+                     unhyphenated in the same document, otherwise the line
+                     break is dropped and the hyphen kept ("real-time")
+
+Matching runs on the normalized text. Snippets are still cut from the
+original: NormalizedText.raw_span() maps a normalized [start, end) span
+to raw offsets through a compact breakpoint table (normalized position,
+raw position), one entry wherever the distance between the two changes.
+
+load_normalized() caches the normalized text and its table in the shared
+text cache, keyed by the SHA-256 of the raw text and NORMALIZER_ID, so
+each document is normalized once for KWIC screening, filtering and index
+builds alike.
+
+Cache entry: <CACHE_DIR>/<NORMALIZER_ID>/<sha[:2]>/<sha>.norm
+    uint32 breakpoint count n, n int32 normalized positions,
+    n int32 raw positions, then the normalized text as UTF-8
+"""
+import re
+import sys
+import struct
+import hashlib
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+
+from text_cache import CACHE_DIR, read_cached_bytes, write_cached_bytes
+
+# Cache key component; bump when the rules below change
+NORMALIZER_ID = "normalized-v1"
+CACHE_SUFFIX = ".norm"
+
+CHAR_MAP = {
+    '\ufb00': 'ff', '\ufb01': 'fi', '\ufb02': 'fl', '\ufb03': 'ffi', '\ufb04': 'ffl',
+    '\ufb05': 'st', '\ufb06': 'st',
+    '\u00a0': ' ', '\u00ad': '', '\u2010': '-', '\u2011': '-',
+}
+SPECIAL_CHARS = re.compile('[' + ''.join(CHAR_MAP) + ']')
+# Hyphen at the end of a line between two word characters; the groups are the word halves
+HYPHEN_BREAK = re.compile(r'(\w+)-[ \t]*\n[ \t]*(\w+)')
+# The gap HYPHEN_BREAK removes, for cleaning raw matched words
+HYPHEN_GAP = re.compile(r'-[ \t]*\n[ \t]*')
+WORD_PATTERN = re.compile(r'\w+')
+COUNT = struct.Struct("<I")
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+def fold(text: str) -> str:
+    """Ligature expansion and lowercasing without any offset bookkeeping."""
+    return SPECIAL_CHARS.sub(lambda m: CHAR_MAP[m.group()], text).lower()
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class NormalizedText:
+    """Normalized text plus the breakpoint table that maps its offsets to the raw text."""
+
+    def __init__(self, text: str, norm_starts: array, raw_starts: array):
+        self.text = text
+        self.norm_starts = norm_starts
+        self.raw_starts = raw_starts
+
+    def to_raw(self, pos: int) -> int:
+        """Raw offset of the character at normalized position pos."""
+        i = bisect_right(self.norm_starts, pos) - 1
+        if i < 0:
+            return pos
+        return self.raw_starts[i] + pos - self.norm_starts[i]
+
+    def raw_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Raw [start, end) covering the normalized [start, end)."""
+        raw_start = self.to_raw(start)
+        if end <= start:
+            return raw_start, raw_start
+        return raw_start, self.to_raw(end - 1) + 1
+
+def _edits(raw: str) -> List[Tuple[int, int, str]]:
+    """Sorted, non-overlapping (raw start, raw end, replacement) edits."""
+    vocabulary = None
+    edits = []
+    for match in HYPHEN_BREAK.finditer(raw):
+        if vocabulary is None:
+            vocabulary = set(WORD_PATTERN.findall(fold(raw)))
+        joined = fold(match.group(1) + match.group(2)) in vocabulary
+        edits.append((match.end(1), match.start(2), '' if joined else '-'))
+    # Special characters never fall inside a hyphen gap (it holds only '-', spaces and tabs)
+    edits.extend((m.start(), m.end(), CHAR_MAP[m.group()]) for m in SPECIAL_CHARS.finditer(raw))
+    edits.sort()
+    return edits
+
+def normalize_text(raw: str) -> NormalizedText:
+    """Apply the normalization rules to raw and record the offset map."""
+    pieces = []
+    norm_starts, raw_starts = array('i'), array('i')
+    norm_pos = 0
+
+    def mark(raw_pos: int) -> None:
+        # Only record positions where the raw - normalized distance changes
+        if raw_starts and raw_starts[-1] - norm_starts[-1] == raw_pos - norm_pos:
+            return
+        norm_starts.append(norm_pos)
+        raw_starts.append(raw_pos)
+
+    def copy(start: int, end: int) -> None:
+        nonlocal norm_pos
+        segment = raw[start:end]
+        lowered = segment.lower()
+        if len(lowered) == len(segment):
+            mark(start)
+            pieces.append(lowered)
+            norm_pos += len(lowered)
+            return
+        # Rare characters whose lowercase form is longer (e.g. U+0130)
+        for offset, char in enumerate(segment):
+            insert(start + offset, char.lower())
+
+    def insert(raw_pos: int, replacement: str) -> None:
+        nonlocal norm_pos
+        for char in replacement:
+            # Every character of an expansion points at the character it came from
+            mark(raw_pos)
+            pieces.append(char)
+            norm_pos += 1
+
+    cursor = 0
+    for start, end, replacement in _edits(raw):
+        copy(cursor, start)
+        insert(start, replacement)
+        cursor = end
+    copy(cursor, len(raw))
+    if not norm_starts:
+        mark(0)
+    return NormalizedText(''.join(pieces), norm_starts, raw_starts)
+
+def _encode(normalized: NormalizedText) -> bytes:
+    starts, raws = array('i', normalized.norm_starts), array('i', normalized.raw_starts)
+    if not LITTLE_ENDIAN:
+        starts.byteswap()
+        raws.byteswap()
+    return (COUNT.pack(len(starts)) + starts.tobytes() + raws.tobytes()
+            + normalized.text.encode('utf-8'))
+
+def _decode(data: bytes) -> NormalizedText:
+    (count,) = COUNT.unpack_from(data)
+    width = count * 4
+    starts, raws = array('i'), array('i')
+    starts.frombytes(data[COUNT.size:COUNT.size + width])
+    raws.frombytes(data[COUNT.size + width:COUNT.size + 2 * width])
+    if not LITTLE_ENDIAN:
+        starts.byteswap()
+        raws.byteswap()
+    text = data[COUNT.size + 2 * width:].decode('utf-8')
+    return NormalizedText(text, starts, raws)
+
+def load_normalized(raw: str, use_cache: bool = True, cache_dir: str = CACHE_DIR) -> NormalizedText:
+    """normalize_text(raw), read from or written to the text cache when enabled."""
+    if not use_cache:
+        return normalize_text(raw)
+    digest = text_sha256(raw)
+    data = read_cached_bytes(digest, NORMALIZER_ID, cache_dir, CACHE_SUFFIX)
+    if data is not None:
+        try:
+            return _decode(data)
+        except Exception as e:
+            print(f"  Warning: Ignoring unreadable normalized-text entry {digest}: {e}")
+    normalized = normalize_text(raw)
+    write_cached_bytes(digest, NORMALIZER_ID, _encode(normalized), cache_dir, CACHE_SUFFIX)
+    return normalized
@@ -0,0 +1,169 @@
+# pdf_sandbox.py
+"""
+Supervised worker process for PDF text extraction, plus a persistent quarantine list.
+
+SandboxedWorker runs one call at a time in a long-lived child process
+whose address space is capped with RLIMIT_AS. If a call exceeds the
+timeout, the child is killed. If it runs out of memory or dies, the
+child is restarted before the next call. A pathological PDF can
+therefore cost at most `timeout` seconds and `max_memory_mb` of RAM,
+instead of stalling or swapping the whole run.
+
+Quarantine records offending PDFs by content hash (the same SHA-256 the
+text cache uses) and extractor in a CSV file. Later runs can skip them,
+route them to a fallback extractor, or retry them.
+"""
+import os
+import csv
+import time
+import multiprocessing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: timeouts still work, memory is not capped
+    resource = None
+
+QUARANTINE_CSV = os.path.join(os.getcwd(), "pdf_quarantine.csv")
+QUARANTINE_FIELDS = ["sha256", "pdf_name", "extractor", "reason", "seconds", "date"]
+QUARANTINE_POLICIES = ["fallback", "skip", "retry"]
+
+def _limit_memory(max_memory_mb: int) -> None:
+    if resource is None or not max_memory_mb:
+        return
+    limit = max_memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        # Not supported on this platform (e.g. macOS); the timeout still applies
+        pass
+
+def _worker_main(conn, max_memory_mb: int) -> None:
+    """Child loop: receive (fn, args), reply (status, result)."""
+    _limit_memory(max_memory_mb)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        fn, args = message
+        try:
+            conn.send(("ok", fn(*args)))
+        except MemoryError:
+            conn.send(("memory", None))
+            # The heap may be fragmented beyond use; let the parent start a fresh worker
+            break
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+class SandboxedWorker:
+    """One supervised child process that runs picklable calls with a timeout and memory cap."""
+
+    def __init__(self, timeout: float, max_memory_mb: int):
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self._proc = None
+        self._conn = None
+        self.restarts = 0
+
+    def _start(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._proc = self._ctx.Process(target=_worker_main, args=(child_conn, self.max_memory_mb), daemon=True)
+        self._proc.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def _stop(self, kill: bool = False) -> None:
+        if self._proc is None:
+            return
+        if kill:
+            self._proc.kill()
+        else:
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self._proc.join(timeout=5)
+        if self._proc.is_alive():
+            self._proc.kill()
+            self._proc.join()
+        self._conn.close()
+        self._proc = None
+        self._conn = None
+
+    def call(self, fn: Callable, *args) -> Tuple[str, Any, float]:
+        """Run fn(*args) in the worker. Returns (status, result, seconds).
+
+        status is "ok", "error" (fn raised; result is the message), "timeout",
+        "memory" (MemoryError under the address-space cap) or "crash" (the
+        worker died, e.g. from a segfault or the kernel OOM killer).
+        """
+        if self._proc is None or not self._proc.is_alive():
+            if self._proc is not None:
+                self._stop(kill=True)
+                self.restarts += 1
+            self._start()
+        start = time.perf_counter()
+        try:
+            self._conn.send((fn, args))
+            if self.timeout and not self._conn.poll(self.timeout):
+                self._stop(kill=True)
+                self.restarts += 1
+                return "timeout", None, time.perf_counter() - start
+            status, result = self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            self._stop(kill=True)
+            self.restarts += 1
+            return "crash", None, time.perf_counter() - start
+        if status == "memory":
+            self._stop(kill=True)
+            self.restarts += 1
+        return status, result, time.perf_counter() - start
+
+    def close(self) -> None:
+        self._stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Quarantine:
+    """Persistent list of PDFs an extractor could not handle within its limits."""
+
+    def __init__(self, path: str = QUARANTINE_CSV):
+        self.path = path
+        self.entries: Dict[Tuple[str, str], Dict[str, str]] = {}
+        if os.path.exists(path):
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self.entries[(row["sha256"], row["extractor"])] = row
+
+    def get(self, digest: Optional[str], extractor_id: str) -> Optional[Dict[str, str]]:
+        if not digest:
+            return None
+        return self.entries.get((digest, extractor_id))
+
+    def add(self, digest: Optional[str], pdf_name: str, extractor_id: str, reason: str, seconds: float) -> None:
+        """Record an offender; the file is appended to immediately so a later crash keeps it."""
+        if not digest or (digest, extractor_id) in self.entries:
+            return
+        row = {
+            "sha256": digest, "pdf_name": pdf_name, "extractor": extractor_id, "reason": reason,
+            "seconds": f"{seconds:.1f}", "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.entries[(digest, extractor_id)] = row
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=QUARANTINE_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def __len__(self) -> int:
+        return len(self.entries)
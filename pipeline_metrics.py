@@ -0,0 +1,209 @@
+# pipeline_metrics.py
+"""
+Opt-in timing instrumentation shared by the pipeline scripts (--metrics).
+
+Records wall time, CPU time and peak memory per stage and per file, writes
+them to a JSON file and prints the top-N slowest / largest files at the end.
+Per-file records can be split into steps (e.g. extract / classify / place),
+and the report sums every step over all files, so it shows at a glance
+whether the time goes into PDF parsing, copying, or a few pathological PDFs.
+
+Memory is the process's peak resident set size (getrusage high-water mark).
+Per file we report the peak after the file and how much the file raised it.
+When instrumentation is off, every hook is a no-op.
+"""
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TOP_N = 10
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+class _Timer:
+    """Wall/CPU/peak-memory measurement of one block."""
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.rss = peak_rss_mb()
+
+    def stop(self) -> Dict[str, Any]:
+        rss = peak_rss_mb()
+        return {
+            "wall_s": round(time.perf_counter() - self.wall, 6),
+            "cpu_s": round(time.process_time() - self.cpu, 6),
+            "peak_rss_mb": round(rss, 1) if rss is not None else None,
+            "rss_growth_mb": round(rss - self.rss, 1) if rss is not None and self.rss is not None else None,
+        }
+
+def measure(fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """Call fn and return (result, timing record). Usable inside worker processes."""
+    timer = _Timer()
+    result = fn(*args, **kwargs)
+    return result, timer.stop()
+
+class FileRecord:
+    """Timing of one file, optionally split into named steps."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.steps: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round(self.steps.get(name, 0.0) + time.perf_counter() - start, 6)
+
+class Metrics:
+    """Collects stage and file timings for one script run."""
+
+    def __init__(self, script: str, output_path: Optional[str] = None, top_n: int = DEFAULT_TOP_N):
+        self.script = script
+        self.output_path = output_path
+        self.enabled = output_path is not None
+        self.top_n = top_n
+        self.stages: List[Dict[str, Any]] = []
+        self.files: List[Dict[str, Any]] = []
+        self._run = _Timer() if self.enabled else None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage."""
+        if not self.enabled:
+            yield
+            return
+        timer = _Timer()
+        try:
+            yield
+        finally:
+            self.stages.append({"stage": name, **timer.stop()})
+
+    @contextmanager
+    def file(self, path: str, stage: str = "", size_bytes: Optional[int] = None):
+        """Time the processing of one file; yields a FileRecord for optional steps."""
+        record = FileRecord(self.enabled)
+        if not self.enabled:
+            yield record
+            return
+        timer = _Timer()
+        try:
+            yield record
+        finally:
+            self.add_file(path, timer.stop(), stage, record.steps, size_bytes)
+
+    def add_file(self, path: str, timing: Dict[str, Any], stage: str = "",
+                 steps: Optional[Dict[str, float]] = None, size_bytes: Optional[int] = None) -> None:
+        """Add a per-file record measured elsewhere (e.g. with measure() in a worker process).
+
+        size_bytes defaults to the file's size on disk.
+        """
+        if not self.enabled:
+            return
+        entry = {"file": os.path.basename(path), "path": path, "stage": stage,
+                 "size_bytes": size_bytes if size_bytes is not None else _file_size(path), **timing}
+        if steps:
+            entry["steps"] = steps
+        self.files.append(entry)
+
+    def step_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for entry in self.files:
+            for name, seconds in entry.get("steps", {}).items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return {name: round(seconds, 3) for name, seconds in totals.items()}
+
+    def finish(self) -> None:
+        """Write the JSON metrics file and print the report."""
+        if not self.enabled:
+            return
+        run = self._run.stop()
+        data = {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "run": run,
+            "stages": self.stages,
+            "step_totals_s": self.step_totals(),
+            "files": self.files,
+        }
+        out_dir = os.path.dirname(self.output_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        self.print_report(run)
+        print(f"Metrics saved to: {self.output_path}")
+
+    def print_report(self, run: Dict[str, Any]) -> None:
+        print("\n" + "=" * 70)
+        print(f"TIMING REPORT ({self.script})")
+        print("=" * 70)
+        print(f"Total: wall {run['wall_s']:.2f} s, CPU {run['cpu_s']:.2f} s, peak RSS {run['peak_rss_mb']} MB")
+        for s in self.stages:
+            print(f"  {s['stage']:<28} wall {s['wall_s']:9.2f} s   CPU {s['cpu_s']:9.2f} s   peak {s['peak_rss_mb']} MB")
+        totals = self.step_totals()
+        if totals:
+            print("\nPer-file steps (summed over all files):")
+            for name, seconds in sorted(totals.items(), key=lambda kv: -kv[1]):
+                print(f"  {name:<28} {seconds:9.2f} s")
+        if not self.files:
+            return
+        wall_sum = sum(f["wall_s"] for f in self.files) or 1.0
+        slowest = sorted(self.files, key=lambda f: -f["wall_s"])[:self.top_n]
+        top_share = sum(f["wall_s"] for f in slowest) / wall_sum
+        print(f"\nTop {len(slowest)} slowest files ({top_share:.1%} of per-file time):")
+        for f in slowest:
+            steps = ", ".join(f"{k} {v:.2f}s" for k, v in f.get("steps", {}).items())
+            size = f"{f['size_bytes'] / 1e6:8.2f} MB" if f.get("size_bytes") is not None else "       ? MB"
+            print(f"  {f['wall_s']:8.2f} s  {size}  {f['file']}" + (f"  ({steps})" if steps else ""))
+        sized = [f for f in self.files if f.get("size_bytes") is not None]
+        if sized:
+            print(f"\nTop {min(self.top_n, len(sized))} largest files:")
+            for f in sorted(sized, key=lambda f: -f["size_bytes"])[:self.top_n]:
+                print(f"  {f['size_bytes'] / 1e6:8.2f} MB  {f['wall_s']:8.2f} s  {f['file']}")
+        grew = [f for f in self.files if f.get("rss_growth_mb")]
+        if grew:
+            print("\nFiles that raised peak memory most:")
+            for f in sorted(grew, key=lambda f: -f["rss_growth_mb"])[:self.top_n]:
+                print(f"  +{f['rss_growth_mb']:7.1f} MB  {f['file']}")
+
+# Shared disabled instance for functions whose metrics argument is optional
+NO_METRICS = Metrics("disabled")
+
+def add_metrics_args(parser, default_path: str) -> None:
+    """Add --metrics [JSON] and --metrics-top N to an argparse parser."""
+    parser.add_argument(
+        "--metrics", nargs="?", const=default_path, default=None, metavar="JSON",
+        help=f"Record per-stage and per-file wall/CPU time and peak memory (default file: {default_path})"
+    )
+    parser.add_argument(
+        "--metrics-top", type=int, default=DEFAULT_TOP_N,
+        help=f"Files listed in the slowest/largest report (default: {DEFAULT_TOP_N})"
+    )
@@ -1,54 +1,39 @@
 # rename_pdfs_by_nime_id.py
 # Precise match PDF -> ID, supports PubPub (2021-2022) and legacy formats
 import os
-import sys
 import csv
-import shutil
+import argparse
 from pathlib import Path
 
-try:
-    import pandas as pd
-except ImportError:
-    print("pandas is required. Install with: pip install pandas")
-    sys.exit(1)
+from materialize import LINK_MODES, MANIFEST_NAME, Materializer
+from metadata_store import CSV_NIME, open_metadata_store
+from pipeline_metrics import Metrics, add_metrics_args
 
-CSV_NIME = os.path.join(os.getcwd(), "nime_papers.csv")
 SOURCE_DIR = os.path.join(os.getcwd(), "NIME Papers")
 OUT_DIR = os.path.join(os.getcwd(), "Renamed_PDFs")
+METRICS_JSON = os.path.join(OUT_DIR, "rename_metrics.json")
 
-def safe_str(value) -> str:
-    try:
-        if pd.isna(value):
-            return ""
-    except:
-        if value is None:
-            return ""
-    return str(value)
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rename NIME PDFs to their bibliography IDs.")
+    parser.add_argument(
+        "--link-mode", choices=LINK_MODES, default="copy",
+        help="How to place PDFs in Renamed_PDFs: copy (default), reflink, hardlink, symlink, "
+             "auto (reflink > hardlink > copy) or manifest (no files, only materialize_manifest.csv)"
+    )
+    add_metrics_args(parser, METRICS_JSON)
+    return parser.parse_args(argv)
 
-def basename_from_url(url: str) -> str:
-    return os.path.basename(safe_str(url).strip())
-
-def main():
-    df = pd.read_csv(CSV_NIME, dtype=str, keep_default_na=False, na_filter=False)
-    
-    # Establish two mappings:
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics("rename_pdfs_by_nime_id", args.metrics, args.metrics_top)
+    # Two indexed lookups in the metadata store:
     # 1. URL filename -> ID (Legacy formats)
     # 2. ID -> ID (For PubPub years where filename is the ID)
-    url_to_id = {}
-    id_set = set()
-    
-    for _, row in df.iterrows():
-        url = safe_str(row.get("url"))
-        nime_id = safe_str(row.get("ID")).strip()
-        if not nime_id:
-            continue
-        id_set.add(nime_id)
-        pdf_name = basename_from_url(url)
-        if pdf_name.endswith(".pdf"):
-            url_to_id[pdf_name] = nime_id
+    with metrics.stage("load_metadata"):
+        store = open_metadata_store(CSV_NIME)
 
-    print(f"Loaded {len(url_to_id)} URL->ID mappings")
-    print(f"Loaded {len(id_set)} total IDs")
+    print(f"Loaded {store.count_pdf_names()} URL->ID mappings")
+    print(f"Loaded {store.count_ids()} total IDs")
 
     source_path = Path(SOURCE_DIR)
     pdf_files = sorted(source_path.glob("*.pdf"))
@@ -59,49 +44,57 @@ def main():
     matched_dir = out_path / "Matched"
     unmatched_dir = out_path / "Unmatched"
     
-    matched_dir.mkdir(parents=True, exist_ok=True)
-    unmatched_dir.mkdir(parents=True, exist_ok=True)
+    out_path.mkdir(parents=True, exist_ok=True)
+    materializer = Materializer(args.link_mode, str(out_path / MANIFEST_NAME))
+    materializer.makedirs(str(matched_dir))
+    materializer.makedirs(str(unmatched_dir))
 
     renamed = []
     unmatched = []
     
-    for pdf in pdf_files:
-        original_name = pdf.name
-        matched_id = None
-        match_method = ""
+    with metrics.stage("rename"):
+        for pdf in pdf_files:
+            original_name = pdf.name
+            matched_id = None
+            match_method = ""
         
-        # Method 1: URL Exact Match (Legacy formats)
-        if original_name in url_to_id:
-            matched_id = url_to_id[original_name]
-            match_method = "url"
-        else:
-            # Method 2: Filename stem match to ID (PubPub formats)
-            stem = pdf.stem  # e.g., nime2021_1
-            if stem in id_set:
-                matched_id = stem
-                match_method = "id_direct"
+            # Method 1: URL Exact Match (Legacy formats)
+            url_id = store.id_for_pdf_name(original_name)
+            if url_id:
+                matched_id = url_id
+                match_method = "url"
+            else:
+                # Method 2: Filename stem match to ID (PubPub formats)
+                stem = pdf.stem  # e.g., nime2021_1
+                if store.has_id(stem):
+                    matched_id = stem
+                    match_method = "id_direct"
         
-        if matched_id:
-            # Copy to Matched folder
-            new_name = f"{matched_id}.pdf"
-            dest = matched_dir / new_name
-            # Handle duplicates
-            counter = 1
-            while dest.exists():
-                dest = matched_dir / f"{matched_id}_{counter}.pdf"
-                counter += 1
-            shutil.copy2(pdf, dest)
-            renamed.append({
-                "original": original_name,
-                "new_name": dest.name,
-                "ID": matched_id,
-                "method": match_method
-            })
-        else:
-            # Copy to Unmatched folder (keep original name)
-            dest = unmatched_dir / original_name
-            shutil.copy2(pdf, dest)
-            unmatched.append(original_name)
+            if matched_id:
+                # Copy (or link) to Matched folder
+                new_name = f"{matched_id}.pdf"
+                dest = matched_dir / new_name
+                # Handle duplicates
+                counter = 1
+                while materializer.exists(str(dest)):
+                    dest = matched_dir / f"{matched_id}_{counter}.pdf"
+                    counter += 1
+                with metrics.file(str(pdf), "rename"):
+                    materializer.place(str(pdf), str(dest))
+                renamed.append({
+                    "original": original_name,
+                    "new_name": dest.name,
+                    "ID": matched_id,
+                    "method": match_method
+                })
+            else:
+                # Copy (or link) to Unmatched folder (keep original name)
+                dest = unmatched_dir / original_name
+                with metrics.file(str(pdf), "rename"):
+                    materializer.place(str(pdf), str(dest))
+                unmatched.append(original_name)
+
+    store.close()
 
     # Write mapping CSV - Save to Renamed_PDFs root
     map_csv = out_path / "rename_map.csv"
@@ -118,14 +111,16 @@ def main():
         for m in unmatched:
             writer.writerow([m])
 
+    materializer.write_manifest()
+
     print(f"\nDone!")
     print(f"Matched PDFs: {len(renamed)} -> {matched_dir}")
     print(f"Unmatched PDFs: {len(unmatched)} -> {unmatched_dir}")
     print(f"Mapping saved to: {map_csv}")
     print(f"Unmatched list saved to: {unm_csv}")
-
-if __name__ == "__main__":
-    main()
+    print(f"Placement ({args.link_mode}): {materializer.summary()}")
+    print(f"Manifest saved to: {materializer.manifest_path}")
+    metrics.finish()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
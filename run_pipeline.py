@@ -0,0 +1,429 @@
+# run_pipeline.py
+"""
+Run the pipeline stages in dependency order, skipping stages that are up to date.
+
+Stages (→ = depends on):
+    download_2025, zenodo          portal / Zenodo downloads (only when named explicitly)
+    metadata                       nime_papers.csv -> nime_papers.sqlite
+    bib_index                      NIME_2001-2025.bib -> nime_bib_index.sqlite
+    rename  → metadata             NIME Papers/*.pdf -> Renamed_PDFs
+    filter  → rename, metadata     Renamed_PDFs -> Metadata_Filtered_Results
+    extract → filter               Keyword_Match PDFs -> Keyboard_Interface_Texts
+    dedup   → extract              Keyboard_Interface_Texts -> near_duplicates.csv (on demand)
+    kwic    → extract              Keyboard_Interface_Texts -> kwic_context_screening.csv
+              (+ dedup with --collapse-duplicates)
+    merge   → kwic, bib_index      kept papers -> kwic_screened_metadata.csv
+
+Each stage has a key: the SHA-256 of its command line, its configuration
+(keywords, context window, extractor versions, ...), the source of its
+script and of the repo-local modules the script imports (directly or
+through each other), and the contents of its inputs, which include upstream outputs. A stage
+runs only when its key differs from the one recorded after its last
+successful run, or when an output it wrote is missing. Tweaking KWIC
+scoring therefore reruns kwic and merge but never touches a PDF. Stages
+whose dependencies are done run concurrently (--jobs).
+
+File digests are remembered by (size, mtime), so unchanged inputs are not
+re-read. A stage whose required inputs are absent (e.g. the excluded PDF
+folders in a fresh clone) keeps its existing outputs and is not run.
+
+dedup runs only when named or when kwic is given --collapse-duplicates;
+only then is near_duplicates.csv part of kwic's key.
+
+Each stage's output goes to .pipeline/logs/<stage>.log.
+
+Usage:
+    python run_pipeline.py                  # bring every stage up to date
+    python run_pipeline.py kwic merge       # these stages and anything upstream that is stale
+    python run_pipeline.py --dry-run        # show what would run
+    python run_pipeline.py --args "filter=--early-exit" --args "extract=--workers 8"
+    python run_pipeline.py --args "kwic=--collapse-duplicates"
+"""
+import os
+import ast
+import sys
+import glob
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+import copy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from text_cache import file_sha256
+
+PIPELINE_DIR = os.path.join(os.getcwd(), ".pipeline")
+STATE_JSON = os.path.join(PIPELINE_DIR, "state.json")
+LOG_DIR = os.path.join(PIPELINE_DIR, "logs")
+DEFAULT_JOBS = 2
+STATE_VERSION = 1
+FAILED_LOG_LINES = 20
+
+def _metadata_config() -> dict:
+    import metadata_store
+    return {"schema": metadata_store.SCHEMA_VERSION, "columns": metadata_store.STORE_COLUMNS}
+
+def _bib_index_config() -> dict:
+    import bib_index
+    return {"schema": bib_index.SCHEMA_VERSION, "fields": bib_index.INDEX_FIELDS}
+
+def _filter_config() -> dict:
+    import filter_renamed_pdfs_combined as f
+    import normalized_text
+    return {"keywords": f.KEYWORDS, "extractor": f.EXTRACTOR_ID, "reference_headers": f.REFERENCE_HEADER_PATTERNS,
+            "normalizer": normalized_text.NORMALIZER_ID}
+
+def _extract_config() -> dict:
+    import extract_keyboard_pdfs_to_txt as e
+    return {"extractor": e.EXTRACTOR_ID}
+
+def _dedup_config() -> dict:
+    import near_duplicates as d
+    return {"shingles": d.SHINGLE_WORDS, "perm": d.NUM_PERM, "bands": d.LSH_BANDS,
+            "threshold": d.MIN_SIMILARITY, "seed": d.SEED}
+
+def _kwic_config() -> dict:
+    import kwic_screening as k
+    import normalized_text
+    return {"fingerprint": k.kwic_config_fingerprint(), "normalizer": normalized_text.NORMALIZER_ID}
+
+def _merge_config() -> dict:
+    import bib_index
+    import merge_screening_with_metadata as m
+    return {
+        "columns": m.METADATA_COLUMNS, "schema": bib_index.SCHEMA_VERSION,
+        "title_match": [bib_index.TITLE_SEARCH_CHARS, bib_index.TITLE_GRAM, bib_index.MIN_EXACT_TITLE_CHARS,
+                        bib_index.MIN_TITLE_SCORE, bib_index.MIN_TITLE_MARGIN],
+    }
+
+class Stage:
+    """One pipeline step: a script invocation with declared inputs, outputs and dependencies.
+
+    inputs and outputs are paths or glob patterns relative to the working
+    directory; inputs ending in '?' are optional (hashed when present).
+    flag_deps maps a script flag to the (deps, inputs) it adds when given.
+    """
+
+    def __init__(self, name: str, script: str, deps: List[str] = (), inputs: List[str] = (),
+                 outputs: List[str] = (), config: Optional[Callable[[], dict]] = None,
+                 args: List[str] = (), explicit: bool = False, on_demand: bool = False,
+                 flag_deps: Optional[Dict[str, Tuple[List[str], List[str]]]] = None):
+        self.name = name
+        self.script = script
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config = config
+        self.args = list(args)
+        # Explicit stages (network downloads) run only when named and are never cached
+        self.explicit = explicit
+        # On-demand stages run only when named or needed by a selected stage
+        self.on_demand = on_demand
+        self.flag_deps = dict(flag_deps or {})
+
+    def command(self, extra_args: List[str]) -> List[str]:
+        return [sys.executable, self.script] + self.args + extra_args
+
+    def configured(self, extra_args: List[str]) -> "Stage":
+        """This stage with the deps and inputs its flags (own and extra) add."""
+        stage = copy.copy(self)
+        stage.deps, stage.inputs = list(self.deps), list(self.inputs)
+        given = self.args + extra_args
+        for flag, (deps, inputs) in self.flag_deps.items():
+            if any(a == flag or a.startswith(flag + "=") for a in given):
+                stage.deps += [d for d in deps if d not in stage.deps]
+                stage.inputs += [i for i in inputs if i not in stage.inputs]
+        return stage
+
+STAGES = [
+    Stage("download_2025", os.path.join("Crawler", "download_nime_2025.py"), explicit=True),
+    Stage("zenodo", os.path.join("Crawler", "zenodo_bulk_download.py"), explicit=True),
+    Stage("metadata", "metadata_store.py", args=["import"],
+          inputs=["nime_papers.csv"], outputs=["nime_papers.sqlite"], config=_metadata_config),
+    Stage("bib_index", "bib_index.py", args=["build"],
+          inputs=[os.path.join("KWIC_Screening", "NIME_2001-2025.bib")],
+          outputs=[os.path.join("KWIC_Screening", "nime_bib_index.sqlite")], config=_bib_index_config),
+    Stage("rename", "rename_pdfs_by_nime_id.py", deps=["metadata"],
+          inputs=[os.path.join("NIME Papers", "*.pdf"), "nime_papers.csv"],
+          outputs=[os.path.join("Renamed_PDFs", "rename_map.csv"), os.path.join("Renamed_PDFs", "materialize_manifest.csv")]),
+    Stage("filter", "filter_renamed_pdfs_combined.py", deps=["rename", "metadata"],
+          inputs=[os.path.join("Renamed_PDFs", "materialize_manifest.csv"), "nime_papers.csv"],
+          outputs=[os.path.join("Metadata_Filtered_Results", "filter_results.csv"),
+                   os.path.join("Metadata_Filtered_Results", "materialize_manifest.csv")],
+          config=_filter_config),
+    Stage("extract", "extract_keyboard_pdfs_to_txt.py", deps=["filter"],
+          inputs=[os.path.join("Metadata_Filtered_Results", "materialize_manifest.csv")],
+          outputs=[os.path.join("Keyboard_Interface_Texts", "**", "*.txt")], config=_extract_config),
+    Stage("dedup", "near_duplicates.py", deps=["extract"],
+          inputs=[os.path.join("Keyboard_Interface_Texts", "**", "*.txt")],
+          outputs=[os.path.join("KWIC_Screening", "near_duplicates.csv")], config=_dedup_config,
+          on_demand=True),
+    Stage("kwic", "kwic_screening.py", deps=["extract"],
+          inputs=[os.path.join("Keyboard_Interface_Texts", "**", "*.txt")],
+          outputs=[os.path.join("KWIC_Screening", "kwic_context_screening.csv")], config=_kwic_config,
+          flag_deps={"--collapse-duplicates": (["dedup"], [os.path.join("KWIC_Screening", "near_duplicates.csv")])}),
+    Stage("merge", "merge_screening_with_metadata.py", args=["--source", "bib"], deps=["kwic", "bib_index"],
+          inputs=[os.path.join("KWIC_Screening", "kwic_context_screening.csv"),
+                  os.path.join("KWIC_Screening", "NIME_2001-2025.bib"), "nime_papers.csv?"],
+          outputs=[os.path.join("KWIC_Screening", "kwic_screened_metadata.csv")], config=_merge_config),
+]
+STAGES_BY_NAME = {s.name: s for s in STAGES}
+
+class FileHasher:
+    """Content digests of files, memoized by (size, mtime_ns) across runs."""
+
+    def __init__(self, memo: Dict[str, list]):
+        self.memo = memo
+
+    def digest(self, path: str) -> str:
+        stat = os.stat(path)
+        known = self.memo.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = file_sha256(path)
+        self.memo[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def pattern_digest(self, pattern: str) -> Optional[str]:
+        """Digest over every file matching pattern (names and contents), or None if nothing matches."""
+        paths = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        if not paths:
+            return None
+        h = hashlib.sha256()
+        for path in paths:
+            h.update(f"{path}\0{self.digest(path)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+def local_imports(script: str) -> List[str]:
+    """Repo-local modules the script imports, directly or through each other, as sorted paths.
+
+    Modules resolve like at run time: to .py files in the script's folder.
+    Imports inside functions count too; other modules (stdlib, site-packages)
+    are ignored.
+    """
+    module_dir = os.path.dirname(script)
+    found, pending = set(), [script]
+    while pending:
+        try:
+            with open(pending.pop(), "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError, ValueError):
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = os.path.join(module_dir, name.split(".")[0] + ".py")
+                if path != script and path not in found and os.path.isfile(path):
+                    found.add(path)
+                    pending.append(path)
+    return sorted(found)
+
+def outputs_exist(stage: Stage) -> bool:
+    return all(glob.glob(pattern, recursive=True) for pattern in stage.outputs)
+
+def stage_key(stage: Stage, hasher: FileHasher, extra_args: List[str], dep_keys: Dict[str, Optional[str]]) -> Optional[str]:
+    """Hash of everything that determines the stage's outputs, or None if a required input is missing.
+
+    dep_keys are the keys the dependencies last ran with. They cover upstream
+    content that a stage only sees through a manifest (e.g. the PDFs behind
+    Renamed_PDFs/materialize_manifest.csv).
+    """
+    parts = {"command": [stage.script] + stage.args + extra_args, "deps": dep_keys}
+    parts["script"] = {path: hasher.digest(path) for path in [stage.script] + local_imports(stage.script)
+                       if os.path.exists(path)}
+    parts["config"] = stage.config() if stage.config else None
+    inputs = {}
+    for pattern in stage.inputs:
+        optional = pattern.endswith("?")
+        pattern = pattern.rstrip("?")
+        digest = hasher.pattern_digest(pattern)
+        if digest is None and not optional:
+            return None
+        inputs[pattern] = digest
+    parts["inputs"] = inputs
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+def load_state(path: str = STATE_JSON) -> dict:
+    empty = {"version": STATE_VERSION, "stages": {}, "files": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable pipeline state {path}: {e}")
+        return empty
+    return state if state.get("version") == STATE_VERSION else empty
+
+def save_state(state: dict, path: str = STATE_JSON) -> None:
+    """Write the state atomically so an interrupted run never leaves a truncated file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+def select_stages(targets: List[str], stage_args: Dict[str, List[str]]) -> List[Stage]:
+    """Targets plus their (non-explicit) upstream stages, configured with their --args, in pipeline order.
+
+    Without targets: every stage that is neither explicit nor on demand.
+    """
+    configured = {s.name: s.configured(stage_args.get(s.name, [])) for s in STAGES}
+    wanted = set()
+    pending = list(targets) or [s.name for s in STAGES if not s.explicit and not s.on_demand]
+    while pending:
+        name = pending.pop()
+        if name in wanted:
+            continue
+        wanted.add(name)
+        pending.extend(d for d in configured[name].deps if not configured[d].explicit)
+    return [configured[s.name] for s in STAGES if s.name in wanted]
+
+def run_stage(stage: Stage, extra_args: List[str]) -> Tuple[int, float, str]:
+    """Run the stage's script with output to its log file. Returns (exit code, seconds, log path)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{stage.name}.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        command = stage.command(extra_args)
+        log.write(f"$ {shlex.join(command)}\n")
+        log.flush()
+        env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+        code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+    return code, time.perf_counter() - start, log_path
+
+def _tail(path: str, n: int) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-n:])
+
+def parse_stage_args(values: List[str]) -> Dict[str, List[str]]:
+    stage_args: Dict[str, List[str]] = {}
+    for value in values:
+        name, sep, args = value.partition("=")
+        if not sep or name not in STAGES_BY_NAME:
+            raise SystemExit(f"--args expects STAGE=ARGS with STAGE one of: {', '.join(STAGES_BY_NAME)}")
+        stage_args.setdefault(name, []).extend(shlex.split(args))
+    return stage_args
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date.")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"Stages to bring up to date, with their upstream stages (default: all). "
+                             f"One of: {', '.join(STAGES_BY_NAME)}")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Independent stages run at the same time (default: {DEFAULT_JOBS})")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even if they are up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--args", action="append", default=[], metavar="STAGE=ARGS",
+                        help='Extra arguments for a stage\'s script, e.g. --args "filter=--early-exit" (repeatable)')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.stages if name not in STAGES_BY_NAME]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES_BY_NAME)})")
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stage_args = parse_stage_args(args.args)
+    stages = select_stages(args.stages, stage_args)
+    selected = {s.name: s for s in stages}
+    state = load_state()
+    hasher = FileHasher(state.setdefault("files", {}))
+
+    status: Dict[str, str] = {}
+    pending = {s.name: s for s in stages}
+    running = {}
+    failed = False
+
+    def plan(stage: Stage) -> Tuple[str, Optional[str]]:
+        """('run' | 'up to date' | 'unavailable' | 'blocked' | 'skipped', key) for a stage whose deps are settled."""
+        if any(status.get(d) in ("failed", "skipped") for d in stage.deps):
+            return "skipped", None
+        if stage.explicit or (args.dry_run and any(status.get(d) == "would run" for d in stage.deps)):
+            return "run", None
+        dep_keys = {d: state["stages"].get(d, {}).get("key") for d in stage.deps}
+        key = stage_key(stage, hasher, stage_args.get(stage.name, []), dep_keys)
+        if key is None:
+            return ("unavailable" if outputs_exist(stage) else "blocked"), None
+        recorded = state["stages"].get(stage.name, {})
+        # A stage that legitimately wrote nothing (e.g. merge with no KEEP(1) papers) stays up to date
+        outputs_ok = outputs_exist(stage) or not recorded.get("wrote_outputs", True)
+        if key == recorded.get("key") and outputs_ok and not args.force:
+            return "up to date", key
+        return "run", key
+
+    def settled(name: str) -> bool:
+        # Stages outside the selection count as done
+        return name not in pending and name not in running
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if not all(settled(d) for d in stage.deps):
+                    continue
+                if len(running) >= max(1, args.jobs):
+                    break
+                del pending[name]
+                try:
+                    decision, key = plan(stage)
+                except (Exception, SystemExit) as e:
+                    # A broken config hook or script import fails the stage, not silently the run
+                    failed = True
+                    status[name] = "failed"
+                    print(f"[{name}] FAILED while planning: {type(e).__name__}: {e}")
+                    continue
+                if decision != "run":
+                    status[name] = decision
+                    note = {
+                        "up to date": "up to date",
+                        "unavailable": "inputs not available; keeping existing outputs",
+                        "blocked": "inputs and outputs missing; not run",
+                        "skipped": "skipped because an upstream stage failed",
+                    }[decision]
+                    print(f"[{name}] {note}")
+                    continue
+                if args.dry_run:
+                    status[name] = "would run"
+                    print(f"[{name}] would run: {shlex.join(stage.command(stage_args.get(name, [])))}")
+                    continue
+                print(f"[{name}] running...")
+                running[name] = (pool.submit(run_stage, stage, stage_args.get(name, [])), key)
+            if not running:
+                if pending and not any(all(settled(d) for d in s.deps) for s in pending.values()):
+                    break
+                continue
+            done, _ = wait([f for f, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name, (future, key) in list(running.items()):
+                if future not in done:
+                    continue
+                del running[name]
+                code, seconds, log_path = future.result()
+                stage = selected[name]
+                if code != 0:
+                    failed = True
+                    status[name] = "failed"
+                    print(f"[{name}] FAILED (exit {code}) after {seconds:.1f} s; log: {log_path}")
+                    print(_tail(log_path, FAILED_LOG_LINES), end="")
+                    continue
+                status[name] = "done"
+                print(f"[{name}] done in {seconds:.1f} s; log: {log_path}")
+                if not stage.explicit:
+                    # Record the key the stage ran with; a change during the run shows up next time
+                    state["stages"][name] = {"key": key, "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+                                             "seconds": round(seconds, 1), "wrote_outputs": outputs_exist(stage)}
+                    save_state(state)
+
+    if not args.dry_run:
+        save_state(state)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
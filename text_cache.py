@@ -0,0 +1,128 @@
+# text_cache.py
+"""
+Content-addressed cache for text extracted from PDFs.
+
+Shared by filter_renamed_pdfs_combined.py (pdfminer) and
+extract_keyboard_pdfs_to_txt.py (pypdf). Entries are keyed by the SHA-256
+of the PDF bytes plus an extractor id (name, version and settings), so
+renaming, copying or re-filtering PDFs never triggers a second parse, while
+upgrading an extractor automatically invalidates its entries.
+
+Layout: <CACHE_DIR>/<extractor_id>/<sha[:2]>/<sha>.txt
+
+The same layout also holds derived binary entries under other ids and
+suffixes (see normalized_text.py).
+"""
+import os
+import hashlib
+import tempfile
+from typing import Callable, Optional
+
+CACHE_DIR = os.environ.get("NIME_TEXT_CACHE", os.path.join(os.getcwd(), ".text_cache"))
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash a file's contents in fixed-size chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_entry_path(digest: str, extractor_id: str, cache_dir: str = CACHE_DIR, suffix: str = ".txt") -> str:
+    """Location of the cached text for a PDF digest and extractor."""
+    return os.path.join(cache_dir, extractor_id, digest[:2], digest + suffix)
+
+def read_cached_text(digest: str, extractor_id: str, cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """Return cached text or None when there is no entry."""
+    path = cache_entry_path(digest, extractor_id, cache_dir)
+    try:
+        # newline='' keeps the text byte-for-byte as the extractor produced it
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"  Warning: Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def write_cached_text(digest: str, extractor_id: str, text: str, cache_dir: str = CACHE_DIR) -> None:
+    """Store text atomically, so concurrent workers never see a partial entry."""
+    try:
+        data = text.encode('utf-8')
+    except UnicodeEncodeError as e:
+        print(f"  Warning: Could not write cache entry for {digest}: {e}")
+        return
+    write_cached_bytes(digest, extractor_id, data, cache_dir)
+
+def read_cached_bytes(digest: str, extractor_id: str, cache_dir: str = CACHE_DIR,
+                      suffix: str = ".txt") -> Optional[bytes]:
+    """Return a cached binary entry or None when there is none."""
+    path = cache_entry_path(digest, extractor_id, cache_dir, suffix)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"  Warning: Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def write_cached_bytes(digest: str, extractor_id: str, data: bytes, cache_dir: str = CACHE_DIR,
+                       suffix: str = ".txt") -> None:
+    """Store a binary entry atomically (write to a temp file, then rename)."""
+    path = cache_entry_path(digest, extractor_id, cache_dir, suffix)
+    entry_dir = os.path.dirname(path)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        print(f"  Warning: Could not write cache entry {path}: {e}")
+
+def extract_or_empty(pdf_path: str, extract_fn: Callable[[str], str]) -> str:
+    """extract_fn(pdf_path), or "" with a warning when the extraction fails.
+
+    MemoryError is re-raised, so a sandbox can see it and quarantine the file.
+    """
+    try:
+        return extract_fn(pdf_path)
+    except MemoryError:
+        raise
+    except Exception as e:
+        print(f"  Warning: Failed to extract text from {os.path.basename(pdf_path)}: {e}")
+        return ""
+
+def cached_extract(pdf_path: str, extractor_id: str, extract_fn: Callable[[str], str],
+                   cache_dir: str = CACHE_DIR) -> str:
+    """Return extract_fn(pdf_path), parsing the PDF only on a cache miss.
+
+    Empty results are cached as well: extraction is deterministic for a given
+    file and extractor, so a rerun does no PDF parsing at all. extract_fn
+    signals a failed extraction by raising; the failure is reported and ""
+    returned without a cache entry, so the next run tries again.
+    """
+    try:
+        digest = file_sha256(pdf_path)
+    except OSError:
+        # Unreadable file: let the extractor report the problem
+        return extract_or_empty(pdf_path, extract_fn)
+
+    text = read_cached_text(digest, extractor_id, cache_dir)
+    if text is not None:
+        return text
+
+    try:
+        text = extract_fn(pdf_path)
+    except MemoryError:
+        raise
+    except Exception as e:
+        print(f"  Warning: Failed to extract text from {os.path.basename(pdf_path)}: {e}")
+        return ""
+    write_cached_text(digest, extractor_id, text, cache_dir)
+    return text